@@ -0,0 +1,98 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Failure analytics over the error history: compute time and event loop lag
+
+A synthetic history (spilled to SQLite like a long-running agent's) is
+analysed by AnalyticsEngine with Workers 0 (a thread of the agent process)
+and with a process pool, while a probe task on the event loop measures how
+late it wakes up; that lag is what scheduled component checks would see.
+
+Usage: python3 bench_analytics.py [--entries 200000] [--components 8] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+from analytics import AnalyticsEngine, compute_analytics
+from history_store import ErrorHistoryStore
+
+PROBE_INTERVAL = 0.005
+
+def build_history(path: str, entries: int, components: int, days: float) -> ErrorHistoryStore:
+    store = ErrorHistoryStore({'Tail_Size': 1000, 'Spill_Path': path})
+    now = time.time()
+    rng = random.Random(42)
+    names = [f"component_{index}" for index in range(components)]
+    for ts in sorted(now - rng.random() * days * 86400 for _ in range(entries)):
+        component = rng.choice(names)
+        store.add('HARDWARE_FAILURE', {'component': component, 'details': 'synthetic'}, ts)
+    store.flush()
+    return store
+
+async def probe(lags: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+async def measure(store: ErrorHistoryStore, workers: int, runs: int) -> Dict:
+    engine = AnalyticsEngine({'Workers': workers, 'History_Window': 365 * 86400})
+    # Warm-up: the pool spawns its processes on the first run
+    await engine.refresh(store)
+    lags: List[float] = []
+    durations = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(probe(lags, stop))
+    for _ in range(runs):
+        started = time.perf_counter()
+        results = await engine.refresh(store)
+        durations.append(time.perf_counter() - started)
+    stop.set()
+    await task
+    engine.close()
+    lags.sort()
+    return {
+        'refresh': statistics.median(durations),
+        'lag_p99': lags[int(len(lags) * 0.99)] if lags else 0.0,
+        'lag_max': lags[-1] if lags else 0.0,
+        'backend': results['backend'] if results else 'failed'
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=200000)
+    parser.add_argument('--components', type=int, default=8)
+    parser.add_argument('--days', type=float, default=30)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = build_history(os.path.join(tmp, 'history.db'), args.entries, args.components, args.days)
+        columns = store.columns()
+        started = time.perf_counter()
+        results = compute_analytics(columns, time.time(), AnalyticsEngine().params)
+        compute = time.perf_counter() - started
+
+        print(f"{len(columns['ts'])} entries, {args.components} components, {args.days:g} days")
+        print(f"compute ({results['backend']}): {compute * 1000:.1f} ms")
+        for label, workers in (('thread', 0), ('process pool', 1)):
+            sample = asyncio.run(measure(store, workers, args.runs))
+            print(f"{label:<14} refresh {sample['refresh'] * 1000:7.1f} ms   event loop lag "
+                  f"p99 {sample['lag_p99'] * 1000:6.2f} ms  max {sample['lag_max'] * 1000:6.2f} ms")
+        store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Fault-to-detection latency with polling only versus pushed device events
+
+Runs one agent on the SimulatedDriver, injects a printer fault at a random
+point of the check interval and measures the time until the fault reaches the
+diagnosis queue, in three modes: poll (Fault_Events disabled), device (the
+driver pushes the change) and socket (a JSON line on the event socket).
+Diagnosis itself is replaced by a recorder so only detection is timed.
+Device round-trips are counted over an idle period before the faults.
+
+Usage: python3 bench_detection.py [--runs 8] [--interval 2] [--fallback 30] [--idle 10]
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+import yaml
+from config import ATMConfig
+from fault_tracker import OK
+from hardware import HardwareInterface
+from main import ATMSystem
+
+COMPONENT = 'printer'
+FAULT = {'connected': False}
+HEALTHY = {'connected': True}
+
+def agent_config(base: Dict, tmp: str, mode: str, interval: float, fallback: float) -> ATMConfig:
+    data = copy.deepcopy(base)
+    data['OpenRouteAI']['Cache']['Persist_Path'] = ''
+    data['Notification_Outbox']['Spool_Path'] = ''
+    data['Error_History']['Spill_Path'] = ''
+    data['Checkpoint']['Path'] = ''
+    data['Maintenance_UI']['Port'] = 0
+    data['Metrics']['Enabled'] = False
+    data['Logging'] = dict(data.get('Logging') or {}, File=os.path.join(tmp, 'detection_log.txt'), Level='WARNING')
+    data['Fault_Events'] = {
+        'Enabled': mode != 'poll',
+        'Socket_Path': os.path.join(tmp, 'events.sock') if mode == 'socket' else '',
+        'Fallback_Check_Interval': fallback
+    }
+    hardware = data['Hardware']
+    hardware['Check_Interval'] = interval
+    for section in HardwareInterface.COMPONENT_SECTIONS.values():
+        hardware.setdefault(section, {})['Check_Interval'] = interval
+    return ATMConfig(data)
+
+def send_event(path: str, component: str):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall(json.dumps({'component': component, 'timestamp': time.time()}).encode() + b'\n')
+
+async def wait_for(condition, timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if condition():
+            return True
+        await asyncio.sleep(0.002)
+    return False
+
+async def run_mode(config: ATMConfig, mode: str, runs: int, interval: float, idle: float, seed: int) -> Dict:
+    atm = ATMSystem(config)
+    driver = atm.hardware.driver
+    if mode == 'socket':
+        # Readings change silently; only the socket event announces them
+        driver._subscribers.clear()
+
+    detected: List[float] = []
+    atm.diagnosis_pool.submit_batch = lambda faults: detected.append(time.perf_counter())
+
+    rng = random.Random(seed)
+    task = asyncio.create_task(atm.run_async())
+    latencies = []
+    try:
+        await asyncio.sleep(0.5)
+        round_trips = driver.round_trips
+        await asyncio.sleep(idle)
+        idle_round_trips = driver.round_trips - round_trips
+
+        for _ in range(runs):
+            await asyncio.sleep(rng.uniform(0, interval))
+            count = len(detected)
+            injected = time.perf_counter()
+            driver.set_reading(COMPONENT, **FAULT)
+            if mode == 'socket':
+                await asyncio.to_thread(send_event, config.fault_events['Socket_Path'], COMPONENT)
+            if not await wait_for(lambda: len(detected) > count, interval * 3):
+                raise RuntimeError(f"{mode}: fault not detected")
+            latencies.append(detected[count] - injected)
+
+            driver.set_reading(COMPONENT, **HEALTHY)
+            if mode == 'socket':
+                await asyncio.to_thread(send_event, config.fault_events['Socket_Path'], COMPONENT)
+            if not await wait_for(lambda: atm.fault_tracker.state(COMPONENT) == OK, interval * 3):
+                raise RuntimeError(f"{mode}: recovery not detected")
+    finally:
+        atm.shutdown()
+        await asyncio.gather(task, return_exceptions=True)
+    return {
+        'latencies': latencies,
+        'idle_round_trips_per_min': idle_round_trips / idle * 60
+    }
+
+async def run(args, base: Dict, tmp: str):
+    results = {}
+    for mode in ('poll', 'device', 'socket'):
+        config = agent_config(base, tmp, mode, args.interval, args.fallback)
+        results[mode] = await run_mode(config, mode, args.runs, args.interval, args.idle, args.seed)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=8)
+    parser.add_argument('--interval', type=float, default=2, help='polling check interval, seconds')
+    parser.add_argument('--fallback', type=float, default=30, help='Fallback_Check_Interval with events')
+    parser.add_argument('--idle', type=float, default=10, help='seconds without faults for the round-trip count')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--config', default=os.path.join(SRC_DIR, '..', 'config', 'settings.yml'))
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        base = yaml.safe_load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        results = asyncio.run(run(args, base, tmp))
+
+    print(f"check interval {args.interval:g} s, event fallback {args.fallback:g} s, {args.runs} faults per mode")
+    for mode, result in results.items():
+        latencies = sorted(result['latencies'])
+        print(f"{mode:<7} fault->detection median {statistics.median(latencies) * 1000:8.1f} ms   "
+              f"max {latencies[-1] * 1000:8.1f} ms   "
+              f"idle device round-trips/min {result['idle_round_trips_per_min']:6.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Compare per-check device queries against one batched sensor read per sweep
+
+Uses the SimulatedDriver, whose device link serves one query at a time with a
+fixed round-trip latency, and times HardwareInterface.get_full_status() with
+Snapshot_TTL 0 (every check queries its own component) and with a snapshot
+shared by the whole sweep.
+
+Also times the steady-state path: scheduled checks of one component at a
+time, jittered further apart than Snapshot_TTL, comparing a batched read of
+every device per check against reading only the checked device.
+
+Usage: python3 bench_drivers.py [--sweeps 50] [--latency-ms 20] [--config ../config/settings.yml]
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+import yaml
+from config import ATMConfig
+from drivers import SimulatedDriver
+from hardware import HardwareInterface
+
+def run(label: str, base: dict, snapshot_ttl: float, latency: float, sweeps: int):
+    data = copy.deepcopy(base)
+    data['Hardware']['Snapshot_TTL'] = snapshot_ttl
+    driver = SimulatedDriver({'Latency': latency})
+    hardware = HardwareInterface(ATMConfig(data), driver=driver)
+
+    timings = []
+    try:
+        for _ in range(sweeps):
+            # Sweeps are Check_Interval apart in production, longer than the snapshot TTL
+            hardware.snapshots.invalidate()
+            started = time.perf_counter()
+            status = hardware.get_full_status()
+            timings.append(time.perf_counter() - started)
+            assert all(entry['status'] for entry in status.values()), status
+    finally:
+        hardware.close()
+
+    print(f"{label:<10} sweep median {statistics.median(timings) * 1000:7.2f} ms   "
+          f"max {max(timings) * 1000:7.2f} ms   "
+          f"{driver.round_trips / sweeps:.1f} device round-trips/sweep   "
+          f"{driver.device_reads / sweeps:.1f} device reads/sweep")
+
+def run_scheduled(label: str, base: dict, latency: float, checks: int, batched: bool):
+    data = copy.deepcopy(base)
+    data['Hardware']['Snapshot_TTL'] = 1
+    driver = SimulatedDriver({'Latency': latency})
+    hardware = HardwareInterface(ATMConfig(data), driver=driver)
+    components = list(hardware.COMPONENT_SECTIONS)
+
+    timings = []
+    try:
+        for index in range(checks):
+            # Each scheduled check finds the previous snapshot expired
+            hardware.snapshots.invalidate()
+            if batched:
+                hardware.snapshots.batch()
+            started = time.perf_counter()
+            status = hardware.probe_component(components[index % len(components)])
+            timings.append(time.perf_counter() - started)
+            assert status['status'], status
+    finally:
+        hardware.close()
+
+    print(f"{label:<10} check median {statistics.median(timings) * 1000:7.2f} ms   "
+          f"max {max(timings) * 1000:7.2f} ms   "
+          f"{driver.round_trips / checks:.1f} device round-trips/check   "
+          f"{driver.device_reads / checks:.1f} device reads/check")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sweeps', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=20, help='simulated device round-trip')
+    parser.add_argument('--config', default=os.path.join(SRC_DIR, '..', 'config', 'settings.yml'))
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        base = yaml.safe_load(f)
+    latency = args.latency_ms / 1000
+    run('per-check', base, 0, latency, args.sweeps)
+    run('batched', base, 1, latency, args.sweeps)
+    print("scheduled checks, one component at a time:")
+    run_scheduled('full read', base, latency, args.sweeps, True)
+    run_scheduled('own device', base, latency, args.sweeps, False)
+
+if __name__ == '__main__':
+    main()
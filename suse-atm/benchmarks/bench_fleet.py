@@ -0,0 +1,272 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Fleet simulation: N ATMSystem agents on one asyncio loop in one process
+
+Hardware probes are replaced by scripted fault generators, and the AI endpoint
+and Windows monitor are local stub servers, so the run is fully offline.
+Reports check throughput, p50/p99 check latency, memory per agent and
+notification rates. Agents that end up in maintenance mode are repaired by a
+simulated technician after --technician-delay seconds.
+
+Usage: python3 bench_fleet.py [--agents 20] [--duration 20] [--interval 1]
+                              [--fault-rate 0.05] [--unknown-rate 0.2]
+                              [--probe-latency-ms 5] [--ai-latency-ms 50]
+"""
+
+import argparse
+import asyncio
+import copy
+import gzip
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+import yaml
+from config import ATMConfig
+from hardware import HardwareInterface
+from metrics import REGISTRY
+from main import ATMSystem
+
+# Faults each scripted device can report; the rules table knows all of these
+FAULTS = {
+    'cash_dispenser': [
+        {'error_type': 'NOTE_JAM', 'details': 'Note stuck in transport'},
+        {'error_type': 'LOW_CASH', 'current_level': 150, 'threshold': 200}
+    ],
+    'card_reader': [
+        {'error_type': 'READER_DISCONNECTED', 'details': 'Card reader not responding'}
+    ],
+    'printer': [
+        {'error_type': 'LOW_PAPER', 'current_level': 50, 'threshold': 100}
+    ],
+    'display': [
+        {'error_type': 'DISPLAY_ERROR', 'details': 'Display not responding'},
+        {'error_type': 'TOUCH_ERROR', 'details': 'Touch functionality not working'}
+    ]
+}
+# Not in the rules table, so it goes to the AI stub
+UNKNOWN_FAULT = {'error_type': 'SENSOR_DRIFT', 'details': 'Reading outside calibrated range'}
+
+class ScriptedSensor:
+    """
+    Replacement for a HardwareInterface.check_* probe: healthy readings with
+    seeded random faults at a fixed rate
+    """
+    def __init__(self, component: str, rng: random.Random, fault_rate: float,
+                 unknown_rate: float, latency: float):
+        self.component = component
+        self.rng = rng
+        self.fault_rate = fault_rate
+        self.unknown_rate = unknown_rate
+        self.latency = latency
+
+    def __call__(self):
+        if self.latency:
+            time.sleep(self.latency)
+        roll = self.rng.random()
+        if roll < self.fault_rate * self.unknown_rate:
+            return False, dict(UNKNOWN_FAULT)
+        if roll < self.fault_rate:
+            return False, dict(self.rng.choice(FAULTS[self.component]))
+        return True, None
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        stats = self.server.stats
+        if self.path.startswith('/ai'):
+            time.sleep(self.server.latency)
+            with stats['lock']:
+                stats['ai_calls'] += 1
+            reply = {
+                'diagnosis': {'type': 'SENSOR_DRIFT', 'details': {'recommendation': 'Recalibrate sensor',
+                                                                 'confidence': 90}},
+                'repair_confidence': 0.9
+            }
+        else:
+            events = json.loads(gzip.decompress(body))['events']
+            with stats['lock']:
+                stats['batches'] += 1
+                stats['events'] += len(events)
+            reply = {'status': 'ok'}
+
+        payload = json.dumps(reply).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub(ai_latency: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.latency = ai_latency
+    server.stats = {'lock': threading.Lock(), 'ai_calls': 0, 'batches': 0, 'events': 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def agent_config(base: Dict, index: int, tmp: str, stub_url: str, interval: float) -> ATMConfig:
+    """
+    Per-agent overlay of settings.yml: own ATM_ID, stub endpoints, in-memory
+    spools, caches and state, ephemeral UI port, no event sources and a shorter check interval
+    """
+    data = copy.deepcopy(base)
+    data['ATM_ID'] = f"SIM{index:04d}"
+    data['OpenRouteAI']['Endpoint'] = f"{stub_url}/ai"
+    data['OpenRouteAI'].setdefault('Cache', {})['Persist_Path'] = ''
+    data['Network']['Windows_Monitor_Endpoint'] = f"{stub_url}/api/notifications"
+    data.setdefault('Notification_Outbox', {})['Spool_Path'] = ''
+    data.setdefault('Error_History', {})['Spill_Path'] = ''
+    data.setdefault('Checkpoint', {})['Path'] = ''
+    data.setdefault('Maintenance_UI', {})['Port'] = 0
+    data.setdefault('Metrics', {})['Enabled'] = False
+    # Scripted probes bypass the driver, so agents are polled rather than pushed to
+    data['Fault_Events'] = {'Enabled': False}
+    data['Logging'] = dict(data.get('Logging') or {}, File=os.path.join(tmp, 'fleet_log.txt'), Level='WARNING')
+    hardware = data['Hardware']
+    hardware['Check_Interval'] = interval
+    for section in HardwareInterface.COMPONENT_SECTIONS.values():
+        hardware.setdefault(section, {})['Check_Interval'] = interval
+    return ATMConfig(data)
+
+def create_agent(config: ATMConfig, seed: int, args) -> ATMSystem:
+    atm = ATMSystem(config)
+    rng = random.Random(seed)
+    for component in atm.hardware._probes:
+        atm.hardware._probes[component] = ScriptedSensor(
+            component, rng, args.fault_rate, args.unknown_rate, args.probe_latency_ms / 1000
+        )
+    return atm
+
+def time_checks(atm: ATMSystem, samples: List[float]):
+    """
+    Record the latency of every scheduled component check
+    """
+    check = atm._check_component
+
+    async def timed(component: str):
+        started = time.perf_counter()
+        try:
+            await check(component)
+        finally:
+            samples.append(time.perf_counter() - started)
+
+    atm._check_component = timed
+
+async def technician(agents: List[ATMSystem], delay: float):
+    """
+    Repair agents stuck in maintenance mode, as a site visit would
+    """
+    since: Dict[int, float] = {}
+    while True:
+        await asyncio.sleep(0.5)
+        now = time.monotonic()
+        for index, atm in enumerate(agents):
+            if not atm.in_maintenance:
+                since.pop(index, None)
+                continue
+            if now - since.setdefault(index, now) >= delay:
+                await asyncio.to_thread(atm._ui_attempt_repair, {})
+                since.pop(index, None)
+
+async def run_fleet(agents: List[ATMSystem], duration: float, technician_delay: float):
+    tasks = [asyncio.create_task(atm.run_async()) for atm in agents]
+    visits = asyncio.create_task(technician(agents, technician_delay))
+    await asyncio.sleep(duration)
+    for atm in agents:
+        if atm.scheduler is not None:
+            atm.scheduler.stop()
+    visits.cancel()
+    await asyncio.gather(*tasks, visits, return_exceptions=True)
+
+def counter_total(name: str, **labels) -> float:
+    metric = REGISTRY.get(name)
+    if metric is None:
+        return 0
+    return sum(value for key, value in metric._values.items()
+               if all(dict(zip(metric.labelnames, key)).get(k) == v for k, v in labels.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--agents', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=20, help='seconds of steady-state run')
+    parser.add_argument('--interval', type=float, default=1, help='per-component check interval (s)')
+    parser.add_argument('--fault-rate', type=float, default=0.05, help='probability a probe reports a fault')
+    parser.add_argument('--unknown-rate', type=float, default=0.2,
+                        help='share of faults unknown to the rules table (sent to the AI stub)')
+    parser.add_argument('--probe-latency-ms', type=float, default=5)
+    parser.add_argument('--ai-latency-ms', type=float, default=50)
+    parser.add_argument('--technician-delay', type=float, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--config', default=os.path.join(SRC_DIR, '..', 'config', 'settings.yml'))
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        base = yaml.safe_load(f)
+    stub = start_stub(args.ai_latency_ms / 1000)
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        agents = [
+            create_agent(agent_config(base, i, tmp, stub_url, args.interval), args.seed + i, args)
+            for i in range(args.agents)
+        ]
+        created = tracemalloc.get_traced_memory()[0]
+
+        samples: List[float] = []
+        for atm in agents:
+            time_checks(atm, samples)
+        started = time.perf_counter()
+        asyncio.run(run_fleet(agents, args.duration, args.technician_delay))
+        elapsed = time.perf_counter() - started
+        steady, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        for atm in agents:
+            atm.shutdown()
+
+    n = args.agents
+    print(f"agents {n}, {elapsed:.1f}s, check interval {args.interval}s, fault rate {args.fault_rate}")
+    print(f"checks          {len(samples)} ({len(samples) / elapsed:.1f}/s)")
+    if len(samples) >= 2:
+        cuts = statistics.quantiles(samples, n=100)
+        print(f"check latency   p50 {cuts[49] * 1000:.2f} ms   p99 {cuts[98] * 1000:.2f} ms   "
+              f"max {max(samples) * 1000:.2f} ms")
+    hits = counter_total('atm_diagnosis_rule_lookups_total', result='hit')
+    misses = counter_total('atm_diagnosis_rule_lookups_total', result='miss')
+    print(f"diagnoses       rules {hits:.0f}   AI {misses:.0f}   AI stub calls {stub.stats['ai_calls']}")
+    print(f"maintenance     {counter_total('atm_maintenance_entries_total'):.0f} entries")
+    print(f"notifications   {stub.stats['events']} events in {stub.stats['batches']} batches "
+          f"({stub.stats['events'] / elapsed:.1f} events/s, {stub.stats['batches'] / elapsed:.1f} batches/s)")
+    print(f"memory/agent    {(created - baseline) / n / 1024:.0f} KiB at init   "
+          f"{(steady - baseline) / n / 1024:.0f} KiB after run   (traced peak {peak / 1024 / 1024:.1f} MiB)")
+    print(f"process maxrss  {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB   "
+          f"threads {threading.active_count()}")
+    stub.shutdown()
+
+if __name__ == '__main__':
+    main()
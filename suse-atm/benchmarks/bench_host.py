@@ -0,0 +1,134 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Memory and threads per ATM agent: one process per ATM versus host mode
+
+Each measurement runs in a fresh child process on the SimulatedDriver:
+a standalone ATMSystem (what every terminal runs today), and ATMHost with
+1 and with N agents. Every agent gets one resettable display fault halfway
+through, so diagnosis, repair and notifications are exercised.
+
+Usage: python3 bench_host.py [--agents 50] [--duration 5] [--interval 1] [--processes 3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Dict, List
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+from config import ATMConfig, load_config, overlay_config
+from hardware import HardwareInterface
+
+def bench_config(path: str, tmp: str, interval: float) -> ATMConfig:
+    """
+    settings.yml with local-only endpoints, files in tmp and a short check interval
+    """
+    hardware = {'Check_Interval': interval, 'Driver_Options': {'Latency': 0.001, 'Reset_Time': 0.05}}
+    for section in HardwareInterface.COMPONENT_SECTIONS.values():
+        hardware[section] = {'Check_Interval': interval}
+    return overlay_config(load_config(path), {
+        'Network': {'Windows_Monitor_Endpoint': 'http://127.0.0.1:9/api/notifications'},
+        'Notification_Outbox': {'Spool_Path': ''},
+        'OpenRouteAI': {'Cache': {'Persist_Path': ''}},
+        'Maintenance_UI': {'Port': 0},
+        'Metrics': {'Enabled': False},
+        'Fault_Events': {'Fallback_Check_Interval': interval},
+        'Hardware': hardware,
+        'Logging': {'File': os.path.join(tmp, 'bench_log.txt'), 'Level': 'WARNING'}
+    })
+
+async def inject_faults(agents, delay: float):
+    await asyncio.sleep(delay)
+    for atm in agents:
+        atm.hardware.driver.set_reading('display', display_ok=False)
+
+async def run_standalone(config: ATMConfig, duration: float):
+    from main import ATMSystem
+    atm = ATMSystem(config)
+    task = asyncio.create_task(atm.run_async())
+    await inject_faults([atm], duration / 2)
+    await asyncio.sleep(duration / 2)
+    sample = usage()
+    atm.shutdown()
+    await asyncio.gather(task, return_exceptions=True)
+    return sample
+
+async def run_host(config: ATMConfig, agents: int, duration: float):
+    from host import ATMHost
+    host = ATMHost(config, [{'ATM_ID': f"SIM{index:04d}"} for index in range(agents)])
+    task = asyncio.create_task(host.run())
+    await inject_faults(list(host.agents.values()), duration / 2)
+    await asyncio.sleep(duration / 2)
+    sample = usage()
+    host.scheduler.stop()
+    await asyncio.gather(task, return_exceptions=True)
+    host.shutdown()
+    return sample
+
+def usage() -> Dict:
+    return {
+        'maxrss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'threads': threading.active_count()
+    }
+
+def child(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        config = bench_config(args.config, tmp, args.interval)
+        if args.child == 'standalone':
+            sample = asyncio.run(run_standalone(config, args.duration))
+        else:
+            sample = asyncio.run(run_host(config, args.agents, args.duration))
+    print(json.dumps(sample))
+
+def measure(args, mode: str, agents: int = 1) -> Dict:
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, '--agents', str(agents),
+         '--duration', str(args.duration), '--interval', str(args.interval), '--config', args.config],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--agents', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=5, help='seconds each child runs')
+    parser.add_argument('--interval', type=float, default=1, help='per-component check interval (s)')
+    parser.add_argument('--processes', type=int, default=3, help='standalone runs to average')
+    parser.add_argument('--config', default=os.path.abspath(os.path.join(SRC_DIR, '..', 'config', 'settings.yml')))
+    parser.add_argument('--child', choices=('standalone', 'host'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    standalone: List[Dict] = [measure(args, 'standalone') for _ in range(args.processes)]
+    single = measure(args, 'host', 1)
+    many = measure(args, 'host', args.agents)
+
+    rss = statistics.median(sample['maxrss_kib'] for sample in standalone) / 1024
+    threads = statistics.median(sample['threads'] for sample in standalone)
+    marginal = (many['maxrss_kib'] - single['maxrss_kib']) / 1024 / max(args.agents - 1, 1)
+    print(f"{args.agents} agents, {args.duration:g}s per run, check interval {args.interval:g}s")
+    print(f"{'process per ATM':<18}{rss:7.1f} MiB/agent {threads:5.0f} threads/agent   "
+          f"({rss * args.agents:.0f} MiB, {threads * args.agents:.0f} threads for {args.agents} ATMs)")
+    print(f"{'host, 1 agent':<18}{single['maxrss_kib'] / 1024:7.1f} MiB       {single['threads']:5d} threads")
+    print(f"{f'host, {args.agents} agents':<18}{many['maxrss_kib'] / 1024:7.1f} MiB       {many['threads']:5d} threads   "
+          f"({many['maxrss_kib'] / 1024 / args.agents:.2f} MiB/agent, marginal {marginal:.2f} MiB/agent, "
+          f"{many['threads'] / args.agents:.1f} threads/agent)")
+
+if __name__ == '__main__':
+    main()
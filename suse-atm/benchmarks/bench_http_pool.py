@@ -0,0 +1,92 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Compare one-connection-per-request posts against the shared pooled session
+against a local stub server, counting the TCP (and optionally TLS) handshakes
+
+Usage: python3 bench_http_pool.py [--requests 500] [--certfile cert.pem --keyfile key.pem]
+"""
+
+import argparse
+import os
+import ssl
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import requests
+import urllib3
+from http_client import get_session, get_timeouts, close_session
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def get_request(self):
+        request = super().get_request()
+        self.connections += 1
+        return request
+
+def run(label: str, post, count: int, server: CountingServer):
+    server.connections = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        post()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {count} requests in {elapsed:.3f}s "
+          f"({elapsed / count * 1000:.2f} ms/req), {server.connections} connections")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--certfile', help='serve over TLS to include handshake cost')
+    parser.add_argument('--keyfile')
+    args = parser.parse_args()
+
+    server = CountingServer(('127.0.0.1', 0), StubHandler)
+    scheme = 'http'
+    if args.certfile:
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(args.certfile, args.keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+        urllib3.disable_warnings()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url = f"{scheme}://127.0.0.1:{server.server_address[1]}/api/notifications"
+    payload = {'atm_id': 'ATM001', 'status': 'OPERATIONAL'}
+    timeout = get_timeouts()
+
+    run('unpooled', lambda: requests.post(url, json=payload, timeout=timeout, verify=False),
+        args.requests, server)
+    session = get_session()
+    run('pooled', lambda: session.post(url, json=payload, timeout=timeout, verify=False),
+        args.requests, server)
+
+    close_session()
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
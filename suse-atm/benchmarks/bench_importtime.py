@@ -0,0 +1,122 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Cold-start regression check for the ATM agent
+
+Runs `python -X importtime -c "import main"` in fresh interpreters and fails
+when the median cumulative import time of main exceeds the budget, or when a
+module that must load lazily (requests, asyncio, the AI client, the UI server)
+is pulled in at startup. Also reports process-spawn-to-first-sweep time.
+
+A warm-up run (which may compile bytecode) is discarded. The default budget
+comes from measurements: medians of 90-127 ms on an idle 1-vCPU machine
+across sessions, plus ~40% headroom for loaded CI runners. Pass --budget-ms
+to gate tighter on known hardware; the lazy-module check is exact either way.
+
+Usage: python3 bench_importtime.py [--runs 9] [--budget-ms 180] [--top 10]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+CONFIG_PATH = os.path.abspath(os.path.join(SRC_DIR, '..', 'config', 'settings.yml'))
+
+# Largest measured median (127 ms) plus ~40% headroom, see the module docstring
+DEFAULT_BUDGET_MS = 180
+
+# Must not be imported before the first fault / maintenance entry
+LAZY_MODULES = ('requests', 'asyncio', 'ai_monitor', 'ui_server', 'http.server', 'webbrowser',
+                'multiprocessing', 'numpy')
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+FIRST_SWEEP = """
+import json, sys, time
+import main
+atm = main.ATMSystem(sys.argv[1])
+atm._initial_sweep()
+swept = time.time()
+atm.shutdown()
+print(json.dumps({'swept': swept}))
+"""
+
+def import_profile(env: dict, cwd: str) -> dict:
+    """
+    Cumulative import time in microseconds of main and every module it pulled in
+    (interpreter startup imports such as site are excluded)
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    # Children are printed before their parent; a top-level line closes a subtree
+    subtree = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        module, top_level = match.group(4), len(match.group(3)) == 1
+        subtree[module] = int(match.group(2))
+        if top_level:
+            if module == 'main':
+                return subtree
+            subtree = {}
+    raise RuntimeError("main not found in -X importtime output")
+
+def first_sweep_ms(env: dict, cwd: str) -> float:
+    """
+    Wall time from spawning the interpreter to the end of the first sweep
+    """
+    started = time.time()
+    output = subprocess.run(
+        [sys.executable, '-c', FIRST_SWEEP, CONFIG_PATH],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return (json.loads(output.strip().splitlines()[-1])['swept'] - started) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=9)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='maximum median cumulative import time of main')
+    parser.add_argument('--top', type=int, default=10, help='slowest modules to list')
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    with tempfile.TemporaryDirectory() as tmp:
+        import_profile(env, tmp)
+        profiles = [import_profile(env, tmp) for _ in range(args.runs)]
+        sweeps = [first_sweep_ms(env, tmp) for _ in range(args.runs)]
+
+    main_ms = statistics.median(p['main'] for p in profiles) / 1000
+    print(f"import main        median {main_ms:7.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print(f"spawn->first sweep median {statistics.median(sweeps):7.1f} ms")
+
+    last = profiles[-1]
+    print(f"slowest imports (cumulative, last run):")
+    for module, micros in sorted(last.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {micros / 1000:7.1f} ms  {module}")
+
+    failures = []
+    if main_ms > args.budget_ms:
+        failures.append(f"import time {main_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+    eager = [module for module in LAZY_MODULES if any(module in profile for profile in profiles)]
+    if eager:
+        failures.append(f"imported at startup but should be lazy: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Measure how much log calls add to a monitoring tick with the old synchronous
+FileHandler and with the queue-backed rotating backend from logger.setup_logger
+
+Each backend runs twice: on the local disk as-is, and with --io-delay-ms of
+simulated storage latency per write (slow flash on embedded ATM hardware)
+
+Only the log calls are timed. The simulated latency ends with the measured
+window, so draining the queue at shutdown is quick and not counted; the
+records still queued at that point are reported. Mean, p99 and max are
+compared with the FileHandler: the queue takes storage latency off the
+calling thread, but on fast storage the writer thread competes for the GIL
+and can make the tail worse.
+
+Usage: python3 bench_logging.py [--ticks 1000] [--calls-per-tick 8] [--io-delay-ms 1.0]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import logger as atm_logger
+from logger import setup_logger, shutdown_logger
+
+def logger_handlers() -> list:
+    """
+    The file handlers behind the background writer
+    """
+    return list(atm_logger._listener.handlers)
+
+def run_ticks(logger: logging.Logger, ticks: int, calls_per_tick: int) -> list:
+    """
+    Time the log calls of each simulated _main_loop tick, in microseconds
+    """
+    samples = []
+    details = {'error_type': 'LOW_PAPER', 'current_level': 80, 'threshold': 100}
+    for tick in range(ticks):
+        started = time.perf_counter()
+        for call in range(calls_per_tick):
+            logger.warning(f"Error detected in printer: {details} ({tick}/{call})")
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+def add_io_delay(handler: logging.Handler, delay_ms: float, slow: threading.Event):
+    """
+    Make every write on the handler pay `delay_ms` like a slow storage device,
+    while `slow` is set
+    """
+    if not delay_ms:
+        return
+    emit = handler.emit
+
+    def slow_emit(record):
+        if slow.is_set():
+            time.sleep(delay_ms / 1000)
+        emit(record)
+    handler.emit = slow_emit
+
+def summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        'mean': statistics.mean(samples),
+        'p50': statistics.median(samples),
+        'p99': samples[max(int(len(samples) * 0.99) - 1, 0)],
+        'max': samples[-1]
+    }
+
+def report(label: str, stats: dict, baseline: dict = None, backlog: int = None):
+    line = (f"{label:<12} mean {stats['mean']:8.1f} us/tick   p50 {stats['p50']:8.1f}   "
+            f"p99 {stats['p99']:8.1f}   max {stats['max']:9.1f}")
+    if baseline is not None:
+        # Below 1x the queue is slower than the FileHandler
+        line += (f"   speedup mean {baseline['mean'] / stats['mean']:5.2f}x  "
+                 f"p99 {baseline['p99'] / stats['p99']:5.2f}x")
+    if backlog is not None:
+        line += f"   {backlog} records queued at end"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--calls-per-tick', type=int, default=8)
+    parser.add_argument('--io-delay-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    for delay_ms in sorted({0, args.io_delay_ms}):
+        print(f"-- storage latency {delay_ms} ms/write")
+        with tempfile.TemporaryDirectory() as tmp:
+            # Previous backend: plain FileHandler on the calling thread
+            logger = logging.getLogger('ATMLogger')
+            logger.setLevel(logging.INFO)
+            handler = logging.FileHandler(os.path.join(tmp, 'sync.txt'))
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+            slow = threading.Event()
+            slow.set()
+            add_io_delay(handler, delay_ms, slow)
+            logger.addHandler(handler)
+            baseline = summarize(run_ticks(logger, args.ticks, args.calls_per_tick))
+            report('FileHandler', baseline)
+            logger.removeHandler(handler)
+            handler.close()
+
+            for log_format in ('text', 'json'):
+                logger = setup_logger({
+                    'File': os.path.join(tmp, f'queued_{log_format}.txt'),
+                    'Max_Size': 1048576,
+                    'Backup_Count': 2,
+                    'Format': log_format
+                })
+                slow = threading.Event()
+                slow.set()
+                for writer in logger_handlers():
+                    add_io_delay(writer, delay_ms, slow)
+                stats = summarize(run_ticks(logger, args.ticks, args.calls_per_tick))
+                backlog = atm_logger._listener.queue.qsize()
+                # The measured window is over; drain at local disk speed
+                slow.clear()
+                report(f'queued/{log_format}', stats, baseline, backlog)
+                shutdown_logger()
+
+if __name__ == '__main__':
+    main()
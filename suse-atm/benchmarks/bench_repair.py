@@ -0,0 +1,116 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Time from fault to recovery when several devices fail at once (power glitch)
+
+Uses the SimulatedDriver with a per-device reset time and compares resetting
+the failed devices one after another against HardwareInterface.reset_devices(),
+then measures the full agent path: sweep -> rules -> batched repair -> recovery.
+
+Usage: python3 bench_repair.py [--runs 5] [--reset-ms 500] [--latency-ms 5]
+                               [--devices card_reader,printer,display]
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+import yaml
+from config import ATMConfig
+from drivers import SimulatedDriver
+from hardware import HardwareInterface
+from main import ATMSystem
+
+# Readings that put each device into a resettable fault
+GLITCH = {
+    'cash_dispenser': {'jammed': True},
+    'card_reader': {'connected': False},
+    'printer': {'connected': False},
+    'display': {'display_ok': False}
+}
+
+def glitch(driver: SimulatedDriver, devices):
+    for device in devices:
+        driver.set_reading(device, **GLITCH[device])
+
+def serial_recovery(hardware: HardwareInterface, devices) -> float:
+    started = time.perf_counter()
+    for device in devices:
+        hardware.reset_device(device)
+        assert hardware.probe_component(device)['status']
+    return time.perf_counter() - started
+
+def parallel_recovery(hardware: HardwareInterface, devices) -> float:
+    started = time.perf_counter()
+    assert all(hardware.reset_devices(devices).values())
+    status = hardware.get_full_status()
+    assert all(status[device]['status'] for device in devices)
+    return time.perf_counter() - started
+
+def agent_recovery(atm: ATMSystem, devices, timeout: float = 60) -> float:
+    """
+    Inject the glitch, run one sweep and wait until every device reports OK again
+    """
+    glitch(atm.hardware.driver, devices)
+    atm.hardware.snapshots.invalidate()
+    started = time.perf_counter()
+    atm._initial_sweep()
+    while time.perf_counter() - started < timeout:
+        if all(atm.component_status[device]['status'] for device in devices):
+            return time.perf_counter() - started
+        time.sleep(0.005)
+    raise RuntimeError("agent did not recover")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--reset-ms', type=float, default=500, help='time a device takes to come back')
+    parser.add_argument('--latency-ms', type=float, default=5, help='device link round-trip')
+    parser.add_argument('--devices', default='card_reader,printer,display')
+    parser.add_argument('--config', default=os.path.join(SRC_DIR, '..', 'config', 'settings.yml'))
+    args = parser.parse_args()
+
+    devices = args.devices.split(',')
+    with open(args.config, 'r') as f:
+        data = yaml.safe_load(f)
+    data['Hardware']['Driver_Options'] = {'Latency': args.latency_ms / 1000, 'Reset_Time': args.reset_ms / 1000}
+
+    samples = {'serial': [], 'parallel': []}
+    for _ in range(args.runs):
+        for label, recover in (('serial', serial_recovery), ('parallel', parallel_recovery)):
+            hardware = HardwareInterface(ATMConfig(data))
+            glitch(hardware.driver, devices)
+            samples[label].append(recover(hardware, devices))
+            hardware.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        agent = copy.deepcopy(data)
+        agent['Notification_Outbox']['Spool_Path'] = ''
+        agent['Error_History']['Spill_Path'] = ''
+        agent['OpenRouteAI']['Cache']['Persist_Path'] = ''
+        atm = ATMSystem(ATMConfig(agent))
+        atm.diagnosis_pool.start()
+        samples['agent'] = []
+        try:
+            for _ in range(args.runs):
+                samples['agent'].append(agent_recovery(atm, devices))
+        finally:
+            atm.shutdown()
+
+    print(f"{len(devices)} devices, reset {args.reset_ms:.0f} ms, link {args.latency_ms:.0f} ms, {args.runs} runs")
+    for label, values in samples.items():
+        print(f"{label:<9} fault->recovery median {statistics.median(values) * 1000:8.1f} ms   "
+              f"max {max(values) * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
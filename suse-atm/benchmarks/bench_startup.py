@@ -0,0 +1,99 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+"""
+Measure ATM agent startup: settings.yml parsing (four separate parses as the
+components used to do vs the single shared ATMConfig, with the same YAML
+loader; the C loader's own effect is reported separately) and import +
+ATMSystem initialization in fresh interpreters
+
+Usage: python3 bench_startup.py [--runs 10] [--config ../config/settings.yml]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+import yaml
+from config import _YAML_LOADER, load_config
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+atm = main.ATMSystem(sys.argv[1])
+initialized = time.perf_counter()
+atm.shutdown()
+print(json.dumps({'import': imported - started, 'init': initialized - imported}))
+"""
+
+def time_parsing(path: str, repeat: int = 200):
+    """
+    Per-startup cost of four raw parses vs one validated ATMConfig, in milliseconds
+    The parse-once saving is measured with load_config's own loader; the
+    legacy pure-Python yaml.safe_load is reported separately, as the loader effect
+    """
+    def four_parses(loader) -> float:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for _ in range(4):
+                with open(path, 'r') as f:
+                    yaml.load(f, Loader=loader)
+        return (time.perf_counter() - started) / repeat * 1000
+
+    legacy = four_parses(yaml.SafeLoader)
+    same_loader = four_parses(_YAML_LOADER)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        load_config(path)
+    shared = (time.perf_counter() - started) / repeat * 1000
+
+    print(f"config parse   4 x {_YAML_LOADER.__name__} {same_loader:7.2f} ms   "
+          f"1 x load_config {shared:7.2f} ms   (parse once: {same_loader / shared:.1f}x)")
+    print(f"yaml loader    4 x SafeLoader {legacy:7.2f} ms   "
+          f"4 x {_YAML_LOADER.__name__} {same_loader:7.2f} ms   (loader: {legacy / same_loader:.1f}x)")
+
+def time_cold_start(path: str, runs: int):
+    """
+    Import + initialization time in fresh interpreters, run from a scratch
+    directory so logs, spools and caches don't touch the working tree
+    """
+    samples = {'import': [], 'init': []}
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(SRC_DIR))
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', CHILD, path],
+                cwd=tmp, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            for key in samples:
+                samples[key].append(result[key] * 1000)
+
+    for key, values in samples.items():
+        print(f"cold {key:<9} median {statistics.median(values):7.1f} ms   "
+              f"min {min(values):7.1f} ms   max {max(values):7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--config', default=os.path.join(SRC_DIR, '..', 'config', 'settings.yml'))
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.config)
+    time_parsing(path)
+    time_cold_start(path, args.runs)
+
+if __name__ == '__main__':
+    main()
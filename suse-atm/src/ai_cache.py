@@ -0,0 +1,137 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+class DiagnosisCache:
+    """
+    TTL + LRU cache of AI diagnoses keyed on a normalized sensor signature
+    """
+    def __init__(self, config: Optional[Dict] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        config = config or {}
+        self.ttl = config.get('TTL', 900)
+        self.max_entries = config.get('Max_Entries', 256)
+        self.bucket_size = config.get('Bucket_Size', 50)
+        self.persist_path = config.get('Persist_Path') or None
+
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.persist_path:
+            self._load()
+
+    def make_key(self, sensor_data: Dict) -> str:
+        """
+        Build a canonical hash of component, error type and bucketed sensor values
+        so readings that only drift slightly share one diagnosis
+        """
+        error = sensor_data.get('error') or {}
+        signature = {
+            'component': sensor_data.get('component'),
+            'error_type': error.get('error_type'),
+            'values': self._normalize({k: v for k, v in error.items() if k != 'error_type'})
+        }
+        canonical = json.dumps(signature, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Get a cached diagnosis, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Dict):
+        """
+        Cache a diagnosis, evicting the least recently used entries beyond Max_Entries
+        """
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        if self.persist_path:
+            self.save()
+
+    def stats(self) -> Dict:
+        """
+        Get hit/miss counters and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries)
+            }
+
+    def save(self):
+        """
+        Write unexpired entries to Persist_Path atomically
+        """
+        if not self.persist_path:
+            return
+        try:
+            now = time.time()
+            with self._lock:
+                entries = [[k, exp, v] for k, (exp, v) in self._entries.items() if exp >= now]
+            tmp_path = f"{self.persist_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            self.logger.error(f"Failed to persist diagnosis cache: {str(e)}")
+
+    def _load(self):
+        """
+        Warm the cache from Persist_Path, skipping expired entries
+        """
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, 'r') as f:
+                entries = json.load(f)
+            now = time.time()
+            for key, expires_at, value in entries[-self.max_entries:]:
+                if expires_at >= now:
+                    self._entries[key] = (expires_at, value)
+            self.logger.info(f"Loaded {len(self._entries)} cached diagnoses")
+        except Exception as e:
+            self.logger.error(f"Failed to load diagnosis cache: {str(e)}")
+
+    def _normalize(self, value: Any) -> Any:
+        """
+        Recursively bucket numeric values and sort mappings
+        """
+        if isinstance(value, bool) or value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)):
+            if not self.bucket_size:
+                return value
+            return int(value // self.bucket_size) * self.bucket_size
+        if isinstance(value, dict):
+            return {str(k): self._normalize(v) for k, v in sorted(value.items())}
+        if isinstance(value, (list, tuple)):
+            return [self._normalize(v) for v in value]
+        return str(value)
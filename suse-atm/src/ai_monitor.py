@@ -3,24 +3,52 @@
 # All rights reserved.
 
 import logging
-import yaml
-import json
 import requests
-from typing import Dict, Tuple, Optional
-from time import sleep
+from typing import Dict, Tuple, Optional, Union
+from time import monotonic, sleep
+from ai_cache import DiagnosisCache
+from circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError, get_breaker
+from http_client import get_session, get_timeouts
+from history_store import ErrorHistoryStore
+from prompt_builder import PromptBuilder
+from config import ATMConfig, DEFAULT_CONFIG_PATH, resolve_config
+from metrics import REGISTRY
+
+AI_LATENCY = REGISTRY.histogram(
+    'atm_ai_request_duration_seconds', 'OpenRoute AI call latency by outcome', ('outcome',)
+)
+AI_RETRIES = REGISTRY.counter('atm_ai_retries_total', 'AI diagnosis calls retried after a network error')
 
 class AIMonitor:
-    def __init__(self, config_path: str = "../config/settings.yml"):
+    def __init__(self, config: Union[ATMConfig, str] = DEFAULT_CONFIG_PATH):
         self.logger = logging.getLogger('ATMLogger')
-        with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
-            self.ai_config = config['OpenRouteAI']
-            self.maintenance_config = config['Maintenance_Thresholds']
+        self.reconfigure(resolve_config(config))
+        self.cache = DiagnosisCache(self.ai_config.get('Cache'))
+
+    def reconfigure(self, config: ATMConfig):
+        """
+        Apply a (re)loaded configuration
+        """
+        self.ai_config = config.openroute_ai
+        self.maintenance_config = config.maintenance_thresholds.to_dict()
+        self.http_config = config.http
+        # Thresholds are serialized here once, not on every prompt
+        self.prompts = PromptBuilder(self.maintenance_config, self.ai_config.get('Prompt'))
         
         self.api_key = self.ai_config['API_Key']
         self.endpoint = self.ai_config['Endpoint']
         self.max_retries = self.ai_config['Max_Retries']
         self.timeout = self.ai_config['Timeout']
+        self.breaker: CircuitBreaker = get_breaker(
+            self.endpoint, self.ai_config.get('Circuit_Breaker'), self.timeout
+        )
+
+    @property
+    def available(self) -> bool:
+        """
+        False while the endpoint's circuit is open and calls would fail fast
+        """
+        return self.breaker.state != OPEN
 
     def diagnose_issue(self, sensor_data: Dict) -> Tuple[str, Dict]:
         """
@@ -28,6 +56,12 @@ class AIMonitor:
         Returns: (issue_type, diagnosis_details)
         """
         try:
+            # Serve persisting faults from the cache instead of asking again
+            cache_key = self.cache.make_key(sensor_data)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached['issue_type'], cached['details']
+
             # Prepare the prompt for AI analysis
             prompt = self._prepare_diagnostic_prompt(sensor_data)
             
@@ -36,12 +70,17 @@ class AIMonitor:
                 try:
                     response = self._call_openroute_ai(prompt)
                     diagnosis = self._parse_ai_response(response)
+                    self.cache.put(cache_key, diagnosis)
                     return diagnosis['issue_type'], diagnosis['details']
                 except requests.RequestException as e:
                     if attempt == self.max_retries - 1:
                         raise
+                    AI_RETRIES.inc()
                     sleep(2 ** attempt)  # Exponential backoff
-                    
+
+        except CircuitOpenError as e:
+            self.logger.warning(f"AI diagnosis skipped: {str(e)}")
+            return 'AI_UNAVAILABLE', {'error': str(e), 'circuit': self.breaker.snapshot()}
         except Exception as e:
             self.logger.error(f"AI diagnosis failed: {str(e)}")
             return 'DIAGNOSIS_ERROR', {'error': str(e)}
@@ -49,7 +88,8 @@ class AIMonitor:
     def perform_self_repair(self, issue_type: str, diagnosis_details: Dict) -> Tuple[bool, Optional[Dict]]:
         """
         Attempt self-repair based on AI diagnosis
-        Returns: (success, repair_details if any)
+        Returns: (success, repair_details if any); details with error_type
+        AI_UNAVAILABLE mean the circuit was open and no repair was attempted
         """
         try:
             # Generate repair strategy using AI
@@ -65,7 +105,11 @@ class AIMonitor:
             else:
                 self.logger.warning(f"Self-repair failed for issue: {issue_type}")
                 return False, {"failed_repair": repair_strategy}
-                
+
+        except CircuitOpenError as e:
+            # Nothing was tried; the caller defers instead of escalating
+            self.logger.warning(f"Repair strategy unavailable: {str(e)}")
+            return False, {"error_type": "AI_UNAVAILABLE", "error": str(e), "circuit": self.breaker.snapshot()}
         except Exception as e:
             self.logger.error(f"Self-repair failed: {str(e)}")
             return False, {"error": str(e)}
@@ -74,39 +118,46 @@ class AIMonitor:
         """
         Prepare a detailed prompt for AI diagnosis
         """
-        return json.dumps({
-            "task": "diagnose_atm_issue",
-            "sensor_data": sensor_data,
-            "thresholds": self.maintenance_config
-        })
+        return self.prompts.diagnostic(sensor_data)
 
     def _prepare_repair_prompt(self, issue_type: str, diagnosis_details: Dict) -> str:
         """
         Prepare a prompt for AI repair strategy
         """
-        return json.dumps({
-            "task": "generate_repair_strategy",
-            "issue_type": issue_type,
-            "diagnosis": diagnosis_details,
-            "maintenance_thresholds": self.maintenance_config
-        })
+        return self.prompts.repair(issue_type, diagnosis_details)
 
     def _call_openroute_ai(self, prompt: str) -> Dict:
         """
-        Make API call to OpenRoute AI
+        Make API call to OpenRoute AI through the endpoint's circuit breaker
+        Raises CircuitOpenError without touching the network while the circuit is open
         """
+        self.breaker.before_call()
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
-        response = requests.post(
-            self.endpoint,
-            headers=headers,
-            json={"prompt": prompt},
-            timeout=self.timeout
-        )
-        
+        started = monotonic()
+        try:
+            response = get_session(self.http_config).post(
+                self.endpoint,
+                headers=headers,
+                json={"prompt": prompt},
+                timeout=get_timeouts(self.http_config, self.breaker.timeout())
+            )
+        except requests.RequestException:
+            self.breaker.record_failure()
+            AI_LATENCY.observe(monotonic() - started, outcome='failure')
+            raise
+        AI_LATENCY.observe(monotonic() - started,
+                           outcome='success' if response.status_code == 200 else 'http_error')
+
+        # Client errors are our fault, not a sign the endpoint is unhealthy
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success(monotonic() - started)
+
         if response.status_code != 200:
             raise Exception(f"AI API call failed: {response.text}")
             
@@ -150,17 +201,19 @@ class AIMonitor:
             self.logger.error(f"Failed to execute repair strategy: {str(e)}")
             return False
 
-    def get_maintenance_recommendation(self, error_history: list) -> Dict:
+    def get_maintenance_recommendation(self, error_history: Union[list, ErrorHistoryStore],
+                                       window_seconds: Optional[float] = None,
+                                       analytics: Optional[Dict] = None) -> Dict:
         """
         Get AI recommendation for maintenance based on error history
+        The history is sent as counts per error type and time bucket, over the
+        last window_seconds (default Error_History.Recommendation_Window for a
+        store, the whole list otherwise), within the prompt size budget,
+        together with the latest failure analytics when given
         """
         try:
-            prompt = json.dumps({
-                "task": "maintenance_recommendation",
-                "error_history": error_history,
-                "thresholds": self.maintenance_config
-            })
-            
+            prompt = self.prompts.recommendation(error_history, window_seconds, analytics)
+
             response = self._call_openroute_ai(prompt)
             return {
                 "recommended_action": response.get("recommendation"),
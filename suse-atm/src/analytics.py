@@ -0,0 +1,229 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import bisect
+import logging
+import math
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from metrics import REGISTRY
+
+# multiprocessing, asyncio and NumPy are imported on first use; NumPy is
+# optional and only ever loaded in the analytics worker processes
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from history_store import ErrorHistoryStore
+
+ANALYTICS_DURATION = REGISTRY.histogram(
+    'atm_analytics_duration_seconds', 'Time from history snapshot to published analytics'
+)
+ANALYTICS_RUNS = REGISTRY.counter('atm_analytics_runs_total', 'Analytics runs by result', ('result',))
+
+class AnalyticsEngine:
+    """
+    Failure rates, time between failures and failure risk per component
+    The error history is snapshotted into columns and the statistics are
+    computed in a worker process, so the number crunching never holds the
+    monitoring process's GIL; results go to subscribers when ready
+    """
+    def __init__(self, config: Optional[Dict] = None, executor: Optional['Executor'] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        self.reconfigure(config)
+        # A shared executor (host mode) is shut down by its owner
+        self._owns_executor = executor is None
+        self._executor = executor
+        self.latest: Optional[Dict] = None
+        self._subscribers: List[Callable[[Dict], None]] = []
+
+    def reconfigure(self, config: Optional[Dict]):
+        """
+        Apply a (re)loaded configuration; Workers only takes effect on restart
+        """
+        config = config or {}
+        self.enabled = config.get('Enabled', True)
+        self.interval = config.get('Interval', 300)
+        self.workers = config.get('Workers', 1)
+        self.history_window = config.get('History_Window', 2592000)
+        self.risk_alert = config.get('Risk_Alert', 0.8)
+        self.min_failures = config.get('Min_Failures', 3)
+        self.params = {
+            'windows': tuple(config.get('Windows') or (3600, 86400, 604800)),
+            'fault_gap': config.get('Fault_Gap', 600),
+            'bucket_seconds': config.get('Bucket_Seconds', 3600),
+            'rolling_buckets': max(config.get('Rolling_Buckets', 48), 1),
+            'rolling_span': max(config.get('Rolling_Span', 6), 1),
+            'horizon': config.get('Horizon', 3600)
+        }
+
+    def subscribe(self, callback: Callable[[Dict], None]):
+        """
+        Call callback(results) on the event loop after every successful run
+        """
+        self._subscribers.append(callback)
+
+    async def refresh(self, store: 'ErrorHistoryStore') -> Optional[Dict]:
+        """
+        Snapshot the history, analyse it off the event loop and publish the results
+        Returns: the results, or None if the run failed
+        """
+        import asyncio
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            columns = await asyncio.to_thread(store.columns, time.time() - self.history_window)
+            if self.workers > 0:
+                results = await loop.run_in_executor(
+                    self._get_executor(), compute_analytics, columns, time.time(), self.params
+                )
+            else:
+                results = await asyncio.to_thread(compute_analytics, columns, time.time(), self.params)
+        except Exception as e:
+            self.logger.error(f"Analytics run failed: {str(e)}")
+            ANALYTICS_RUNS.inc(result='failed')
+            if self._owns_executor and getattr(self._executor, '_broken', False):
+                # A worker process died; the next run starts a fresh pool
+                self.close()
+            return None
+
+        self.latest = results
+        ANALYTICS_RUNS.inc(result='ok')
+        ANALYTICS_DURATION.observe(time.perf_counter() - started)
+        for callback in self._subscribers:
+            try:
+                callback(results)
+            except Exception as e:
+                self.logger.error(f"Failed to publish analytics: {str(e)}")
+        return results
+
+    def at_risk(self, results: Optional[Dict] = None) -> Dict[str, float]:
+        """
+        Components whose failure risk reaches Risk_Alert, with at least
+        Min_Failures faults in the shortest window so a single fault never alerts
+        """
+        results = results if results is not None else self.latest
+        if not results or not self.risk_alert:
+            return {}
+        shortest = str(min(self.params['windows']))
+        return {
+            component: stats['risk'] for component, stats in results['components'].items()
+            if stats['risk'] >= self.risk_alert and stats['failures'].get(shortest, 0) >= self.min_failures
+        }
+
+    def close(self):
+        """
+        Stop the worker processes without waiting for a running analysis
+        """
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> 'Executor':
+        if self._executor is None:
+            self._executor = create_executor(self.workers)
+        return self._executor
+
+def create_executor(workers: int) -> 'Executor':
+    """
+    Process pool for analytics; processes are spawned (not forked from a
+    threaded agent) on the first run
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+def compute_analytics(columns: Dict, now: float, params: Dict) -> Dict:
+    """
+    Per component statistics over a columnar history snapshot
+    ({'ts', 'component', 'components'}, see ErrorHistoryStore.columns):
+    failures and failures/hour per window, a rolling failures/hour series,
+    mean time between failures, trend (shortest vs longest window rate) and
+    the Poisson probability of a failure within the horizon
+    A fault is recorded once per repair attempt and renotification, so entries
+    of a component within fault_gap seconds of the previous one count as one failure
+    Runs in a worker process; uses NumPy when installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    per_component = _component_stats_numpy if numpy is not None else _component_stats_python
+
+    components = {}
+    for code, name in enumerate(columns['components']):
+        stats = per_component(columns, code, now, params)
+        if stats is not None:
+            components[name] = stats
+    return {
+        'generated_at': datetime.fromtimestamp(now).isoformat(),
+        'entries': len(columns['ts']),
+        'backend': 'numpy' if numpy is not None else 'python',
+        'components': components
+    }
+
+def _component_stats_numpy(columns: Dict, code: int, now: float, params: Dict) -> Optional[Dict]:
+    import numpy as np
+    ts = np.frombuffer(columns['ts'], dtype=np.float64)
+    codes = np.frombuffer(columns['component'], dtype=np.int32)
+    ts = np.sort(ts[codes == code])
+    if not ts.size:
+        return None
+    if params['fault_gap'] > 0:
+        ts = ts[np.concatenate(([True], np.diff(ts) > params['fault_gap']))]
+
+    windows = params['windows']
+    counts = ts.size - np.searchsorted(ts, now - np.asarray(windows, dtype=np.float64))
+    width, buckets, span = params['bucket_seconds'], params['rolling_buckets'], params['rolling_span']
+    start = now - width * buckets
+    recent = ts[ts >= start]
+    per_bucket = np.bincount(
+        np.minimum(((recent - start) // width).astype(np.int64), buckets - 1), minlength=buckets
+    )
+    # Mean over the last `span` buckets at each point, via a running sum
+    cumulative = np.concatenate(([0], np.cumsum(per_bucket)))
+    lower = np.maximum(np.arange(1, buckets + 1) - span, 0)
+    rolling = (cumulative[1:] - cumulative[lower]) / (np.arange(1, buckets + 1) - lower)
+    gaps = np.diff(ts)
+    return _stats(
+        windows, counts.tolist(), (rolling * 3600 / width).tolist(),
+        float(gaps.mean()) if gaps.size else None, float(ts[-1]), params
+    )
+
+def _component_stats_python(columns: Dict, code: int, now: float, params: Dict) -> Optional[Dict]:
+    ts = sorted(t for t, c in zip(columns['ts'], columns['component']) if c == code)
+    if not ts:
+        return None
+    if params['fault_gap'] > 0:
+        ts = [t for index, t in enumerate(ts) if not index or t - ts[index - 1] > params['fault_gap']]
+
+    windows = params['windows']
+    counts = [len(ts) - bisect.bisect_left(ts, now - window) for window in windows]
+    width, buckets, span = params['bucket_seconds'], params['rolling_buckets'], params['rolling_span']
+    start = now - width * buckets
+    per_bucket = [0] * buckets
+    for t in ts[bisect.bisect_left(ts, start):]:
+        per_bucket[min(int((t - start) // width), buckets - 1)] += 1
+    rolling, total = [], 0
+    for index, count in enumerate(per_bucket):
+        total += count
+        if index >= span:
+            total -= per_bucket[index - span]
+        rolling.append(total / min(index + 1, span) * 3600 / width)
+    mtbf = (ts[-1] - ts[0]) / (len(ts) - 1) if len(ts) > 1 else None
+    return _stats(windows, counts, rolling, mtbf, ts[-1], params)
+
+def _stats(windows, counts: List[int], rolling: List[float], mtbf: Optional[float],
+           last: float, params: Dict) -> Dict:
+    rates = [count * 3600 / window for count, window in zip(counts, windows)]
+    shortest = min(range(len(windows)), key=lambda index: windows[index])
+    longest = max(range(len(windows)), key=lambda index: windows[index])
+    return {
+        'failures': {str(window): int(count) for window, count in zip(windows, counts)},
+        'failure_rate': {str(window): round(rate, 4) for window, rate in zip(windows, rates)},
+        'rolling_rate': [round(rate, 4) for rate in rolling],
+        'mtbf_seconds': round(mtbf, 1) if mtbf is not None else None,
+        'last_failure': datetime.fromtimestamp(last).isoformat(),
+        'trend': round(rates[shortest] / rates[longest], 2) if rates[longest] else None,
+        'risk': round(1 - math.exp(-rates[shortest] / 3600 * params['horizon']), 3)
+    }
@@ -0,0 +1,120 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from metrics import REGISTRY
+
+CHECKPOINT_DURATION = REGISTRY.histogram(
+    'atm_checkpoint_duration_seconds', 'Time to write an agent state checkpoint'
+)
+SECTIONS_WRITTEN = REGISTRY.counter(
+    'atm_checkpoint_sections_written_total', 'Checkpoint sections rewritten because they changed', ('section',)
+)
+
+class CheckpointStore:
+    """
+    Agent state checkpoints in a local SQLite file in WAL mode
+    Each section is one JSON row, rewritten only when its content changed;
+    a checkpoint commits all changed sections in one transaction, so after
+    a crash the file holds either the previous or the new checkpoint
+    """
+    def __init__(self, config: Optional[Dict] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        config = config or {}
+        self.path = config.get('Path') or None
+        self.interval = config.get('Interval', 5)
+        # Older checkpoints describe a machine that may have been serviced since
+        self.max_age = config.get('Max_Age', 3600)
+
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Serialized sections as last written, to skip unchanged ones
+        self._written: Dict[str, str] = {}
+        if self.path:
+            self._open_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Read the last checkpoint
+        Returns: {section: state}, empty if there is none or it is older than Max_Age
+        """
+        with self._lock:
+            if self._db is None:
+                return {}
+            try:
+                rows = self._db.execute("SELECT section, state FROM checkpoint").fetchall()
+            except Exception as e:
+                self.logger.error(f"Failed to read checkpoint: {str(e)}")
+                return {}
+
+        self._written = dict(rows)
+        sections = {section: json.loads(state) for section, state in rows}
+        saved_at = sections.pop('saved_at', None)
+        if saved_at is None:
+            return {}
+        if self.max_age and time.time() - saved_at > self.max_age:
+            self.logger.info(f"Ignoring checkpoint saved {time.time() - saved_at:.0f}s ago")
+            return {}
+        sections['saved_at'] = saved_at
+        return sections
+
+    def save(self, sections: Dict[str, Any]) -> int:
+        """
+        Write the sections that changed since the last checkpoint
+        Returns: number of sections written
+        """
+        started = time.perf_counter()
+        serialized = {section: json.dumps(state, default=str) for section, state in sections.items()}
+        changed = {
+            section: state for section, state in serialized.items() if self._written.get(section) != state
+        }
+        changed['saved_at'] = json.dumps(time.time())
+
+        with self._lock:
+            if self._db is None:
+                return 0
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO checkpoint (section, state) VALUES (?, ?)",
+                        changed.items()
+                    )
+            except Exception as e:
+                self.logger.error(f"Failed to write checkpoint: {str(e)}")
+                return 0
+
+        self._written.update(changed)
+        for section in changed:
+            if section != 'saved_at':
+                SECTIONS_WRITTEN.inc(section=section)
+        CHECKPOINT_DURATION.observe(time.perf_counter() - started)
+        return len(changed) - 1
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only risks the last checkpoints on power loss, never corruption
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoint (section TEXT PRIMARY KEY, state TEXT NOT NULL)"
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to open checkpoint file {self.path}: {str(e)}")
+            self._db = None
@@ -0,0 +1,170 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from metrics import REGISTRY
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+CIRCUIT_STATE = REGISTRY.gauge(
+    'atm_circuit_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open', ('endpoint',)
+)
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    'atm_circuit_rejections_total', 'Calls failed fast by an open circuit', ('endpoint',)
+)
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an endpoint whose circuit is open
+    """
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker for one endpoint, with a read timeout
+    derived from the latency percentile of recent successful calls
+    """
+    def __init__(self, name: str, config: Optional[Dict] = None, max_timeout: float = 30,
+                 clock=time.monotonic):
+        self.logger = logging.getLogger('ATMLogger')
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._latencies: deque = deque()
+        self.reconfigure(config, max_timeout)
+
+    def reconfigure(self, config: Optional[Dict], max_timeout: float):
+        """
+        Apply a (re)loaded configuration
+        """
+        config = config or {}
+        self.failure_threshold = config.get('Failure_Threshold', 5)
+        self.reset_timeout = config.get('Reset_Timeout', 60)
+        self.half_open_max_calls = config.get('Half_Open_Max_Calls', 1)
+        self.percentile = config.get('Timeout_Percentile', 0.99)
+        self.timeout_multiplier = config.get('Timeout_Multiplier', 2)
+        self.min_timeout = config.get('Min_Timeout', 2)
+        self.min_samples = config.get('Min_Samples', 10)
+        self.max_timeout = max_timeout
+        with self._lock:
+            self._latencies = deque(self._latencies, maxlen=config.get('Latency_Window', 100))
+
+    @property
+    def state(self) -> str:
+        """
+        Current state; an open circuit turns half-open once Reset_Timeout has passed
+        """
+        with self._lock:
+            return self._current_state()
+
+    def before_call(self):
+        """
+        Claim permission to call the endpoint
+        Raises CircuitOpenError while the circuit is open or its trial calls are taken
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN:
+                CIRCUIT_REJECTIONS.inc(endpoint=self.name)
+                raise CircuitOpenError(f"Circuit for {self.name} is open")
+            if state == HALF_OPEN:
+                if self._trial_calls >= self.half_open_max_calls:
+                    CIRCUIT_REJECTIONS.inc(endpoint=self.name)
+                    raise CircuitOpenError(f"Circuit for {self.name} is half-open, trial call in progress")
+                self._trial_calls += 1
+
+    def record_success(self, latency: float):
+        """
+        Record a successful call and its latency; closes a half-open circuit
+        """
+        with self._lock:
+            self._latencies.append(latency)
+            if self._state != CLOSED:
+                self.logger.info(f"Circuit for {self.name} closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_calls = 0
+            CIRCUIT_STATE.set(STATE_VALUES[CLOSED], endpoint=self.name)
+
+    def record_failure(self):
+        """
+        Record a failed call; opens the circuit after Failure_Threshold
+        consecutive failures, or on any failure while half-open
+        """
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.logger.warning(f"Circuit for {self.name} opened after "
+                                        f"{self._failures} consecutive failures")
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._trial_calls = 0
+                CIRCUIT_STATE.set(STATE_VALUES[OPEN], endpoint=self.name)
+
+    def timeout(self) -> float:
+        """
+        Read timeout for the next call: the latency percentile times
+        Timeout_Multiplier, clamped to [Min_Timeout, max_timeout]
+        Returns max_timeout until Min_Samples latencies have been observed
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.max_timeout
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)
+        adaptive = ordered[max(index, 0)] * self.timeout_multiplier
+        return min(max(adaptive, self.min_timeout), self.max_timeout)
+
+    def snapshot(self) -> Dict:
+        """
+        Get the breaker state for status reporting
+        """
+        timeout = self.timeout()
+        with self._lock:
+            state = self._current_state()
+            return {
+                'endpoint': self.name,
+                'state': state,
+                'consecutive_failures': self._failures,
+                'retry_in': max(self._opened_at + self.reset_timeout - self._clock(), 0)
+                            if state == OPEN else 0,
+                'timeout': timeout,
+                'samples': len(self._latencies)
+            }
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trial_calls = 0
+            CIRCUIT_STATE.set(STATE_VALUES[HALF_OPEN], endpoint=self.name)
+            self.logger.info(f"Circuit for {self.name} half-open, allowing a trial call")
+        return self._state
+
+# One breaker per endpoint, shared by every caller in the process
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(endpoint: str, config: Optional[Dict] = None, max_timeout: float = 30) -> CircuitBreaker:
+    """
+    Get the shared breaker for an endpoint, creating or reconfiguring it
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(endpoint, config, max_timeout)
+        else:
+            breaker.reconfigure(config, max_timeout)
+        return breaker
@@ -0,0 +1,230 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import copy
+import logging
+import os
+import yaml
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+DEFAULT_CONFIG_PATH = "../config/settings.yml"
+
+# libyaml's loader is several times faster when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Top-level key -> ATMConfig attribute
+SECTIONS = {
+    'OpenRouteAI': 'openroute_ai',
+    'Diagnosis_Queue': 'diagnosis_queue',
+    'Network': 'network',
+    'HTTP': 'http',
+    'Notification_Outbox': 'notification_outbox',
+    'Hardware': 'hardware',
+    'Scheduler': 'scheduler',
+    'Maintenance_Thresholds': 'maintenance_thresholds',
+    'Fault_Events': 'fault_events',
+    'Fault_Tracking': 'fault_tracking',
+    'Repair': 'repair',
+    'Maintenance_UI': 'maintenance_ui',
+    'Metrics': 'metrics',
+    'Error_History': 'error_history',
+    'Checkpoint': 'checkpoint',
+    'Analytics': 'analytics',
+    'Logging': 'logging',
+    'Security': 'security'
+}
+
+# Keys every settings.yml must define, with their accepted types
+REQUIRED = {
+    ('ATM_ID',): str,
+    ('OpenRouteAI', 'API_Key'): str,
+    ('OpenRouteAI', 'Endpoint'): str,
+    ('OpenRouteAI', 'Max_Retries'): int,
+    ('OpenRouteAI', 'Timeout'): (int, float),
+    ('Network', 'Windows_Monitor_Endpoint'): str,
+    ('Hardware', 'Cash_Dispenser', 'Low_Cash_Threshold'): (int, float),
+    ('Hardware', 'Printer', 'Paper_Low_Threshold'): (int, float),
+    ('Maintenance_Thresholds', 'Auto_Reset_Interval'): (int, float),
+    ('Security', 'Auth_Token'): str,
+    ('Security', 'SSL_Cert_Path'): str
+}
+
+class ConfigError(Exception):
+    """Raised when settings.yml is missing, unreadable or invalid"""
+
+class ConfigSection(Mapping):
+    """
+    Read-only view of a config mapping; nested mappings are sections too
+    """
+    __slots__ = ('_name', '_data')
+
+    def __init__(self, name: str, data: Dict):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_data', {
+            key: _freeze(f"{name}.{key}", value) for key, value in data.items()
+        })
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"Config section {self._name} is read-only")
+
+    def __repr__(self) -> str:
+        return f"ConfigSection({self._name!r}, {self.to_dict()!r})"
+
+    def to_dict(self) -> Dict:
+        """
+        Plain mutable copy, e.g. for JSON serialization
+        """
+        return {key: _thaw(value) for key, value in self._data.items()}
+
+class ATMConfig:
+    """
+    Typed, immutable settings loaded once and shared by every component
+    Sections are also reachable by their settings.yml names: config['Hardware']
+    """
+    __slots__ = ('path', 'mtime', 'atm_id', 'location', '_sections') + tuple(SECTIONS.values())
+
+    def __init__(self, data: Dict, path: Optional[str] = None, mtime: Optional[float] = None):
+        errors = validate(data)
+        if errors:
+            raise ConfigError(f"Invalid configuration {path or ''}: " + "; ".join(errors))
+
+        sections = {
+            key: _freeze(key, value) for key, value in data.items()
+        }
+        object.__setattr__(self, 'path', path)
+        object.__setattr__(self, 'mtime', mtime)
+        object.__setattr__(self, 'atm_id', data['ATM_ID'])
+        object.__setattr__(self, 'location', data.get('Location'))
+        object.__setattr__(self, '_sections', sections)
+        for key, attribute in SECTIONS.items():
+            object.__setattr__(self, attribute, sections.get(key) or ConfigSection(key, {}))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ATMConfig is read-only")
+
+    def __getitem__(self, key: str) -> Any:
+        return self._sections[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sections
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._sections.get(key, default)
+
+    def to_dict(self) -> Dict:
+        return {key: _thaw(value) for key, value in self._sections.items()}
+
+def validate(data: Any) -> List[str]:
+    """
+    Check the required keys and their types
+    Returns: list of problems, empty if the configuration is valid
+    """
+    if not isinstance(data, dict):
+        return ["top level must be a mapping"]
+    errors = []
+    for keys, expected in REQUIRED.items():
+        value: Any = data
+        for key in keys:
+            value = value.get(key) if isinstance(value, dict) else None
+        name = '.'.join(keys)
+        if value is None:
+            errors.append(f"missing {name}")
+        elif isinstance(value, bool) or not isinstance(value, expected):
+            errors.append(f"{name} has invalid type {type(value).__name__}")
+    return errors
+
+def load_config(path: str = DEFAULT_CONFIG_PATH) -> ATMConfig:
+    """
+    Parse and validate settings.yml
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+        with open(path, 'r') as f:
+            data = yaml.load(f, Loader=_YAML_LOADER)
+    except Exception as e:
+        raise ConfigError(f"Failed to load configuration {path}: {str(e)}") from e
+    return ATMConfig(data, path, mtime)
+
+def resolve_config(config: Union[ATMConfig, str, None]) -> ATMConfig:
+    """
+    Accept either a loaded config or a path to load, for standalone component use
+    """
+    if isinstance(config, ATMConfig):
+        return config
+    return load_config(config or DEFAULT_CONFIG_PATH)
+
+def overlay_config(base: Union[ATMConfig, Dict], overlay: Dict) -> ATMConfig:
+    """
+    Validated copy of a base config with an overlay merged in, e.g. per-agent
+    settings in host mode; nested sections are merged, other values replaced
+    """
+    data = base.to_dict() if isinstance(base, ATMConfig) else copy.deepcopy(base)
+    return ATMConfig(_merge(data, overlay))
+
+class ConfigStore:
+    """
+    Holds the current config and reloads it when the file's mtime changes
+    """
+    def __init__(self, config: Union[ATMConfig, str, None] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        self.current = resolve_config(config)
+        self._mtime = self.current.mtime
+
+    def reload_if_changed(self) -> Optional[ATMConfig]:
+        """
+        Cheap mtime check; reload only if the file changed
+        Returns: the new config, or None if unchanged or the new file is invalid
+        """
+        path = self.current.path
+        if not path:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError as e:
+            self.logger.error(f"Failed to check configuration: {str(e)}")
+            return None
+        if mtime == self._mtime:
+            return None
+        self._mtime = mtime
+
+        try:
+            self.current = load_config(path)
+        except ConfigError as e:
+            # Keep running on the last good config
+            self.logger.error(f"Configuration reload rejected: {str(e)}")
+            return None
+        self.logger.info("Configuration reloaded")
+        return self.current
+
+def _freeze(name: str, value: Any) -> Any:
+    if isinstance(value, dict):
+        return ConfigSection(name, value)
+    if isinstance(value, list):
+        return tuple(_freeze(name, item) for item in value)
+    return value
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, ConfigSection):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+def _merge(data: Dict, overlay: Mapping) -> Dict:
+    for key, value in overlay.items():
+        if isinstance(value, Mapping) and isinstance(data.get(key), dict):
+            _merge(data[key], value)
+        else:
+            data[key] = copy.deepcopy(_thaw(value))
+    return data
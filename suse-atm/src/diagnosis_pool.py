@@ -0,0 +1,163 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import logging
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+class DiagnosisWorkerPool:
+    """
+    Bounded background pool that runs AI diagnosis and self-repair jobs
+    The monitoring loop only enqueues; a full queue rejects new jobs instead of blocking
+    """
+    _STOP = object()
+
+    def __init__(self, handler: Callable[[str, Dict], None], config: Optional[Dict] = None,
+                 batch_handler: Optional[Callable[[Dict[str, Dict]], None]] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        config = config or {}
+        self.handler = handler
+        # Handles several faults from one sweep in a single job
+        self.batch_handler = batch_handler
+        # The worker count is the cap on concurrent AI requests
+        self.worker_count = config.get('Workers', 2)
+        self.jobs: queue.Queue = queue.Queue(maxsize=config.get('Max_Queue_Size', 32))
+        self._in_flight: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+        self._stopped = False
+
+    def start(self):
+        """
+        Start the worker threads
+        """
+        self._stopped = False
+        for index in range(self.worker_count):
+            worker = threading.Thread(
+                target=self._worker,
+                name=f"diagnosis-worker-{index}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Drop the queued jobs and wait up to timeout for every worker to finish
+        its current job and exit; a worker stuck past that is left behind (daemon)
+        """
+        with self._lock:
+            self._stopped = True
+            dropped = 0
+            while True:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not self._STOP:
+                    dropped += 1
+                    keys, component, _ = job
+                    if component is None:
+                        self._in_flight.difference_update(keys)
+                    else:
+                        self._in_flight.discard(keys)
+        if dropped:
+            self.logger.warning(f"Dropped {dropped} queued diagnosis jobs at shutdown")
+
+        workers, self._workers = self._workers, []
+        # Submits are rejected now, so there is room for one sentinel per worker
+        for _ in workers:
+            try:
+                self.jobs.put(self._STOP, timeout=timeout)
+            except queue.Full:
+                self.logger.error("Diagnosis queue full at shutdown, workers may not exit")
+                break
+        for worker in workers:
+            # stop() may run on a worker, e.g. a critical error during a repair
+            if worker is not threading.current_thread():
+                worker.join(timeout)
+                if worker.is_alive():
+                    self.logger.warning(f"{worker.name} did not finish its job within {timeout}s")
+
+    def submit(self, component: str, error: Dict) -> bool:
+        """
+        Queue a diagnosis job for a failing component
+        Returns: True if queued, False if a duplicate is in flight or the queue is full
+        """
+        key = self._job_key(component, error)
+        with self._lock:
+            if self._stopped:
+                return False
+            if key in self._in_flight:
+                self.logger.debug(f"Diagnosis already in flight for {component}")
+                return False
+            try:
+                self.jobs.put_nowait((key, component, error))
+            except queue.Full:
+                self.logger.warning(f"Diagnosis queue full, dropping job for {component}")
+                return False
+            self._in_flight.add(key)
+        return True
+
+    def submit_batch(self, faults: Dict[str, Dict]) -> bool:
+        """
+        Queue one job for several failing components, e.g. after a power glitch
+        Components already in flight are left out; a single remaining fault
+        becomes a normal job
+        Returns: True if anything was queued
+        """
+        if self.batch_handler is None:
+            return any([self.submit(component, error) for component, error in faults.items()])
+
+        with self._lock:
+            if self._stopped:
+                return False
+            batch = {
+                component: error for component, error in faults.items()
+                if self._job_key(component, error) not in self._in_flight
+            }
+            if len(batch) > 1:
+                keys = [self._job_key(component, error) for component, error in batch.items()]
+                try:
+                    self.jobs.put_nowait((keys, None, batch))
+                except queue.Full:
+                    self.logger.warning(f"Diagnosis queue full, dropping batch for {', '.join(batch)}")
+                    return False
+                self._in_flight.update(keys)
+                return True
+        return any([self.submit(component, error) for component, error in batch.items()])
+
+    def pending(self) -> int:
+        """
+        Number of queued or running jobs
+        """
+        with self._lock:
+            return len(self._in_flight)
+
+    def _worker(self):
+        while True:
+            job = self.jobs.get()
+            if job is self._STOP:
+                return
+
+            key, component, error = job
+            try:
+                if component is None:
+                    self.batch_handler(error)
+                else:
+                    self.handler(component, error)
+            except Exception as e:
+                self.logger.error(f"Diagnosis job for {component or 'batch'} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    if component is None:
+                        self._in_flight.difference_update(key)
+                    else:
+                        self._in_flight.discard(key)
+
+    @staticmethod
+    def _job_key(component: str, error: Optional[Dict]) -> Tuple[str, str]:
+        error_type = (error or {}).get('error_type', 'UNKNOWN')
+        return component, error_type
@@ -0,0 +1,126 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import threading
+from typing import Dict, Optional, Tuple
+from config import ATMConfig
+from metrics import REGISTRY
+
+RULE_LOOKUPS = REGISTRY.counter(
+    'atm_diagnosis_rule_lookups_total', 'Rules-table lookups by result (hit or miss)', ('result',)
+)
+
+# error_type -> how to resolve it without the AI endpoint
+#   issue_type: diagnosis reported downstream (matches MaintenanceSystem repair actions)
+#   repair: 'reset' to reset the device locally, None if it needs a technician
+#   level: (Hardware section, threshold key) for consumable levels
+RULES: Dict[str, Dict] = {
+    'LOW_CASH': {
+        'issue_type': 'LOW_CASH',
+        'repair': None,
+        'level': ('Cash_Dispenser', 'Low_Cash_Threshold'),
+        'recommendation': 'Replenish the cash cassettes'
+    },
+    'LOW_PAPER': {
+        'issue_type': 'LOW_PAPER',
+        'repair': None,
+        'level': ('Printer', 'Paper_Low_Threshold'),
+        'recommendation': 'Replace the receipt paper roll'
+    },
+    'READER_DISCONNECTED': {
+        'issue_type': 'CARD_READER_ERROR',
+        'repair': 'reset',
+        'recommendation': 'Reset the card reader; check its cable if the reset fails'
+    },
+    'DISPLAY_ERROR': {
+        'issue_type': 'DISPLAY_ERROR',
+        'repair': 'reset',
+        'recommendation': 'Reset the display controller'
+    },
+    'TOUCH_ERROR': {
+        'issue_type': 'DISPLAY_ERROR',
+        'repair': 'reset',
+        'recommendation': 'Reset the display to recalibrate the touch panel'
+    },
+    'NOTE_JAM': {
+        'issue_type': 'NOTE_JAM',
+        'repair': 'reset',
+        'recommendation': 'Run the dispenser purge cycle'
+    },
+    'PRINTER_ERROR': {
+        'issue_type': 'PRINTER_ERROR',
+        'repair': 'reset',
+        'recommendation': 'Reset the receipt printer'
+    },
+    'TIMEOUT': {
+        'issue_type': 'DEVICE_TIMEOUT',
+        'repair': 'reset',
+        'recommendation': 'Reset the unresponsive device'
+    }
+}
+
+class DiagnosisRuleEngine:
+    """
+    Offline diagnosis for known error types from the RULES table
+    Unknown patterns return None so the caller can fall back to the AI endpoint
+    """
+    def __init__(self, config: ATMConfig):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.reconfigure(config)
+
+    def reconfigure(self, config: ATMConfig):
+        """
+        Apply a (re)loaded configuration
+        """
+        self.hardware_config = config.hardware
+
+    def diagnose(self, sensor_data: Dict) -> Optional[Tuple[str, Dict]]:
+        """
+        Resolve a fault from the rules table
+        Returns: (issue_type, diagnosis_details), or None for unknown patterns
+        """
+        error = sensor_data.get('error') or {}
+        rule = RULES.get(error.get('error_type'))
+        with self._lock:
+            if rule is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        RULE_LOOKUPS.inc(result='miss' if rule is None else 'hit')
+        if rule is None:
+            return None
+
+        details = {
+            'source': 'rules',
+            'component': sensor_data.get('component'),
+            'self_repairable': rule['repair'] is not None,
+            'repair': rule['repair'],
+            'recommendation': rule['recommendation'],
+            'severity': 'WARNING',
+            'confidence': 100
+        }
+        if 'level' in rule:
+            section, key = rule['level']
+            level = error.get('current_level')
+            threshold = (self.hardware_config.get(section) or {}).get(key, error.get('threshold'))
+            details['current_level'] = level
+            details['threshold'] = threshold
+            # An empty consumable stops service, a low one only needs a visit
+            if level is not None and level <= 0:
+                details['severity'] = 'CRITICAL'
+        return rule['issue_type'], details
+
+    def stats(self) -> Dict:
+        """
+        Get hit/miss counters for the rules fast path
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
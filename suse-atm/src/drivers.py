@@ -0,0 +1,190 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import copy
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+class HardwareDriver:
+    """
+    Access to the ATM devices
+    read_sensors() is one batched device query returning every component's
+    readings (as a single XFS/CEN status call does); read_component() queries
+    one component on its own
+    Drivers with supports_push report device state changes to subscribe()d
+    callbacks as they happen, so their devices need only slow polling
+    """
+    supports_push = False
+
+    def subscribe(self, callback: Callable[[str, Dict], None]):
+        """
+        Register callback(component, readings) for unsolicited device events
+        """
+
+    def read_sensors(self) -> Dict[str, Dict]:
+        """
+        Returns: {component: {reading: value}} for every component
+        """
+        raise NotImplementedError
+
+    def read_component(self, component: str) -> Dict:
+        """
+        Returns: the readings of one component
+        """
+        return self.read_sensors()[component]
+
+    def reset(self, component: str) -> bool:
+        """
+        Returns: True if the device accepted the reset
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release the device connection
+        """
+
+class SimulatedDriver(HardwareDriver):
+    """
+    In-memory devices for development, tests and benchmarks
+    Every query holds the device link for `latency` seconds, like a serial
+    XFS session that serves one request at a time; after a reset command the
+    device itself takes `reset_time` seconds to come back, independently of
+    the other devices; set_reading() pushes the change to subscribers
+    """
+    supports_push = True
+    DEFAULT_READINGS = {
+        'cash_dispenser': {'cash_level': 1500, 'jammed': False},
+        'card_reader': {'connected': True},
+        'printer': {'paper_level': 200, 'connected': True},
+        'display': {'display_ok': True, 'touch_ok': True}
+    }
+    # Readings a device reset restores; consumable levels need a technician
+    RESETTABLE = {
+        'cash_dispenser': ('jammed',),
+        'card_reader': ('connected',),
+        'printer': ('connected',),
+        'display': ('display_ok', 'touch_ok')
+    }
+
+    def __init__(self, config: Optional[Dict] = None):
+        config = config or {}
+        self.latency = config.get('Latency', 0)
+        self.reset_time = config.get('Reset_Time', 0)
+        self.readings = copy.deepcopy(self.DEFAULT_READINGS)
+        self.round_trips = 0
+        # Device status reads; a batched read touches every device
+        self.device_reads = 0
+        self._link = threading.Lock()
+        self._subscribers: List[Callable[[str, Dict], None]] = []
+
+    def subscribe(self, callback: Callable[[str, Dict], None]):
+        self._subscribers.append(callback)
+
+    def set_reading(self, component: str, **values):
+        """
+        Change simulated sensor values, e.g. set_reading('printer', paper_level=20)
+        """
+        with self._link:
+            self.readings[component].update(values)
+            readings = dict(self.readings[component])
+        for callback in self._subscribers:
+            callback(component, readings)
+
+    def read_sensors(self) -> Dict[str, Dict]:
+        with self._link:
+            self._round_trip()
+            self.device_reads += len(self.readings)
+            return copy.deepcopy(self.readings)
+
+    def read_component(self, component: str) -> Dict:
+        with self._link:
+            self._round_trip()
+            self.device_reads += 1
+            return dict(self.readings[component])
+
+    def reset(self, component: str) -> bool:
+        with self._link:
+            self._round_trip()
+        if self.reset_time:
+            time.sleep(self.reset_time)
+        with self._link:
+            for key in self.RESETTABLE.get(component, ()):
+                self.readings[component][key] = self.DEFAULT_READINGS[component][key]
+        return True
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+# Hardware.Driver name -> driver class
+DRIVERS = {
+    'simulated': SimulatedDriver
+}
+
+def create_driver(config: Optional[Dict] = None) -> HardwareDriver:
+    """
+    Create the driver named by Hardware.Driver, with its Driver_Options
+    """
+    config = config or {}
+    name = config.get('Driver', 'simulated')
+    if name not in DRIVERS:
+        raise ValueError(f"Unknown hardware driver: {name}")
+    return DRIVERS[name](config.get('Driver_Options'))
+
+class SensorSnapshotCache:
+    """
+    Short-lived snapshot of a batched sensor read
+    A sweep of every component (batch()) takes one batched read that checks
+    within `ttl` seconds share; a lone scheduled check with no fresh snapshot
+    queries only its own component. With ttl <= 0 every check queries its
+    component separately
+    """
+    def __init__(self, driver: HardwareDriver, ttl: float = 1.0, clock=time.monotonic):
+        self.logger = logging.getLogger('ATMLogger')
+        self.driver = driver
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Dict[str, Dict]] = None
+        self._taken_at = 0.0
+        self._batch_requested = False
+
+    def batch(self):
+        """
+        Have the next read without a fresh snapshot take a batched one, e.g.
+        before checking every component
+        """
+        with self._lock:
+            fresh = self._snapshot is not None and self._clock() - self._taken_at <= self.ttl
+            self._batch_requested = not fresh
+
+    def read(self, component: str) -> Dict:
+        """
+        Readings of one component, from the current snapshot when still fresh
+        """
+        if self.ttl <= 0:
+            return self.driver.read_component(component)
+        # Checks arriving while a batched read is in flight wait for it instead of issuing their own
+        with self._lock:
+            fresh = self._snapshot is not None and self._clock() - self._taken_at <= self.ttl
+            if not fresh and self._batch_requested:
+                self._snapshot = self.driver.read_sensors()
+                self._taken_at = self._clock()
+                self._batch_requested = False
+                fresh = True
+            if fresh:
+                return self._snapshot[component]
+        # Scheduled checks are jittered apart, so a batched read would serve only this one
+        return self.driver.read_component(component)
+
+    def invalidate(self):
+        """
+        Drop the snapshot, e.g. after a device reset
+        """
+        with self._lock:
+            self._snapshot = None
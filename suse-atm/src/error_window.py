@@ -0,0 +1,87 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import time
+from typing import Callable, List, Optional, Tuple
+
+class SlidingWindowCounter:
+    """
+    Bucketed sliding-window event counter on a monotonic clock
+    Updates and queries are constant time and memory is fixed at `buckets` slots;
+    the window edge is accurate to one bucket width (window / buckets)
+    """
+    def __init__(self, window: float, buckets: int = 60,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.buckets = buckets
+        self.bucket_width = window / buckets
+        self.clock = clock
+        self._counts: List[int] = [0] * buckets
+        self._total = 0
+        self._current = int(clock() // self.bucket_width)
+
+    def add(self, amount: int = 1, now: Optional[float] = None):
+        """
+        Record `amount` events at `now` (defaults to the clock)
+        """
+        self._advance(self.clock() if now is None else now)
+        self._counts[self._current % self.buckets] += amount
+        self._total += amount
+
+    def count(self, now: Optional[float] = None) -> int:
+        """
+        Number of events recorded within the last window
+        """
+        self._advance(self.clock() if now is None else now)
+        return self._total
+
+    def reset(self):
+        """
+        Forget all recorded events
+        """
+        self._counts = [0] * self.buckets
+        self._total = 0
+
+    def export(self, now: Optional[float] = None) -> List[Tuple[float, int]]:
+        """
+        Counts still in the window as (seconds ago, count), oldest first,
+        for restoring on another clock (e.g. after a restart)
+        """
+        now = self.clock() if now is None else now
+        self._advance(now)
+        entries = []
+        for age_buckets in range(self.buckets - 1, -1, -1):
+            amount = self._counts[(self._current - age_buckets) % self.buckets]
+            if amount:
+                entries.append((now - (self._current - age_buckets) * self.bucket_width, amount))
+        return entries
+
+    def restore(self, entries: List[Tuple[float, int]], now: Optional[float] = None):
+        """
+        Replace the counts with export() output; entries older than the window are dropped
+        """
+        now = self.clock() if now is None else now
+        self.reset()
+        self._current = int((now - self.window) // self.bucket_width)
+        for age, amount in sorted(entries, key=lambda entry: -entry[0]):
+            if age < self.window:
+                self.add(amount, now - age)
+        self._advance(now)
+
+    def _advance(self, now: float):
+        """
+        Expire buckets that slid out of the window since the last call
+        """
+        index = int(now // self.bucket_width)
+        elapsed = index - self._current
+        if elapsed <= 0:
+            return
+        if elapsed >= self.buckets:
+            self.reset()
+        else:
+            for step in range(1, elapsed + 1):
+                slot = (self._current + step) % self.buckets
+                self._total -= self._counts[slot]
+                self._counts[slot] = 0
+        self._current = index
@@ -0,0 +1,197 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Awaitable, Callable, Deque, Dict, Optional, Set
+from metrics import REGISTRY
+
+# asyncio is imported when the event loop starts, to keep it out of agent startup
+if TYPE_CHECKING:
+    import asyncio
+
+EVENTS = REGISTRY.counter(
+    'atm_fault_events_total', 'Pushed device events by source and result (handled, coalesced, invalid)',
+    ('source', 'result')
+)
+DETECTION_LATENCY = REGISTRY.histogram(
+    'atm_fault_detection_latency_seconds',
+    'Time from a pushed device event to the confirming check being processed', ('source',)
+)
+
+class FaultEventIngest:
+    """
+    Wakes the monitoring loop as soon as a device state change is pushed
+    Sources: driver callbacks (any thread), newline-delimited JSON on a local
+    unix socket, and lines appended to a watched file
+    Events for a component whose previous event is still being handled are coalesced
+    """
+    def __init__(self, config: Optional[Dict], handler: Callable[[Dict], Awaitable]):
+        self.logger = logging.getLogger('ATMLogger')
+        config = config or {}
+        self.enabled = config.get('Enabled', True)
+        self.socket_path = config.get('Socket_Path') or None
+        self.watch_file = config.get('Watch_File') or None
+        self.watch_interval = config.get('Watch_Interval', 0.5)
+        self.handler = handler
+
+        self._lock = threading.Lock()
+        self._loop: Optional['asyncio.AbstractEventLoop'] = None
+        # Events pushed before the loop started
+        self._backlog: Deque[Dict] = deque(maxlen=256)
+        self._in_flight: Set[str] = set()
+        self._server = None
+        self._watcher: Optional['asyncio.Task'] = None
+
+    def push(self, component: str, error: Optional[Dict] = None, source: str = 'device',
+             timestamp: Optional[float] = None):
+        """
+        Report a device state change; safe to call from any thread
+        timestamp is when the change happened (epoch seconds), defaulting to now
+        """
+        if not self.enabled:
+            return
+        event = {
+            'component': component,
+            'error': error,
+            'source': source,
+            'timestamp': time.time() if timestamp is None else timestamp
+        }
+        with self._lock:
+            loop = self._loop
+            if loop is None:
+                self._backlog.append(event)
+                return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, event)
+        except RuntimeError:
+            # Loop already closed during shutdown
+            pass
+
+    async def start(self):
+        """
+        Attach to the running loop and open the socket and file sources
+        """
+        import asyncio
+        if not self.enabled:
+            return
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            backlog = list(self._backlog)
+            self._backlog.clear()
+        for event in backlog:
+            self._dispatch(event)
+
+        if self.socket_path:
+            try:
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
+                self._server = await asyncio.start_unix_server(self._serve_client, path=self.socket_path)
+                self.logger.info(f"Listening for device events on {self.socket_path}")
+            except OSError as e:
+                self.logger.error(f"Failed to open event socket {self.socket_path}: {str(e)}")
+        if self.watch_file:
+            try:
+                offset = os.path.getsize(self.watch_file)
+            except OSError:
+                offset = 0
+            self._watcher = asyncio.create_task(self._watch(offset), name='fault-event-watcher')
+
+    async def stop(self):
+        """
+        Close the sources; later pushes are buffered again
+        """
+        import asyncio
+        with self._lock:
+            self._loop = None
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def _dispatch(self, event: Dict):
+        """
+        Runs on the loop: start handling the event unless one is already in flight
+        """
+        import asyncio
+        component = event['component']
+        if component in self._in_flight:
+            EVENTS.inc(source=event['source'], result='coalesced')
+            return
+        self._in_flight.add(component)
+        asyncio.get_running_loop().create_task(self._handle(event))
+
+    async def _handle(self, event: Dict):
+        try:
+            await self.handler(event)
+            EVENTS.inc(source=event['source'], result='handled')
+            DETECTION_LATENCY.observe(max(time.time() - event['timestamp'], 0), source=event['source'])
+        except Exception as e:
+            self.logger.error(f"Failed to handle {event['source']} event for {event['component']}: {str(e)}")
+        finally:
+            self._in_flight.discard(event['component'])
+
+    def _ingest_line(self, line: bytes, source: str):
+        """
+        Parse one JSON event: {"component": ..., "error": {...}, "timestamp": epoch}
+        """
+        line = line.strip()
+        if not line:
+            return
+        try:
+            data = json.loads(line)
+            self.push(data['component'], data.get('error'), source, data.get('timestamp'))
+        except (ValueError, KeyError, TypeError) as e:
+            EVENTS.inc(source=source, result='invalid')
+            self.logger.warning(f"Ignoring invalid {source} event: {str(e)}")
+
+    async def _serve_client(self, reader: 'asyncio.StreamReader', writer: 'asyncio.StreamWriter'):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._ingest_line(line, 'socket')
+        finally:
+            writer.close()
+
+    async def _watch(self, offset: int):
+        """
+        Tail the watched file from offset, i.e. only lines appended after startup
+        """
+        import asyncio
+        partial = b''
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                size = os.path.getsize(self.watch_file)
+            except OSError:
+                continue
+            if size < offset:
+                # Truncated or rotated
+                offset, partial = 0, b''
+            if size == offset:
+                continue
+            chunk = await asyncio.to_thread(_read_from, self.watch_file, offset)
+            offset += len(chunk)
+            *lines, partial = (partial + chunk).split(b'\n')
+            for line in lines:
+                self._ingest_line(line, 'file')
+
+def _read_from(path: str, offset: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read()
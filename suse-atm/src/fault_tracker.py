@@ -0,0 +1,141 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from metrics import REGISTRY
+
+# Component states
+OK = 'OK'
+FAULT = 'FAULT'
+ESCALATED = 'ESCALATED'
+
+# Transitions that need downstream work (diagnosis, repair, notification)
+NEW_FAULT = 'NEW_FAULT'
+RENOTIFY = 'RENOTIFY'
+ESCALATE = 'ESCALATE'
+RECOVERED = 'RECOVERED'
+
+TRANSITIONS = REGISTRY.counter(
+    'atm_fault_transitions_total', 'Component fault state transitions', ('component', 'transition')
+)
+ACTIONS_AVOIDED = REGISTRY.counter(
+    'atm_fault_actions_avoided_total',
+    'Checks of an already handled fault that triggered no diagnosis or notification', ('component',)
+)
+
+class ComponentFault:
+    """
+    Fault state of one component between checks
+    """
+    __slots__ = ('state', 'error_type', 'since', 'last_action')
+
+    def __init__(self):
+        self.state = OK
+        self.error_type: Optional[str] = None
+        self.since = 0.0
+        self.last_action = 0.0
+
+class FaultTracker:
+    """
+    Per-component state machine that diffs each check against the previous one
+    Only new faults, re-notification and escalation deadlines and recoveries
+    are reported; repeated sightings of a handled fault are suppressed
+    """
+    def __init__(self, config: Optional[Dict] = None, clock=time.monotonic):
+        self.logger = logging.getLogger('ATMLogger')
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._faults: Dict[str, ComponentFault] = {}
+        self.reconfigure(config)
+
+    def reconfigure(self, config: Optional[Dict]):
+        """
+        Apply a (re)loaded configuration
+        """
+        config = config or {}
+        # 0 disables the deadline
+        self.renotify_interval = config.get('Renotify_Interval', 300)
+        self.escalate_after = config.get('Escalate_After', 900)
+
+    def observe(self, component: str, details: Dict, now: Optional[float] = None) -> Optional[str]:
+        """
+        Record a check result
+        Returns: the transition that needs handling, or None if nothing changed
+        """
+        now = self._clock() if now is None else now
+        error_type = None if details['status'] else (details.get('error') or {}).get('error_type', 'UNKNOWN')
+
+        with self._lock:
+            fault = self._faults.setdefault(component, ComponentFault())
+            transition = self._transition(fault, error_type, now)
+
+        if transition is not None:
+            TRANSITIONS.inc(component=component, transition=transition)
+            self.logger.debug(f"{component}: {transition} ({error_type or 'OK'})")
+        elif error_type is not None:
+            ACTIONS_AVOIDED.inc(component=component)
+        return transition
+
+    def state(self, component: str) -> str:
+        """
+        Current state of a component: OK, FAULT or ESCALATED
+        """
+        with self._lock:
+            fault = self._faults.get(component)
+            return fault.state if fault is not None else OK
+
+    def export_state(self) -> Dict[str, Dict]:
+        """
+        Components not OK, with wall-clock times so the state survives a restart
+        """
+        offset = time.time() - self._clock()
+        with self._lock:
+            return {
+                component: {
+                    'state': fault.state,
+                    'error_type': fault.error_type,
+                    'since': fault.since + offset,
+                    'last_action': fault.last_action + offset
+                }
+                for component, fault in self._faults.items() if fault.state != OK
+            }
+
+    def restore_state(self, faults: Dict[str, Dict]):
+        """
+        Reload export_state() output; the next check of a restored fault
+        is then a repeat sighting, not a new fault
+        """
+        offset = self._clock() - time.time()
+        with self._lock:
+            for component, saved in faults.items():
+                fault = self._faults.setdefault(component, ComponentFault())
+                fault.state = saved['state']
+                fault.error_type = saved['error_type']
+                fault.since = saved['since'] + offset
+                fault.last_action = saved['last_action'] + offset
+
+    def _transition(self, fault: ComponentFault, error_type: Optional[str], now: float) -> Optional[str]:
+        if error_type is None:
+            if fault.state == OK:
+                return None
+            fault.state, fault.error_type = OK, None
+            return RECOVERED
+
+        if fault.state == OK or error_type != fault.error_type:
+            fault.state, fault.error_type = FAULT, error_type
+            fault.since = fault.last_action = now
+            return NEW_FAULT
+
+        if fault.state == FAULT and self.escalate_after and now - fault.since >= self.escalate_after:
+            fault.state = ESCALATED
+            fault.last_action = now
+            return ESCALATE
+
+        if self.renotify_interval and now - fault.last_action >= self.renotify_interval:
+            fault.last_action = now
+            return RENOTIFY
+        return None
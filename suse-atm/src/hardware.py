@@ -3,23 +3,78 @@
 # All rights reserved.
 
 import logging
-import yaml
-from typing import Dict, Tuple, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Tuple, Optional, Callable, Union
+from config import ATMConfig, DEFAULT_CONFIG_PATH, resolve_config
+from drivers import HardwareDriver, SensorSnapshotCache, create_driver
+from repair_executor import RepairExecutor
+from metrics import REGISTRY
+
+PROBE_DURATION = REGISTRY.histogram(
+    'atm_probe_duration_seconds', 'Latency of HardwareInterface.check_* probes', ('component',)
+)
+PROBE_RESULTS = REGISTRY.counter(
+    'atm_probe_results_total', 'Probe outcomes: ok, fault, error or timeout', ('component', 'result')
+)
 
 class HardwareInterface:
-    def __init__(self, config_path: str = "../config/settings.yml"):
-        self.logger = logging.getLogger('ATMLogger')
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)['Hardware']
-        
+    # Config section name for each probed component
+    COMPONENT_SECTIONS = {
+        'cash_dispenser': 'Cash_Dispenser',
+        'card_reader': 'Card_Reader',
+        'printer': 'Printer',
+        'display': 'Display'
+    }
+
+    def __init__(self, config: Union[ATMConfig, str] = DEFAULT_CONFIG_PATH,
+                 driver: Optional[HardwareDriver] = None, repairs: Optional[RepairExecutor] = None,
+                 logger: Optional[logging.Logger] = None):
+        # In host mode the agent passes its ATM_ID-prefixed logger
+        self.logger = logger or logging.getLogger('ATMLogger')
+        config = resolve_config(config)
+        # A sweep takes one batched device query, shared by the checks within Snapshot_TTL
+        self.driver = driver or create_driver(config.hardware)
+        self.snapshots = SensorSnapshotCache(self.driver)
+        # A shared executor (host mode) is configured and closed by its owner
+        self._owns_repairs = repairs is None
+        self.repairs = repairs or RepairExecutor(config.repair)
+        self.reconfigure(config)
+
+        self._probes: Dict[str, Callable[[], Tuple[bool, Optional[Dict]]]] = {
+            'cash_dispenser': self.check_cash_dispenser,
+            'card_reader': self.check_card_reader,
+            'printer': self.check_printer,
+            'display': self.check_display
+        }
+        # Probes still running from an earlier sweep (hung devices)
+        self._pending: Dict[str, Future] = {}
+        # Two workers per device so a hung probe never starves the next sweep
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self._probes) * 2,
+            thread_name_prefix='hw-probe'
+        )
+
+    def reconfigure(self, config: ATMConfig):
+        """
+        Apply a (re)loaded configuration
+        """
+        self.config = config.hardware
+        self.probe_timeout = self.config.get('Probe_Timeout', 5)
+        self.snapshots.ttl = self.config.get('Snapshot_TTL', 1)
+        if self._owns_repairs:
+            self.repairs.reconfigure(config.repair)
+
     def check_cash_dispenser(self) -> Tuple[bool, Optional[Dict]]:
         """
         Check cash dispenser status including cash levels and mechanical status
         Returns: (status_ok, error_details if any)
         """
         try:
-            # Simulate hardware checks
-            cash_level = 1500  # This would be actual sensor reading
+            readings = self.snapshots.read('cash_dispenser')
+            if readings['jammed']:
+                return False, {'error_type': 'NOTE_JAM', 'details': 'Note stuck in transport'}
+            cash_level = readings['cash_level']
             if cash_level < self.config['Cash_Dispenser']['Low_Cash_Threshold']:
                 return False, {
                     'error_type': 'LOW_CASH',
@@ -37,8 +92,7 @@ class HardwareInterface:
         Returns: (status_ok, error_details if any)
         """
         try:
-            # Simulate card reader check
-            reader_connected = True  # This would be actual hardware check
+            reader_connected = self.snapshots.read('card_reader')['connected']
             if not reader_connected:
                 return False, {
                     'error_type': 'READER_DISCONNECTED',
@@ -55,8 +109,10 @@ class HardwareInterface:
         Returns: (status_ok, error_details if any)
         """
         try:
-            # Simulate printer check
-            paper_level = 200  # This would be actual sensor reading
+            readings = self.snapshots.read('printer')
+            if not readings['connected']:
+                return False, {'error_type': 'PRINTER_ERROR', 'details': 'Printer not responding'}
+            paper_level = readings['paper_level']
             if paper_level < self.config['Printer']['Paper_Low_Threshold']:
                 return False, {
                     'error_type': 'LOW_PAPER',
@@ -74,10 +130,10 @@ class HardwareInterface:
         Returns: (status_ok, error_details if any)
         """
         try:
-            # Simulate display check
-            display_working = True  # This would be actual hardware check
-            touch_working = True    # This would be actual hardware check
-            
+            readings = self.snapshots.read('display')
+            display_working = readings['display_ok']
+            touch_working = readings['touch_ok']
+
             if not display_working:
                 return False, {'error_type': 'DISPLAY_ERROR', 'details': 'Display not responding'}
             if not touch_working:
@@ -94,37 +150,127 @@ class HardwareInterface:
         """
         try:
             self.logger.info(f"Attempting to reset {device_type}")
-            # Implement actual reset logic here
-            return True
+            success = self.driver.reset(device_type)
+            # The next check must see the device's state after the reset
+            self.snapshots.invalidate()
+            return success
         except Exception as e:
             self.logger.error(f"Reset failed for {device_type}: {str(e)}")
             return False
 
+    def reset_devices(self, components) -> Dict[str, bool]:
+        """
+        Reset several devices at once: independent resets run in parallel,
+        Repair.Dependencies are reset in order, each bounded by Repair.Action_Timeout
+        Returns: {component: reset succeeded}
+        """
+        actions = [
+            self.repairs.action(component, lambda component=component: self.reset_device(component))
+            for component in components
+        ]
+        results = self.repairs.run(actions, self.logger)
+        return {component: result['success'] for component, result in results.items()}
+
+    def get_probe_timeout(self, component: str) -> float:
+        """
+        Get the probe timeout for a component, falling back to Hardware.Probe_Timeout
+        """
+        section = self.config.get(self.COMPONENT_SECTIONS[component]) or {}
+        return section.get('Probe_Timeout', self.probe_timeout)
+
     def get_full_status(self) -> Dict:
         """
         Get comprehensive status of all hardware components
+        Probes run concurrently; a probe exceeding its timeout is reported as TIMEOUT
         Returns: Dictionary with status of all components
         """
-        cash_status, cash_error = self.check_cash_dispenser()
-        card_status, card_error = self.check_card_reader()
-        printer_status, printer_error = self.check_printer()
-        display_status, display_error = self.check_display()
+        started = time.monotonic()
+        self.snapshots.batch()
+        futures = {component: self._submit_probe(component) for component in self._probes}
 
+        # Each probe is held to its own deadline (start + its Probe_Timeout); the
+        # sweep waits for the slowest probe or the largest timeout, never the sum
         return {
-            'cash_dispenser': {
-                'status': cash_status,
-                'error': cash_error
-            },
-            'card_reader': {
-                'status': card_status,
-                'error': card_error
-            },
-            'printer': {
-                'status': printer_status,
-                'error': printer_error
-            },
-            'display': {
-                'status': display_status,
-                'error': display_error
+            component: self._collect_probe(component, future, started)
+            for component, future in futures.items()
+        }
+
+    def probe_component(self, component: str) -> Dict:
+        """
+        Check a single hardware component, bounded by its probe timeout
+        Returns: Dictionary with the component status and error details if any
+        """
+        started = time.monotonic()
+        return self._collect_probe(component, self._submit_probe(component), started)
+
+    def _submit_probe(self, component: str) -> Optional[Future]:
+        """
+        Start a probe, unless the device is still stuck in the previous one
+        """
+        pending = self._pending.get(component)
+        if pending is not None and not pending.done():
+            return None
+        return self._executor.submit(self._run_probe, component)
+
+    def _run_probe(self, component: str) -> Tuple[bool, Optional[Dict], float]:
+        """
+        Run a probe in a worker thread
+        Returns: (status, error, monotonic time the probe finished)
+        """
+        started = time.perf_counter()
+        try:
+            component_status, component_error = self._probes[component]()
+            return component_status, component_error, time.monotonic()
+        finally:
+            PROBE_DURATION.observe(time.perf_counter() - started, component=component)
+
+    def _collect_probe(self, component: str, future: Optional[Future], started: float) -> Dict:
+        """
+        Wait for a probe until its timeout and convert the outcome into a status entry
+        """
+        if future is None:
+            PROBE_RESULTS.inc(component=component, result='timeout')
+            return {
+                'status': False,
+                'error': {'error_type': 'TIMEOUT', 'details': 'Previous probe still running'}
             }
+
+        timeout = self.get_probe_timeout(component)
+        remaining = timeout - (time.monotonic() - started)
+        try:
+            component_status, component_error, finished = future.result(timeout=max(remaining, 0))
+            self._pending.pop(component, None)
+            if finished - started > timeout:
+                # Finished while the sweep waited on a slower device, but after its own deadline
+                self.logger.warning(f"Probe for {component} timed out")
+                PROBE_RESULTS.inc(component=component, result='timeout')
+                component_status, component_error = False, {'error_type': 'TIMEOUT', 'timeout': timeout}
+            else:
+                PROBE_RESULTS.inc(component=component, result='ok' if component_status else 'fault')
+        except Exception as e:
+            if future.done():
+                self.logger.error(f"Probe for {component} failed: {str(e)}")
+                PROBE_RESULTS.inc(component=component, result='error')
+                component_status, component_error = False, {
+                    'error_type': 'HARDWARE_ERROR',
+                    'details': str(e)
+                }
+            else:
+                self.logger.warning(f"Probe for {component} timed out")
+                PROBE_RESULTS.inc(component=component, result='timeout')
+                self._pending[component] = future
+                component_status, component_error = False, {'error_type': 'TIMEOUT', 'timeout': timeout}
+
+        return {
+            'status': component_status,
+            'error': component_error
         }
+
+    def close(self):
+        """
+        Release the probe worker threads without waiting for hung probes
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._owns_repairs:
+            self.repairs.close()
+        self.driver.close()
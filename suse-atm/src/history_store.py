@@ -0,0 +1,266 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import json
+from array import array
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from itertools import islice
+from datetime import datetime
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+# (epoch seconds, error type, component, record)
+Entry = Tuple[float, str, Optional[str], Dict]
+
+class ErrorHistoryStore:
+    """
+    Error history with a bounded in-memory tail that spills older entries
+    to an append-only SQLite file
+    flush() also writes the newest entries, so history survives a restart
+    """
+    def __init__(self, config: Optional[Dict] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        config = config or {}
+        self.tail_size = config.get('Tail_Size', 500)
+        self.spill_path = config.get('Spill_Path') or None
+        self.retention = config.get('Retention_Days', 90) * 86400
+        self.recommendation_window = config.get('Recommendation_Window', 86400)
+
+        self._tail: Deque[Entry] = deque()
+        self._spilled = 0
+        # Oldest tail entries already written by flush()
+        self._persisted = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if self.spill_path:
+            self._open_db()
+
+    def add(self, error_type: str, error_details: Dict, timestamp: Optional[float] = None) -> Dict:
+        """
+        Record an error occurrence
+        Returns: the stored record ({'timestamp', 'error'})
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        record = {
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+            'error': error_details
+        }
+        with self._lock:
+            self._tail.append((timestamp, error_type, error_details.get('component'), record))
+            if len(self._tail) > self.tail_size:
+                self._spill()
+        return record
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              error_type: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Get records in a time range (epoch seconds), optionally for one error type
+        Returns the most recent `limit` records, oldest first
+        """
+        with self._lock:
+            records = self._query_db(since, until, error_type, limit)
+            records.extend(
+                record for ts, etype, _, record in self._unpersisted()
+                if self._matches(ts, etype, since, until, error_type)
+            )
+        if limit is not None:
+            records = records[-limit:]
+        return records
+
+    def summarize(self, window_seconds: Optional[float] = None,
+                  bucket_seconds: Optional[float] = None) -> Dict:
+        """
+        Aggregate the last window into per error type counts, first/last
+        occurrence and per component counts
+        With bucket_seconds, each type also gets a histogram of counts per
+        time bucket, keyed by the bucket start
+        """
+        window_seconds = window_seconds or self.recommendation_window
+        since = time.time() - window_seconds
+        by_type: Dict[str, Dict] = {}
+        bucket_width = bucket_seconds or window_seconds
+
+        def merge(etype, component, bucket, count, first, last):
+            summary = by_type.setdefault(etype, {
+                'count': 0, 'first': first, 'last': last, 'components': {}
+            })
+            summary['count'] += count
+            summary['first'] = min(summary['first'], first)
+            summary['last'] = max(summary['last'], last)
+            key = component or 'unknown'
+            summary['components'][key] = summary['components'].get(key, 0) + count
+            if bucket_seconds:
+                buckets = summary.setdefault('buckets', {})
+                buckets[bucket] = buckets.get(bucket, 0) + count
+
+        with self._lock:
+            if self._db is not None and self._spilled:
+                rows = self._db.execute(
+                    "SELECT error_type, component, CAST(ts / ? AS INTEGER) AS bucket, "
+                    "COUNT(*), MIN(ts), MAX(ts) FROM error_history "
+                    "WHERE ts >= ? GROUP BY error_type, component, bucket",
+                    (bucket_width, since)
+                ).fetchall()
+                for row in rows:
+                    merge(*row)
+            for ts, etype, component, _ in self._unpersisted():
+                if ts >= since:
+                    merge(etype, component, int(ts // bucket_width), 1, ts, ts)
+
+        for summary in by_type.values():
+            summary['first'] = datetime.fromtimestamp(summary['first']).isoformat()
+            summary['last'] = datetime.fromtimestamp(summary['last']).isoformat()
+            if 'buckets' in summary:
+                summary['buckets'] = {
+                    datetime.fromtimestamp(bucket * bucket_width).isoformat(): count
+                    for bucket, count in sorted(summary['buckets'].items())
+                }
+
+        return {
+            'window_seconds': window_seconds,
+            'total': sum(s['count'] for s in by_type.values()),
+            'by_type': by_type
+        }
+
+    def columns(self, since: Optional[float] = None) -> Dict:
+        """
+        Timestamps and component codes of the entries since `since`, as compact
+        arrays that are cheap to hand to an analytics process
+        Returns: {'ts': array('d'), 'component': array('i'), 'components': [name per code]}
+        """
+        ts, codes = array('d'), array('i')
+        components: Dict[str, int] = {}
+
+        def append(timestamp: float, component: Optional[str]):
+            ts.append(timestamp)
+            codes.append(components.setdefault(component or 'unknown', len(components)))
+
+        with self._lock:
+            if self._db is not None and self._spilled:
+                for row in self._db.execute(
+                    "SELECT ts, component FROM error_history WHERE ts >= ? ORDER BY ts", (since or 0,)
+                ):
+                    append(*row)
+            for timestamp, _, component, _ in self._unpersisted():
+                if since is None or timestamp >= since:
+                    append(timestamp, component)
+        return {'ts': ts, 'component': codes, 'components': list(components)}
+
+    def flush(self) -> int:
+        """
+        Write tail entries not yet on disk to the spill file, keeping them in memory
+        Returns: number of entries written
+        """
+        with self._lock:
+            if self._db is None:
+                return 0
+            pending = list(self._unpersisted())
+            if pending and self._insert(pending):
+                self._persisted = len(self._tail)
+                return len(pending)
+            return 0
+
+    def close(self):
+        """
+        Spill the in-memory tail and close the spill file
+        """
+        with self._lock:
+            if self._db is not None:
+                self._spill(len(self._tail))
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._spilled + len(self._tail) - self._persisted
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.query())
+
+    def _spill(self, count: Optional[int] = None):
+        """
+        Move the oldest tail entries to disk, half the tail at a time to amortize writes
+        Without a spill file the evicted entries are dropped
+        """
+        count = count if count is not None else max(len(self._tail) - self.tail_size // 2, 1)
+        evicted = [self._tail.popleft() for _ in range(min(count, len(self._tail)))]
+        # Entries flushed earlier are already on disk
+        flushed = min(self._persisted, len(evicted))
+        self._persisted -= flushed
+        if self._db is None or len(evicted) == flushed:
+            return
+        self._insert(evicted[flushed:])
+
+    def _insert(self, entries: List[Entry]) -> bool:
+        """
+        Append entries to the spill file and apply the retention period
+        """
+        try:
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO error_history (ts, error_type, component, record) VALUES (?, ?, ?, ?)",
+                    [(ts, etype, component, json.dumps(record)) for ts, etype, component, record in entries]
+                )
+                if self.retention:
+                    self._db.execute("DELETE FROM error_history WHERE ts < ?",
+                                     (time.time() - self.retention,))
+            self._spilled = self._db.execute("SELECT COUNT(*) FROM error_history").fetchone()[0]
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to spill error history: {str(e)}")
+            return False
+
+    def _unpersisted(self) -> Iterator[Entry]:
+        return islice(self._tail, self._persisted, None)
+
+    def _query_db(self, since, until, error_type, limit) -> List[Dict]:
+        if self._db is None or not self._spilled:
+            return []
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts <= ?")
+            params.append(until)
+        if error_type is not None:
+            clauses.append("error_type = ?")
+            params.append(error_type)
+        sql = "SELECT record FROM error_history"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS error_history ("
+                "ts REAL NOT NULL, error_type TEXT NOT NULL, component TEXT, record TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_error_history_ts ON error_history (ts)")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_error_history_type ON error_history (error_type, ts)"
+            )
+            self._spilled = self._db.execute("SELECT COUNT(*) FROM error_history").fetchone()[0]
+        except Exception as e:
+            self.logger.error(f"Failed to open error history file: {str(e)}")
+            self._db = None
+
+    @staticmethod
+    def _matches(ts, etype, since, until, error_type) -> bool:
+        if since is not None and ts < since:
+            return False
+        if until is not None and ts > until:
+            return False
+        return error_type is None or etype == error_type
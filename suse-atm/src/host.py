@@ -0,0 +1,278 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import asyncio
+import copy
+import logging
+import os
+import threading
+import yaml
+from typing import TYPE_CHECKING, Dict, List, Optional
+from config import ATMConfig, ConfigError, load_config, overlay_config
+from analytics import create_executor
+from diagnosis_pool import DiagnosisWorkerPool
+from http_client import close_session
+from logger import setup_logger
+from main import ATMSystem
+from metrics import REGISTRY, MetricsServer
+from notification_outbox import NotificationOutbox
+from repair_executor import RepairExecutor
+from scheduler import Scheduler
+
+if TYPE_CHECKING:
+    from ai_monitor import AIMonitor
+
+DEFAULT_HOST_CONFIG_PATH = "../config/host.yml"
+
+# Settings that name a per-agent file; unless an overlay sets them, each
+# agent gets the base value with its ATM_ID inserted before the extension
+PER_AGENT_PATHS = (
+    ('Checkpoint', 'Path'),
+    ('Error_History', 'Spill_Path'),
+    ('Fault_Events', 'Socket_Path'),
+    ('Fault_Events', 'Watch_File')
+)
+
+AGENTS = REGISTRY.gauge('atm_host_agents', 'ATM agents running in this host process')
+
+class AgentLogger(logging.LoggerAdapter):
+    """
+    ATMLogger view that prefixes each message with the agent's ATM_ID
+    """
+    def process(self, msg, kwargs):
+        return f"[{self.extra['atm_id']}] {msg}", kwargs
+
+class AgentDiagnosisQueue:
+    """
+    One agent's handle on the host's shared diagnosis pool
+    Jobs are keyed by 'ATM_ID/component', so in-flight deduplication stays per ATM
+    """
+    def __init__(self, pool: DiagnosisWorkerPool, atm_id: str):
+        self.pool = pool
+        self.atm_id = atm_id
+
+    def start(self):
+        """
+        The host runs the shared workers
+        """
+
+    def stop(self):
+        """
+        The host runs the shared workers
+        """
+
+    def submit(self, component: str, error: Dict) -> bool:
+        return self.pool.submit(f"{self.atm_id}/{component}", error)
+
+    def submit_batch(self, faults: Dict[str, Dict]) -> bool:
+        return self.pool.submit_batch({
+            f"{self.atm_id}/{component}": error for component, error in faults.items()
+        })
+
+class ATMHost:
+    """
+    Runs many ATM agents in one process on one event loop
+    Agents share the HTTP connection pool, the AI client with its diagnosis
+    cache and circuit breaker, the notification outbox, the diagnosis workers,
+    the repair executor and the scheduler; each keeps its own devices, fault
+    and maintenance state, checkpoint and config overlay; failure analytics
+    of all agents share one process pool
+    Shared services are configured from the base config only, and agent
+    overlays are not hot-reloaded
+    """
+    def __init__(self, base: ATMConfig, overlays: List[Dict]):
+        self.config = base
+        self.logger = setup_logger(base.get('Logging'))
+        self.agents: Dict[str, ATMSystem] = {}
+        self.scheduler = Scheduler(base.scheduler)
+        self.repairs = RepairExecutor(base.repair)
+        self.outbox = NotificationOutbox.from_config(base)
+        self.diagnosis_pool = DiagnosisWorkerPool(
+            self._diagnose_and_repair, base.diagnosis_queue, self._repair_batch
+        )
+        self.metrics_server = MetricsServer(base.metrics)
+        # One analytics process pool for all agents instead of one per agent
+        workers = base.analytics.get('Workers', 1)
+        self.analytics_executor = create_executor(workers) if workers > 0 else None
+        self._ai_monitor: Optional['AIMonitor'] = None
+        self._ai_monitor_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        for index, overlay in enumerate(overlays):
+            self.add_agent(overlay, index)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_HOST_CONFIG_PATH) -> 'ATMHost':
+        """
+        Load host.yml: Base_Config (relative to it), a Shared overlay applied
+        to the base and therefore to every agent, and one overlay per agent
+        """
+        try:
+            with open(path, 'r') as f:
+                data = yaml.safe_load(f) or {}
+        except Exception as e:
+            raise ConfigError(f"Failed to load host configuration {path}: {str(e)}") from e
+
+        base_path = os.path.join(os.path.dirname(path), data.get('Base_Config', 'settings.yml'))
+        base = load_config(base_path)
+        if data.get('Shared'):
+            base = overlay_config(base, data['Shared'])
+        return cls(base, data.get('Agents') or [])
+
+    @property
+    def ai_monitor(self) -> 'AIMonitor':
+        """
+        AI client shared by all agents, created when the first fault needs it
+        """
+        if self._ai_monitor is None:
+            with self._ai_monitor_lock:
+                if self._ai_monitor is None:
+                    from ai_monitor import AIMonitor
+                    self._ai_monitor = AIMonitor(self.config)
+        return self._ai_monitor
+
+    def add_agent(self, overlay: Dict, index: Optional[int] = None) -> ATMSystem:
+        """
+        Create an agent from the base config and its overlay
+        Agents added while the host runs are started with start_agent()
+        """
+        config = agent_config(self.config, overlay, len(self.agents) if index is None else index)
+        if config.atm_id in self.agents:
+            raise ConfigError(f"Duplicate ATM_ID in host configuration: {config.atm_id}")
+        atm = ATMSystem(config, host=self)
+        self.agents[config.atm_id] = atm
+        AGENTS.set(len(self.agents))
+        return atm
+
+    async def start_agent(self, atm: ATMSystem):
+        """
+        Sweep the agent's devices and add its jobs to the shared scheduler
+        """
+        try:
+            await atm.attach(self.scheduler)
+        except Exception as e:
+            self.logger.error(f"Failed to start ATM {atm.config.atm_id}: {str(e)}")
+            atm.shutdown()
+
+    def detach(self, atm: ATMSystem):
+        """
+        Remove a shut down agent's jobs and event sources; safe to call from any thread
+        """
+        if self.agents.get(atm.config.atm_id) is atm:
+            del self.agents[atm.config.atm_id]
+            AGENTS.set(len(self.agents))
+        for name in atm.job_names:
+            self.scheduler.remove_job(name)
+        if self._loop is not None and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(atm.fault_events.stop(), self._loop)
+
+    def agent_logger(self, atm_id: str) -> logging.LoggerAdapter:
+        return AgentLogger(self.logger, {'atm_id': atm_id})
+
+    def diagnosis_queue(self, atm_id: str) -> AgentDiagnosisQueue:
+        return AgentDiagnosisQueue(self.diagnosis_pool, atm_id)
+
+    def start(self):
+        """
+        Start every agent and run until shutdown
+        """
+        try:
+            self.logger.info(f"Starting ATM host with {len(self.agents)} agents")
+            asyncio.run(self.run())
+        except Exception as e:
+            self.logger.error(f"Failed to run ATM host: {str(e)}")
+        finally:
+            self.shutdown()
+
+    async def run(self):
+        """
+        Run the shared services and all agents on the current event loop
+        """
+        self._loop = asyncio.get_running_loop()
+        self.outbox.start()
+        self.diagnosis_pool.start()
+        if self.config.metrics.get('Enabled', True):
+            self.metrics_server.start()
+
+        await asyncio.gather(*(self.start_agent(atm) for atm in list(self.agents.values())))
+        try:
+            await self.scheduler.run()
+        finally:
+            await asyncio.gather(
+                *(atm.fault_events.stop() for atm in list(self.agents.values())), return_exceptions=True
+            )
+
+    def shutdown(self):
+        """
+        Shut down every agent, then the shared services
+        """
+        self.logger.info("Shutting down ATM host")
+        for atm in list(self.agents.values()):
+            atm.shutdown()
+        self.scheduler.stop()
+        self.diagnosis_pool.stop()
+        self.repairs.close()
+        self.outbox.stop()
+        self.metrics_server.stop()
+        if self.analytics_executor is not None:
+            self.analytics_executor.shutdown(wait=False, cancel_futures=True)
+        close_session()
+
+    def _diagnose_and_repair(self, key: str, error: Dict):
+        atm, component = self._route(key)
+        if atm is not None:
+            atm._diagnose_and_repair(component, error)
+
+    def _repair_batch(self, faults: Dict[str, Dict]):
+        """
+        Hand each agent its part of a batch; one sweep only batches its own ATM's faults
+        """
+        by_agent: Dict[str, Dict[str, Dict]] = {}
+        for key, error in faults.items():
+            atm_id, _, component = key.rpartition('/')
+            by_agent.setdefault(atm_id, {})[component] = error
+        for atm_id, agent_faults in by_agent.items():
+            atm = self.agents.get(atm_id)
+            if atm is None:
+                continue
+            if len(agent_faults) == 1:
+                atm._diagnose_and_repair(*next(iter(agent_faults.items())))
+            else:
+                atm._repair_batch(agent_faults)
+
+    def _route(self, key: str):
+        atm_id, _, component = key.rpartition('/')
+        atm = self.agents.get(atm_id)
+        if atm is None:
+            self.logger.warning(f"Dropping diagnosis job for stopped ATM {atm_id}")
+        return atm, component
+
+def agent_config(base: ATMConfig, overlay: Dict, index: int) -> ATMConfig:
+    """
+    Base config with an agent's overlay, per-agent file paths and its own
+    maintenance UI port (base port + index) unless the overlay sets them
+    """
+    if not overlay.get('ATM_ID'):
+        raise ConfigError(f"Host agent {index} has no ATM_ID")
+    atm_id = overlay['ATM_ID']
+    overlay = copy.deepcopy(overlay)
+    for section, key in PER_AGENT_PATHS:
+        value = (base.get(section) or {}).get(key)
+        settings = overlay.setdefault(section, {})
+        if value and key not in settings:
+            root, ext = os.path.splitext(value)
+            settings[key] = f"{root}.{atm_id}{ext}"
+    port = base.maintenance_ui.get('Port')
+    ui_settings = overlay.setdefault('Maintenance_UI', {})
+    if port and 'Port' not in ui_settings:
+        ui_settings['Port'] = port + index
+    return overlay_config(base, overlay)
+
+if __name__ == "__main__":
+    try:
+        host = ATMHost.from_file()
+        host.start()
+    except Exception as e:
+        logging.error(f"Failed to start ATM host: {str(e)}")
+        raise
@@ -0,0 +1,60 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import requests
+
+# One pooled session per process, shared by every outbound caller.
+# requests is imported on first use to keep it out of agent startup.
+_session: Optional['requests.Session'] = None
+_session_lock = threading.Lock()
+
+def get_session(config: Optional[Dict] = None) -> 'requests.Session':
+    """
+    Get the shared keep-alive session, creating it from the HTTP config on first use
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session(config or {})
+        return _session
+
+def get_timeouts(config: Optional[Dict] = None, read_timeout: Optional[float] = None) -> Tuple[float, float]:
+    """
+    Get the (connect, read) timeout pair from the HTTP config
+    read_timeout overrides HTTP.Read_Timeout for callers with their own limit
+    """
+    config = config or {}
+    if read_timeout is None:
+        read_timeout = config.get('Read_Timeout', 30)
+    return config.get('Connect_Timeout', 5), read_timeout
+
+def close_session():
+    """
+    Close all pooled connections
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def _create_session(config: Dict) -> 'requests.Session':
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    # pool_maxsize is the per-host connection limit; pool_block makes it a hard cap
+    adapter = HTTPAdapter(
+        pool_connections=config.get('Pool_Connections', 4),
+        pool_maxsize=config.get('Pool_Maxsize', 4),
+        pool_block=config.get('Pool_Block', False)
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
@@ -2,13 +2,85 @@
 # Developed by A1051594 - Aprendiz do Banco do Brasil
 # All rights reserved.
 
+import atexit
+import json
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+_listener: Optional[QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+class _DeferredFormatQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the writer thread; the caller only
+    resolves the message arguments
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def setup_logger(config: Optional[Dict] = None):
+    """
+    Configure the ATMLogger from the Logging config section
+    Log calls only enqueue the record; a background listener thread
+    formats and writes it to a size-rotated file
+    """
+    global _listener
+    config = config or {}
 
-def setup_logger():
     logger = logging.getLogger('ATMLogger')
-    logger.setLevel(logging.INFO)
-    handler = logging.FileHandler('atm_log.txt')
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(getattr(logging, str(config.get('Level', 'INFO')).upper(), logging.INFO))
+
+    # Replace any pipeline from an earlier setup
+    shutdown_logger()
+    for existing in list(logger.handlers):
+        if isinstance(existing, QueueHandler):
+            logger.removeHandler(existing)
+
+    handler = RotatingFileHandler(
+        config.get('File', 'atm_log.txt'),
+        maxBytes=config.get('Max_Size', 10485760),
+        backupCount=config.get('Backup_Count', 5)
+    )
+    if config.get('Format', 'text') == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    logger.addHandler(_DeferredFormatQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
     return logger
+
+def shutdown_logger():
+    """
+    Drain the log queue and stop the background writer
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(shutdown_logger)
@@ -3,116 +3,613 @@
 # All rights reserved.
 
 import logging
-import yaml
+import threading
 import time
-from typing import Dict, Optional
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Set, Union
+from config import ATMConfig, ConfigStore, DEFAULT_CONFIG_PATH
 from logger import setup_logger
 from hardware import HardwareInterface
-from ai_monitor import AIMonitor
 from maintenance import MaintenanceSystem
+from diagnosis_pool import DiagnosisWorkerPool
+from diagnosis_rules import DiagnosisRuleEngine
+from analytics import AnalyticsEngine
+from checkpoint import CheckpointStore
+from fault_events import FaultEventIngest
+from fault_tracker import ESCALATE, RECOVERED, FaultTracker
+from http_client import close_session
+from metrics import REGISTRY, MetricsServer
+
+# Components are checked on their own schedules, so there is no recurring
+# full sweep to time; the per-component check duration is the one to watch
+# (the startup sweep is logged instead)
+CHECK_DURATION = REGISTRY.histogram(
+    'atm_check_duration_seconds', 'Duration of a scheduled component check', ('component',)
+)
+
+# asyncio, the scheduler and the AI client (with requests) are imported on
+# first use so the first hardware sweep runs as early as possible after boot
+if TYPE_CHECKING:
+    from ai_monitor import AIMonitor
+    from host import ATMHost
+    from scheduler import Scheduler
 
 class ATMSystem:
-    def __init__(self, config_path: str = "../config/settings.yml"):
-        # Initialize logger
-        self.logger = setup_logger()
-        self.logger.info("Initializing ATM System")
+    def __init__(self, config: Union[ATMConfig, str] = DEFAULT_CONFIG_PATH, host: Optional['ATMHost'] = None):
+        # Under an ATMHost the agent uses the host's logger, scheduler, workers,
+        # outbox and AI client instead of creating its own
+        self.host = host
 
-        # Load configuration
+        # Load configuration once; every component shares this object
         try:
-            with open(config_path, 'r') as f:
-                self.config = yaml.safe_load(f)
+            self.config_store = ConfigStore(config)
+            self.config = self.config_store.current
         except Exception as e:
-            self.logger.error(f"Failed to load configuration: {str(e)}")
+            setup_logger().error(f"Failed to load configuration: {str(e)}")
             raise
 
+        # Initialize logger
+        if host is None:
+            self.logger = setup_logger(self.config.get('Logging'))
+        else:
+            self.logger = host.agent_logger(self.config.atm_id)
+        self.logger.info("Initializing ATM System")
+
         # Initialize components
         try:
-            self.hardware = HardwareInterface(config_path)
-            self.ai_monitor = AIMonitor(config_path)
-            self.maintenance = MaintenanceSystem(config_path)
+            shared_repairs = host.repairs if host is not None else None
+            self.hardware = HardwareInterface(self.config, repairs=shared_repairs, logger=self.logger)
+            self.maintenance = MaintenanceSystem(
+                self.config, host.outbox if host is not None else None, shared_repairs, self.logger
+            )
+            self._ai_monitor: Optional['AIMonitor'] = None
+            self._ai_monitor_lock = threading.Lock()
+            # One escalation (repairs, notifications, UI start) at a time
+            self._escalation_lock = threading.Lock()
+            self.scheduler: Optional['Scheduler'] = None
+            self.job_names: List[str] = []
+            self.diagnosis_rules = DiagnosisRuleEngine(self.config)
+            self.fault_tracker = FaultTracker(self.config.fault_tracking)
+            self.fault_events = FaultEventIngest(self.config.fault_events, self._handle_fault_event)
+            self.hardware.driver.subscribe(
+                lambda component, readings: self.fault_events.push(component)
+            )
+            self.metrics_server = MetricsServer(self.config.metrics)
+            self.checkpoints = CheckpointStore(self.config.checkpoint)
+            self.analytics = AnalyticsEngine(
+                self.config.analytics, host.analytics_executor if host is not None else None
+            )
+            self.analytics.subscribe(self._publish_analytics)
+            self._at_risk: Set[str] = set()
+            if host is None:
+                self.diagnosis_pool = DiagnosisWorkerPool(
+                    self._diagnose_and_repair, self.config.diagnosis_queue, self._repair_batch
+                )
+            else:
+                self.diagnosis_pool = host.diagnosis_queue(self.config.atm_id)
             self.running = False
             self.in_maintenance = False
+
+            # Live state served by the maintenance UI
+            self.component_status: Dict[str, Dict] = {}
+            self.last_error: Optional[Dict] = None
+            self.last_diagnosis: Optional[Dict] = None
+            self.status_updates: Deque[Dict] = deque(maxlen=50)
+            self.maintenance.register_ui_handlers(self.get_status, {
+                'repair': self._ui_attempt_repair,
+                'technician': self._ui_request_technician,
+                'shutdown': self._ui_shutdown
+            })
+            self._restore_checkpoint()
         except Exception as e:
             self.logger.error(f"Failed to initialize components: {str(e)}")
             raise
 
+    @property
+    def ai_monitor(self) -> 'AIMonitor':
+        """
+        AI client, imported and created when the first fault needs a diagnosis
+        """
+        if self._ai_monitor is None:
+            with self._ai_monitor_lock:
+                if self._ai_monitor is None and self.host is not None:
+                    self._ai_monitor = self.host.ai_monitor
+                elif self._ai_monitor is None:
+                    from ai_monitor import AIMonitor
+                    self._ai_monitor = AIMonitor(self.config)
+        return self._ai_monitor
+
+    @property
+    def ai_circuit(self) -> Optional[Dict]:
+        """
+        Circuit breaker state of the AI endpoint, None before the first AI call
+        """
+        if self._ai_monitor is None:
+            return None
+        return self._ai_monitor.breaker.snapshot()
+
     def start(self):
         """
         Start the ATM system and begin monitoring
         """
         try:
             self.logger.info("Starting ATM system")
-            self.running = True
-            self._main_loop()
+            self._start_services()
+            self._initial_sweep()
+
+            import asyncio
+            asyncio.run(self._main_loop())
         except Exception as e:
             self.logger.error(f"Failed to start ATM system: {str(e)}")
             self.shutdown()
 
+    async def run_async(self):
+        """
+        Run the ATM on an already running event loop, so several ATMs
+        can share one process (e.g. the fleet benchmark)
+        """
+        import asyncio
+        self.logger.info("Starting ATM system")
+        self._start_services()
+        await asyncio.to_thread(self._initial_sweep)
+        await self._main_loop()
+
+    async def attach(self, scheduler: 'Scheduler'):
+        """
+        Start monitoring on a shared scheduler that runs (or will run) on this loop
+        Used by ATMHost; the host stops the event sources
+        """
+        import asyncio
+        self.logger.info("Starting ATM system")
+        self._start_services()
+        await asyncio.to_thread(self._initial_sweep)
+        self.scheduler = scheduler
+        self._add_jobs()
+        await self.fault_events.start()
+
+    def _start_services(self):
+        """
+        Start the background workers and the metrics endpoint
+        """
+        self.running = True
+        self.diagnosis_pool.start()
+        if self.in_maintenance:
+            self.maintenance.resume_maintenance_mode()
+        # A host serves the metrics of all its agents
+        if self.host is None and self.config.metrics.get('Enabled', True):
+            self.metrics_server.start()
+
     def shutdown(self):
         """
         Gracefully shutdown the ATM system
         """
         self.logger.info("Shutting down ATM system")
         self.running = False
-        if self.in_maintenance:
-            self.maintenance.exit_maintenance_mode()
+        if self.host is not None:
+            self.host.detach(self)
+        elif self.scheduler is not None:
+            self.scheduler.stop()
+        self.diagnosis_pool.stop()
+        # Checkpointed first: a restart resumes maintenance mode until a technician ends it
+        self._write_checkpoint(self._export_state())
+        if self.in_maintenance and self.maintenance.exit_maintenance_mode():
+            self.in_maintenance = False
+        self.hardware.close()
+        self.checkpoints.close()
+        self.analytics.close()
+        self.maintenance.close()
+        self.metrics_server.stop()
+        if self.host is None:
+            close_session()
+
+    def _initial_sweep(self):
+        """
+        Check every component once at startup, before the async runtime loads
+        """
+        started = time.perf_counter()
+        status = self.hardware.get_full_status()
+        self.component_status.update(status)
+        self._run_escalations(self._process_status(status))
+        self.logger.info(f"Initial sweep took {(time.perf_counter() - started) * 1000:.0f} ms")
 
-    def _main_loop(self):
+    async def _main_loop(self):
         """
         Main operational loop of the ATM system
+        Each component is checked on its own schedule by the scheduler;
+        pushed device events trigger an immediate check in between
         """
-        while self.running:
-            try:
-                # Skip monitoring if in maintenance mode
-                if self.in_maintenance:
-                    time.sleep(5)
-                    continue
+        from scheduler import Scheduler
+        self.scheduler = Scheduler(self.config.scheduler)
+        self._add_jobs()
+        await self.fault_events.start()
+        try:
+            await self.scheduler.run()
+        finally:
+            await self.fault_events.stop()
 
-                # Check all hardware components
-                status = self.hardware.get_full_status()
-                self._process_status(status)
+    def _add_jobs(self):
+        """
+        Register this ATM's recurring jobs; on a shared scheduler the names carry the ATM_ID
+        """
+        jobs = [
+            # The initial sweep already covered the first check
+            (f"check_{component}", lambda component=component: self._check_component(component),
+             self._get_check_interval(component), {'run_immediately': False})
+            for component in self.hardware.COMPONENT_SECTIONS
+        ]
+        # Configs overlaid by a host have no file to watch
+        if self.host is None:
+            jobs.append(("reload_config", self._reload_config,
+                         self.config.scheduler.get('Config_Check_Interval', 10), {'jitter': 0}))
+        if self.checkpoints.enabled:
+            jobs.append(("checkpoint", self._checkpoint, self.checkpoints.interval, {'jitter': 0}))
+        if self.analytics.enabled:
+            jobs.append(("analytics", self._refresh_analytics, self.analytics.interval, {}))
+
+        for name, func, interval, options in jobs:
+            name = self._job_name(name)
+            self.scheduler.add_job(name, func, interval, **options)
+            self.job_names.append(name)
+
+    def _job_name(self, name: str) -> str:
+        return name if self.host is None else f"{self.config.atm_id}/{name}"
+
+    async def _reload_config(self):
+        """
+        Apply settings.yml changes without restarting the ATM
+        """
+        import asyncio
+        config = await asyncio.to_thread(self.config_store.reload_if_changed)
+        if config is None:
+            return
+
+        self.config = config
+        self.hardware.reconfigure(config)
+        self.diagnosis_rules.reconfigure(config)
+        self.fault_tracker.reconfigure(config.fault_tracking)
+        if self._ai_monitor is not None:
+            self._ai_monitor.reconfigure(config)
+        self.maintenance.reconfigure(config)
+        self.analytics.reconfigure(config.analytics)
+        logging.getLogger('ATMLogger').setLevel(
+            getattr(logging, str(config.logging.get('Level', 'INFO')).upper(), logging.INFO)
+        )
+        for component in self.hardware.COMPONENT_SECTIONS:
+            job = self.scheduler.jobs.get(self._job_name(f"check_{component}"))
+            if job is not None:
+                job.interval = self._get_check_interval(component)
+        job = self.scheduler.jobs.get(self._job_name("checkpoint"))
+        if job is not None:
+            job.interval = self.checkpoints.interval = config.checkpoint.get('Interval', 5)
+        job = self.scheduler.jobs.get(self._job_name("analytics"))
+        if job is not None:
+            job.interval = self.analytics.interval
+
+    async def _refresh_analytics(self):
+        """
+        Recompute failure analytics over the error history in a worker process
+        """
+        if self.analytics.enabled:
+            await self.analytics.refresh(self.maintenance.error_history)
+
+    def _publish_analytics(self, results: Dict):
+        """
+        Warn once when a component becomes likely to fail soon and refresh the maintenance UI
+        """
+        at_risk = self.analytics.at_risk(results)
+        for component, risk in at_risk.items():
+            if component in self._at_risk:
+                continue
+            self._add_status_update('warning', f"{component} failure risk {risk:.0%} within the next "
+                                               f"{self.analytics.params['horizon'] / 60:.0f} min")
+        self._at_risk = set(at_risk)
+        self.maintenance.publish_status()
+
+    async def _checkpoint(self):
+        """
+        Save the agent state; only the snapshot is taken on the event loop
+        """
+        import asyncio
+        await asyncio.to_thread(self._write_checkpoint, self._export_state())
+
+    def _export_state(self) -> Dict:
+        """
+        Snapshot of the state a restarted agent resumes from
+        """
+        return {
+            'agent': {
+                'in_maintenance': self.in_maintenance,
+                'component_status': dict(self.component_status),
+                'last_error': self.last_error,
+                'last_diagnosis': self.last_diagnosis,
+                'status_updates': list(self.status_updates)
+            },
+            'faults': self.fault_tracker.export_state(),
+            'maintenance': self.maintenance.export_state()
+        }
 
-                # Wait before next check
-                time.sleep(self.config.get('Hardware', {}).get('Check_Interval', 30))
+    def _write_checkpoint(self, state: Dict):
+        """
+        Persist new error history entries and the changed checkpoint sections
+        """
+        try:
+            if self.checkpoints.enabled:
+                self.maintenance.error_history.flush()
+                self.checkpoints.save(state)
+        except Exception as e:
+            self.logger.error(f"Failed to checkpoint agent state: {str(e)}")
 
-            except Exception as e:
-                self.logger.error(f"Error in main loop: {str(e)}")
-                if self._should_enter_maintenance(str(e)):
-                    self._handle_critical_error(str(e))
-                time.sleep(5)
+    def _restore_checkpoint(self):
+        """
+        Resume from the last checkpoint, so known faults are not diagnosed
+        and reported again after a crash or reboot
+        """
+        started = time.perf_counter()
+        state = self.checkpoints.load()
+        if not state:
+            return
+        try:
+            age = max(time.time() - state['saved_at'], 0)
+            agent = state.get('agent', {})
+            maintenance = state.get('maintenance', {})
+            self.component_status.update(agent.get('component_status', {}))
+            self.last_error = agent.get('last_error')
+            self.last_diagnosis = agent.get('last_diagnosis')
+            self.status_updates.extend(agent.get('status_updates', []))
+            self.fault_tracker.restore_state(state.get('faults', {}))
+            self.maintenance.restore_state(maintenance, age)
+            # One answer for both flags, so monitoring is never paused without the
+            # maintenance UI that ends the pause (older checkpoints could disagree)
+            self.in_maintenance = self.maintenance.maintenance_mode = bool(
+                agent.get('in_maintenance') or maintenance.get('maintenance_mode')
+            )
+            self.logger.info(f"Resumed from checkpoint saved {age:.0f}s ago "
+                             f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+        except Exception as e:
+            self.logger.error(f"Failed to restore checkpoint: {str(e)}")
 
-    def _process_status(self, status: Dict):
+    async def _check_component(self, component: str):
+        """
+        Check a single component off the event loop; only classifying the
+        result runs on it, escalations go to a thread
+        """
+        import asyncio
+
+        # Skip monitoring if in maintenance mode
+        if self.in_maintenance:
+            return
+
+        started = time.perf_counter()
+        try:
+            details = await asyncio.to_thread(self.hardware.probe_component, component)
+            self.component_status[component] = details
+            escalations = self._process_status({component: details})
+            CHECK_DURATION.observe(time.perf_counter() - started, component=component)
+            if escalations:
+                await asyncio.to_thread(self._run_escalations, escalations)
+        except Exception as e:
+            self.logger.error(f"Error checking {component}: {str(e)}")
+            if self._should_enter_maintenance(str(e)):
+                await asyncio.to_thread(self._handle_critical_error, str(e))
+            raise
+
+    async def _handle_fault_event(self, event: Dict):
+        """
+        Check a component right away after it pushed a state change
+        The event only wakes the loop; the probe confirms the actual state
+        """
+        component = event['component']
+        if component not in HardwareInterface.COMPONENT_SECTIONS:
+            self.logger.warning(f"Ignoring {event['source']} event for unknown component {component}")
+            return
+        # The cached snapshot predates the event
+        self.hardware.snapshots.invalidate()
+        await self._check_component(component)
+
+    def _get_check_interval(self, component: str) -> float:
+        """
+        Get the check interval for a component, falling back to Hardware.Check_Interval
+        Devices that push their own events are only polled as a fallback
+        """
+        hardware_config = self.config.hardware
+        section = hardware_config.get(HardwareInterface.COMPONENT_SECTIONS[component]) or {}
+        interval = section.get('Check_Interval', hardware_config.get('Check_Interval', 30))
+        events_config = self.config.fault_events
+        if self.hardware.driver.supports_push and events_config.get('Enabled', True):
+            interval = max(interval, events_config.get('Fallback_Check_Interval', 300))
+        return interval
+
+    def _process_status(self, status: Dict) -> List[Callable[[], None]]:
         """
         Process the status of all hardware components
+        Only fault transitions and deadlines trigger work: new faults (and
+        persisting ones every Renotify_Interval) are queued for diagnosis,
+        faults older than Escalate_After go to maintenance mode
+        This never waits on the AI or the devices, so it can run on the event loop
+        Returns: escalations (maintenance mode, critical errors), for _run_escalations()
         """
+        escalations: List[Callable[[], None]] = []
         try:
+            new_faults = {}
             for component, details in status.items():
-                if not details['status']:  # Component has an error
-                    self.logger.warning(f"Error detected in {component}: {details['error']}")
-                    
-                    # Get AI diagnosis
-                    issue_type, diagnosis = self.ai_monitor.diagnose_issue({
-                        'component': component,
-                        'error': details['error']
-                    })
-
-                    # Attempt self-repair if diagnosis is available
-                    if issue_type != 'DIAGNOSIS_ERROR':
-                        repair_success, repair_details = self.ai_monitor.perform_self_repair(
-                            issue_type, diagnosis
-                        )
-
-                        if not repair_success:
-                            # If repair failed, run maintenance
-                            self._handle_repair_failure(component, details['error'], repair_details)
-                    else:
-                        # If diagnosis failed, enter maintenance mode
-                        self._handle_critical_error(f"AI diagnosis failed for {component}")
+                transition = self.fault_tracker.observe(component, details)
+                if transition is None:
+                    continue
+                if transition == RECOVERED:
+                    self._add_status_update('success', f"{component} recovered")
+                    continue
+
+                self.last_error = {'component': component, 'error': details['error']}
+                if transition == ESCALATE:
+                    self.logger.warning(f"Fault in {component} unresolved, escalating: {details['error']}")
+                    self._add_status_update('error', f"Unresolved fault in {component} escalated")
+                    escalations.append(lambda component=component, error=details['error']: (
+                        self._enter_maintenance_mode({'component': component, 'error': error, 'escalated': True})
+                    ))
+                    continue
+
+                self.logger.warning(f"Error detected in {component}: {details['error']}")
+                self._add_status_update('warning', f"Error detected in {component}")
+                new_faults[component] = details['error']
+
+            # Faults seen in the same sweep are repaired together
+            if new_faults:
+                self.diagnosis_pool.submit_batch(new_faults)
 
         except Exception as e:
             self.logger.error(f"Error processing status: {str(e)}")
+            escalations.append(lambda error=str(e): self._handle_critical_error(error))
+        return escalations
+
+    def _run_escalations(self, escalations: List[Callable[[], None]]):
+        """
+        Enter maintenance mode / handle critical errors; blocks on repairs,
+        notifications and the UI server, so never call it on the event loop
+        """
+        with self._escalation_lock:
+            for escalation in escalations:
+                escalation()
+
+    def _diagnose_and_repair(self, component: str, error: Dict):
+        """
+        Diagnose a failing component and attempt self-repair
+        Runs on a diagnosis worker thread
+        """
+        try:
+            sensor_data = {'component': component, 'error': error}
+
+            # Known error types are resolved locally, without the AI endpoint
+            rule_diagnosis = self.diagnosis_rules.diagnose(sensor_data)
+            if rule_diagnosis is not None:
+                self._apply_rule_diagnosis(component, error, *rule_diagnosis)
+                return
+
+            # Don't wait on an endpoint that is known to be down
+            if self._ai_monitor is not None and not self._ai_monitor.available:
+                self._defer_diagnosis(component, error, self.ai_circuit)
+                return
+
+            # Get AI diagnosis
+            issue_type, diagnosis = self.ai_monitor.diagnose_issue(sensor_data)
+            if issue_type == 'AI_UNAVAILABLE':
+                self._defer_diagnosis(component, error, diagnosis.get('circuit'))
+                return
+            self.last_diagnosis = {'issue_type': issue_type, 'details': diagnosis}
+
+            # Attempt self-repair if diagnosis is available
+            if issue_type != 'DIAGNOSIS_ERROR':
+                repair_success, repair_details = self.ai_monitor.perform_self_repair(
+                    issue_type, diagnosis
+                )
+
+                if not repair_success and (repair_details or {}).get('error_type') == 'AI_UNAVAILABLE':
+                    # The circuit opened between diagnosis and repair
+                    self._defer_diagnosis(component, error, repair_details.get('circuit'))
+                elif not repair_success:
+                    # If repair failed, run maintenance
+                    self._handle_repair_failure(component, error, repair_details)
+                else:
+                    self._add_status_update('success', f"Self-repair succeeded for {component}")
+            else:
+                # If diagnosis failed, enter maintenance mode
+                self._handle_critical_error(f"AI diagnosis failed for {component}")
+
+        except Exception as e:
+            self.logger.error(f"Error diagnosing {component}: {str(e)}")
+            self._handle_critical_error(str(e))
+
+    def _repair_batch(self, faults: Dict[str, Dict]):
+        """
+        Diagnose and repair several failing components at once
+        Rule-resettable devices are reset in parallel and re-probed together;
+        the rest goes through maintenance as one batch, and faults unknown
+        to the rules table are sent to the AI one by one
+        Runs on a diagnosis worker thread
+        """
+        try:
+            local, unknown = {}, {}
+            for component, error in faults.items():
+                rule_diagnosis = self.diagnosis_rules.diagnose({'component': component, 'error': error})
+                if rule_diagnosis is None:
+                    unknown[component] = error
+                else:
+                    local[component] = rule_diagnosis
+                    self.last_diagnosis = {'issue_type': rule_diagnosis[0], 'details': rule_diagnosis[1]}
+
+            resettable = [component for component, (_, diagnosis) in local.items()
+                          if diagnosis['repair'] == 'reset']
+            reset = self.hardware.reset_devices(resettable) if resettable else {}
+            recovered = set()
+            if any(reset.values()):
+                status = self.hardware.get_full_status()
+                for component, success in reset.items():
+                    if not success:
+                        continue
+                    self.component_status[component] = status[component]
+                    self.fault_tracker.observe(component, status[component])
+                    if status[component]['status']:
+                        recovered.add(component)
+                        self._add_status_update('success', f"Self-repair succeeded for {component}")
+
+            failed = {
+                component: {
+                    'component': component,
+                    'error': faults[component],
+                    'repair_attempt': {'rule_diagnosis': diagnosis}
+                }
+                for component, (_, diagnosis) in local.items() if component not in recovered
+            }
+            if failed:
+                self.logger.warning(f"Repair failed for {', '.join(failed)}")
+                results = self.maintenance.run_maintenance_batch(failed)
+                if not all(results.values()) and not self.in_maintenance:
+                    self.logger.info("Entering maintenance mode")
+                    self.in_maintenance = True
+                    if not self.maintenance.maintenance_mode:
+                        self.maintenance.enter_maintenance_mode({'components': failed})
+
+            for component, error in unknown.items():
+                self._diagnose_and_repair(component, error)
+
+        except Exception as e:
+            self.logger.error(f"Error repairing {', '.join(faults)}: {str(e)}")
             self._handle_critical_error(str(e))
 
+    def _apply_rule_diagnosis(self, component: str, error: Dict, issue_type: str, diagnosis: Dict):
+        """
+        Act on a rules-table diagnosis: reset the device locally when the rule
+        allows it, otherwise hand the fault to the maintenance routines
+        """
+        self.last_diagnosis = {'issue_type': issue_type, 'details': diagnosis}
+        self.logger.debug(f"Rule diagnosis for {component}: {issue_type} "
+                          f"(hit rate {self.diagnosis_rules.stats()['hit_rate']:.0%})")
+
+        if diagnosis['repair'] == 'reset' and self.hardware.reset_device(component):
+            details = self.hardware.probe_component(component)
+            self.component_status[component] = details
+            self.fault_tracker.observe(component, details)
+            if details['status']:
+                self._add_status_update('success', f"Self-repair succeeded for {component}")
+                return
+
+        self._handle_repair_failure(component, error, {'rule_diagnosis': diagnosis})
+
+    def _defer_diagnosis(self, component: str, error: Dict, circuit: Optional[Dict]):
+        """
+        Degraded path while the AI circuit is open: record the fault with the
+        maintenance routines and keep serving; the next probe retries the
+        diagnosis, and recurring faults still escalate through the error thresholds
+        """
+        self.logger.warning(f"AI unavailable, deferring diagnosis of {component}")
+        self._add_status_update('warning', f"AI diagnosis unavailable, {component} fault recorded for retry")
+        maintenance_success = self.maintenance.run_maintenance({
+            'component': component,
+            'error': error,
+            'repair_attempt': {'ai_circuit': circuit}
+        })
+        if not maintenance_success and self.maintenance.maintenance_mode:
+            self.in_maintenance = True
+
     def _handle_repair_failure(self, component: str, error: Dict, repair_details: Optional[Dict]):
         """
         Handle failed repair attempts
@@ -132,20 +629,25 @@ class ATMSystem:
                     'component': component,
                     'error': error,
                     'repair_attempt': repair_details
-                })
+                }, recorded=True)
 
         except Exception as e:
             self.logger.error(f"Error handling repair failure: {str(e)}")
             self._handle_critical_error(str(e))
 
-    def _enter_maintenance_mode(self, error_details: Dict):
+    def _enter_maintenance_mode(self, error_details: Dict, recorded: bool = False):
         """
         Enter maintenance mode
+        recorded: the fault already went through the maintenance routines (and the error history)
         """
         try:
             self.logger.info("Entering maintenance mode")
             self.in_maintenance = True
-            self.maintenance.run_maintenance(error_details)
+            if not recorded:
+                self.maintenance.run_maintenance(error_details)
+            # Make sure the maintenance UI is up even if the threshold wasn't reached
+            if not self.maintenance.maintenance_mode:
+                self.maintenance.enter_maintenance_mode(error_details)
         except Exception as e:
             self.logger.error(f"Failed to enter maintenance mode: {str(e)}")
             self._handle_critical_error(str(e))
@@ -155,10 +657,11 @@ class ATMSystem:
         Handle critical system errors
         """
         self.logger.error(f"Critical error: {error}")
+        self._add_status_update('error', f"Critical error: {error}")
         try:
             # Notify monitoring system of critical error
             self.maintenance.notify_windows_monitor({
-                'atm_id': self.config['ATM_ID'],
+                'atm_id': self.config.atm_id,
                 'status': 'CRITICAL_ERROR',
                 'error': error,
                 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
@@ -181,6 +684,95 @@ class ATMSystem:
         critical_keywords = ['CRITICAL', 'FATAL', 'HARDWARE_FAILURE']
         return any(keyword in error.upper() for keyword in critical_keywords)
 
+    def get_status(self) -> Dict:
+        """
+        Live ATM state in the shape rendered by ui/maintenance.js
+        """
+        last_error = self.last_error or {}
+        error = last_error.get('error') or {}
+        diagnosis = self.last_diagnosis or {}
+        details = diagnosis.get('details') or {}
+        if not isinstance(details, dict):
+            details = {'recommendation': str(details)}
+        if self.in_maintenance:
+            error_type = 'CRITICAL'
+        elif any(not c['status'] for c in list(self.component_status.values())):
+            error_type = 'WARNING'
+        else:
+            error_type = 'INFO'
+
+        return {
+            'atmId': self.config.atm_id,
+            'inMaintenance': self.in_maintenance,
+            'errorType': error_type,
+            'component': last_error.get('component', 'none'),
+            'description': error.get('details') or error.get('error_type') or 'No errors detected',
+            'components': dict(self.component_status),
+            'diagnostics': {
+                'analysis': diagnosis.get('issue_type', 'No diagnosis yet'),
+                'confidence': details.get('confidence', 'N/A'),
+                'recommendation': details.get('recommendation', 'N/A')
+            },
+            'aiService': (self.ai_circuit or {}).get('state', 'CLOSED'),
+            'history': self.maintenance.get_status()['history'],
+            'analytics': self.analytics.latest,
+            'updates': list(self.status_updates)
+        }
+
+    def _add_status_update(self, update_type: str, message: str):
+        """
+        Record an update for the maintenance UI feed
+        """
+        self.status_updates.append({
+            'type': update_type,
+            'message': message,
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self.maintenance.publish_status()
+
+    def _ui_attempt_repair(self, request: Dict) -> bool:
+        """
+        Reset the faulty component and leave maintenance mode if it recovers
+        """
+        component = (self.last_error or {}).get('component')
+        if component not in HardwareInterface.COMPONENT_SECTIONS:
+            return False
+        if not self.hardware.reset_device(component):
+            return False
+        details = self.hardware.probe_component(component)
+        self.component_status[component] = details
+        self.fault_tracker.observe(component, details)
+        if not details['status']:
+            self._add_status_update('warning', f"Manual repair of {component} did not clear the fault")
+            return False
+
+        self._add_status_update('success', f"Manual repair of {component} succeeded")
+        if self.in_maintenance and self.maintenance.exit_maintenance_mode():
+            self.in_maintenance = False
+        return True
+
+    def _ui_request_technician(self, request: Dict) -> bool:
+        """
+        Ask the Windows monitor to dispatch a technician
+        """
+        self.maintenance.notify_windows_monitor({
+            'atm_id': self.config.atm_id,
+            'status': 'TECHNICIAN_REQUESTED',
+            'error_details': request.get('errorDetails') or self.last_error,
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self._add_status_update('info', "Technician requested")
+        return True
+
+    def _ui_shutdown(self, request: Dict) -> bool:
+        """
+        Emergency shutdown requested from the maintenance UI
+        Runs after the response is sent, since shutdown stops the UI server
+        """
+        self._add_status_update('error', "Emergency shutdown requested")
+        threading.Timer(0.5, self.shutdown).start()
+        return True
+
 if __name__ == "__main__":
     try:
         atm = ATMSystem()
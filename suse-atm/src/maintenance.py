@@ -3,27 +3,124 @@
 # All rights reserved.
 
 import logging
-import yaml
 import json
-import requests
-import subprocess
-from typing import Dict, Optional, List
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, List, Union
 from datetime import datetime
 import threading
-import webbrowser
+from notification_outbox import NotificationOutbox
+from error_window import SlidingWindowCounter
+from history_store import ErrorHistoryStore
+from config import ATMConfig, DEFAULT_CONFIG_PATH, resolve_config
+from metrics import REGISTRY
+from repair_executor import RepairExecutor
+
+MAINTENANCE_ENTRIES = REGISTRY.counter('atm_maintenance_entries_total', 'Times maintenance mode was entered')
 
 class MaintenanceSystem:
-    def __init__(self, config_path: str = "../config/settings.yml"):
-        self.logger = logging.getLogger('ATMLogger')
-        with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
-            self.network_config = config['Network']
-            self.maintenance_config = config['Maintenance_Thresholds']
-            self.security_config = config['Security']
+    # Error type -> automated repair routine
+    REPAIR_ROUTINES = {
+        'NOTE_JAM': '_clear_note_jam',
+        'CARD_READER_ERROR': '_reset_card_reader',
+        'PRINTER_ERROR': '_reset_printer',
+        'DISPLAY_ERROR': '_reset_display'
+    }
+
+    def __init__(self, config: Union[ATMConfig, str] = DEFAULT_CONFIG_PATH,
+                 outbox: Optional[NotificationOutbox] = None, repairs: Optional[RepairExecutor] = None,
+                 logger: Optional[logging.Logger] = None):
+        # In host mode the agent passes its ATM_ID-prefixed logger
+        self.logger = logger or logging.getLogger('ATMLogger')
+        config = resolve_config(config)
+        # A shared outbox and executor (host mode) are configured and stopped by their owner
+        self._owns_outbox = outbox is None
+        self._owns_repairs = repairs is None
+        self.reconfigure(config)
 
         self.maintenance_mode = False
-        self.error_history: List[Dict] = []
+        self.repairs = repairs or RepairExecutor(config.repair)
+        self.error_history = ErrorHistoryStore(config.error_history)
+        # Per error type counts over the last Auto_Reset_Interval seconds
+        self.error_counters: Dict[str, SlidingWindowCounter] = {}
+        self._counter_lock = threading.Lock()
         self.maintenance_ui_server = None
+        # Recent maintenance runs shown in the maintenance UI
+        self.maintenance_log: Deque[Dict] = deque(maxlen=50)
+        self.status_provider: Callable[[], Dict] = self.get_status
+        self.ui_actions: Dict[str, Callable[[Dict], bool]] = {}
+        if outbox is None:
+            outbox = NotificationOutbox.from_config(config)
+            outbox.start()
+        self.outbox = outbox
+
+    def reconfigure(self, config: ATMConfig):
+        """
+        Apply a (re)loaded configuration
+        Pool, spool and UI port settings only take effect on restart
+        """
+        previous_thresholds = getattr(self, 'maintenance_config', None)
+        self.atm_id = config.atm_id
+        self.network_config = config.network
+        self.maintenance_config = config.maintenance_thresholds
+        self.security_config = config.security
+        self.http_config = config.http
+        self.ui_config = config.maintenance_ui
+
+        if hasattr(self, 'repairs') and self._owns_repairs:
+            self.repairs.reconfigure(config.repair)
+
+        if hasattr(self, 'outbox') and self._owns_outbox:
+            self.outbox.endpoint = self.network_config['Windows_Monitor_Endpoint']
+            self.outbox.headers['Authorization'] = f'Bearer {self.security_config["Auth_Token"]}'
+            self.outbox.verify = self.security_config['SSL_Cert_Path']
+        if previous_thresholds is not None and self._window_settings(previous_thresholds) != \
+                self._window_settings(self.maintenance_config):
+            # Windows sized for the old interval are rebuilt on the next error
+            with self._counter_lock:
+                self.error_counters.clear()
+
+    @staticmethod
+    def _window_settings(thresholds) -> tuple:
+        return thresholds['Auto_Reset_Interval'], thresholds.get('Error_Window_Buckets', 60)
+
+    def export_state(self) -> Dict:
+        """
+        Maintenance state for checkpoints; error window counts are kept as ages in seconds
+        """
+        with self._counter_lock:
+            counters = {etype: counter.export() for etype, counter in self.error_counters.items()}
+        return {
+            'maintenance_mode': self.maintenance_mode,
+            'maintenance_log': list(self.maintenance_log),
+            'error_counters': {etype: entries for etype, entries in counters.items() if entries}
+        }
+
+    def restore_state(self, state: Dict, age: float = 0):
+        """
+        Reload export_state() output saved `age` seconds ago
+        Maintenance mode is restored without notifying again; resume_maintenance_mode()
+        brings the maintenance UI back
+        """
+        self.maintenance_mode = state.get('maintenance_mode', False)
+        self.maintenance_log.extend(state.get('maintenance_log', []))
+        with self._counter_lock:
+            for error_type, entries in state.get('error_counters', {}).items():
+                counter = SlidingWindowCounter(
+                    self.maintenance_config['Auto_Reset_Interval'],
+                    self.maintenance_config.get('Error_Window_Buckets', 60)
+                )
+                counter.restore([(entry_age + age, count) for entry_age, count in entries])
+                self.error_counters[error_type] = counter
+
+    def resume_maintenance_mode(self):
+        """
+        Restart the maintenance UI after the agent restarted in maintenance mode
+        """
+        try:
+            self.logger.info("Resuming maintenance mode")
+            self._start_maintenance_ui_server()
+        except Exception as e:
+            self.logger.error(f"Failed to resume maintenance mode: {str(e)}")
 
     def run_maintenance(self, error_details: Dict) -> bool:
         """
@@ -33,24 +130,30 @@ class MaintenanceSystem:
         try:
             self.logger.info(f"Starting maintenance routine for error: {error_details}")
             
+            error_type = self._get_error_type(error_details)
+
             # Add error to history
-            self.error_history.append({
-                'timestamp': datetime.now().isoformat(),
-                'error': error_details
-            })
+            self.error_history.add(error_type, error_details)
+            self._record_error(error_type)
 
             # Check if error threshold is exceeded
-            if self._check_error_threshold(error_details['error_type']):
-                self.logger.warning(f"Error threshold exceeded for {error_details['error_type']}")
-                self._enter_maintenance_mode(error_details)
+            if self._check_error_threshold(error_type):
+                self.logger.warning(f"Error threshold exceeded for {error_type}")
+                self.enter_maintenance_mode(error_details)
                 return False
 
             # Attempt automated repair
             success = self._perform_automated_repair(error_details)
+            self.maintenance_log.append({
+                'timestamp': datetime.now().isoformat(),
+                'status': 'SUCCESS' if success else 'FAILED',
+                'action': f"Automated repair for {error_type}"
+            })
+            self.publish_status()
             
             # Notify Windows monitoring system
             self.notify_windows_monitor({
-                'atm_id': self.network_config['ATM_ID'],
+                'atm_id': self.atm_id,
                 'error_details': error_details,
                 'maintenance_status': 'SUCCESS' if success else 'FAILED',
                 'timestamp': datetime.now().isoformat()
@@ -61,64 +164,148 @@ class MaintenanceSystem:
         except Exception as e:
             self.logger.error(f"Maintenance routine failed: {str(e)}")
             self.notify_windows_monitor({
-                'atm_id': self.network_config['ATM_ID'],
+                'atm_id': self.atm_id,
                 'error': str(e),
                 'maintenance_status': 'ERROR',
                 'timestamp': datetime.now().isoformat()
             })
             return False
 
+    def run_maintenance_batch(self, faults: Dict[str, Dict]) -> Dict[str, bool]:
+        """
+        Execute maintenance routines for several failing components at once
+        Repairs run in parallel and one notification covers the whole batch
+        Returns: {component: maintenance successful}
+        """
+        results: Dict[str, bool] = {}
+        try:
+            self.logger.info(f"Starting maintenance routine for {len(faults)} components")
+            to_repair = {}
+            for component, error_details in faults.items():
+                error_type = self._get_error_type(error_details)
+                self.error_history.add(error_type, error_details)
+                self._record_error(error_type)
+                if self._check_error_threshold(error_type):
+                    self.logger.warning(f"Error threshold exceeded for {error_type}")
+                    results[component] = False
+                else:
+                    to_repair[component] = error_details
+
+            if results and not self.maintenance_mode:
+                self.enter_maintenance_mode({'components': faults})
+
+            repaired = self.perform_repairs(to_repair)
+            for component, success in repaired.items():
+                self.maintenance_log.append({
+                    'timestamp': datetime.now().isoformat(),
+                    'status': 'SUCCESS' if success else 'FAILED',
+                    'action': f"Automated repair for {self._get_error_type(to_repair[component])}"
+                })
+            results.update(repaired)
+            self.publish_status()
+
+            self.notify_windows_monitor({
+                'atm_id': self.atm_id,
+                'error_details': list(faults.values()),
+                'maintenance_status': {
+                    component: 'SUCCESS' if success else 'FAILED'
+                    for component, success in results.items()
+                },
+                'timestamp': datetime.now().isoformat()
+            })
+            return results
+
+        except Exception as e:
+            self.logger.error(f"Maintenance routine failed: {str(e)}")
+            self.notify_windows_monitor({
+                'atm_id': self.atm_id,
+                'error': str(e),
+                'maintenance_status': 'ERROR',
+                'timestamp': datetime.now().isoformat()
+            })
+            return {component: results.get(component, False) for component in faults}
+
+    def perform_repairs(self, faults: Dict[str, Dict]) -> Dict[str, bool]:
+        """
+        Run the repair routines of several failing components in parallel,
+        honouring Repair.Dependencies and Repair.Action_Timeout
+        Returns: {component: repaired}
+        """
+        results: Dict[str, bool] = {}
+        actions = []
+        for component, error_details in faults.items():
+            error_type = self._get_error_type(error_details)
+            routine = self.REPAIR_ROUTINES.get(error_type)
+            if routine is None:
+                self.logger.warning(f"No automated repair available for {error_type}")
+                results[component] = False
+                continue
+            actions.append(self.repairs.action(component, getattr(self, routine)))
+
+        for component, result in self.repairs.run(actions, self.logger).items():
+            results[component] = result['success']
+        return results
+
+    def _get_error_type(self, error_details: Dict) -> str:
+        """
+        Get the error type from either a flat error or a {'component', 'error'} report
+        """
+        if 'error_type' in error_details:
+            return error_details['error_type']
+        return (error_details.get('error') or {}).get('error_type', 'UNKNOWN')
+
+    def _record_error(self, error_type: str):
+        """
+        Count an occurrence of an error type in its sliding window
+        """
+        with self._counter_lock:
+            counter = self.error_counters.get(error_type)
+            if counter is None:
+                counter = SlidingWindowCounter(
+                    self.maintenance_config['Auto_Reset_Interval'],
+                    self.maintenance_config.get('Error_Window_Buckets', 60)
+                )
+                self.error_counters[error_type] = counter
+            counter.add()
+
     def _check_error_threshold(self, error_type: str) -> bool:
         """
         Check if number of errors exceeds threshold
         """
-        recent_errors = [
-            e for e in self.error_history 
-            if e['error']['error_type'] == error_type and 
-            (datetime.now() - datetime.fromisoformat(e['timestamp'])).seconds < 
-            self.maintenance_config['Auto_Reset_Interval']
-        ]
-        
+        with self._counter_lock:
+            counter = self.error_counters.get(error_type)
+            recent_errors = counter.count() if counter else 0
+
         threshold = self.maintenance_config.get(f'Max_{error_type}', 3)
-        return len(recent_errors) >= threshold
+        return recent_errors >= threshold
 
     def _perform_automated_repair(self, error_details: Dict) -> bool:
         """
         Attempt automated repair based on error type
         """
         try:
-            repair_actions = {
-                'NOTE_JAM': self._clear_note_jam,
-                'CARD_READER_ERROR': self._reset_card_reader,
-                'PRINTER_ERROR': self._reset_printer,
-                'DISPLAY_ERROR': self._reset_display
-            }
-
-            repair_func = repair_actions.get(error_details['error_type'])
-            if repair_func:
-                return repair_func()
-            
-            self.logger.warning(f"No automated repair available for {error_details['error_type']}")
-            return False
+            key = error_details.get('component') or self._get_error_type(error_details)
+            return self.perform_repairs({key: error_details})[key]
 
         except Exception as e:
             self.logger.error(f"Automated repair failed: {str(e)}")
             return False
 
-    def _enter_maintenance_mode(self, error_details: Dict):
+    def enter_maintenance_mode(self, error_details: Dict):
         """
         Enter maintenance mode and launch maintenance UI
         """
         try:
             self.maintenance_mode = True
             self.logger.info("Entering maintenance mode")
+            MAINTENANCE_ENTRIES.inc()
 
             # Start maintenance UI server
             self._start_maintenance_ui_server()
 
             # Notify Windows monitoring system
             self.notify_windows_monitor({
-                'atm_id': self.network_config['ATM_ID'],
+                'atm_id': self.atm_id,
                 'status': 'MAINTENANCE_MODE',
                 'error_details': error_details,
                 'timestamp': datetime.now().isoformat()
@@ -129,57 +316,69 @@ class MaintenanceSystem:
 
     def _start_maintenance_ui_server(self):
         """
-        Start a simple HTTP server for the maintenance UI
+        Start the embedded HTTP server for the maintenance UI
         """
         try:
-            # Kill any existing process using port 8000
-            subprocess.run(['pkill', '-f', 'python.*http.server.*8000'], 
-                         stderr=subprocess.DEVNULL)
-            
-            # Start new server in a separate thread
-            server_thread = threading.Thread(
-                target=lambda: subprocess.run([
-                    'python3', '-m', 'http.server', '8000', 
-                    '-d', '../ui'
-                ])
-            )
-            server_thread.daemon = True
-            server_thread.start()
-            
-            self.maintenance_ui_server = server_thread
+            if self.maintenance_ui_server is None:
+                # Only imported once maintenance mode is first entered
+                from ui_server import MaintenanceUIServer
+                self.maintenance_ui_server = MaintenanceUIServer(
+                    self.ui_config, self.status_provider, self.ui_actions,
+                    self.security_config.get('Auth_Token')
+                )
+            self.maintenance_ui_server.start()
             self.logger.info("Maintenance UI server started")
 
         except Exception as e:
             self.logger.error(f"Failed to start maintenance UI server: {str(e)}")
             raise
 
-    def notify_windows_monitor(self, notification_data: Dict):
+    def register_ui_handlers(self, status_provider: Callable[[], Dict],
+                             actions: Dict[str, Callable[[Dict], bool]]):
         """
-        Send notification to Windows monitoring system
+        Set the live status source and the POST /api/<name> actions of the maintenance UI
         """
-        try:
-            headers = {
-                'Authorization': f'Bearer {self.security_config["Auth_Token"]}',
-                'Content-Type': 'application/json'
-            }
-
-            response = requests.post(
-                self.network_config['Windows_Monitor_Endpoint'],
-                json=notification_data,
-                headers=headers,
-                verify=self.security_config['SSL_Cert_Path'],
-                timeout=30
-            )
+        self.status_provider = status_provider
+        self.ui_actions = actions
 
-            if response.status_code != 200:
-                raise Exception(f"Notification failed: {response.text}")
+    def publish_status(self):
+        """
+        Push the current status to connected dashboards without waiting for the next sample
+        """
+        if self.maintenance_ui_server is not None and self.maintenance_ui_server.running:
+            self.maintenance_ui_server.feed.publish()
 
-            self.logger.info("Successfully notified Windows monitoring system")
+    def get_status(self) -> Dict:
+        """
+        Maintenance state as shown in the maintenance UI
+        """
+        return {
+            'atmId': self.atm_id,
+            'maintenanceMode': self.maintenance_mode,
+            'history': list(self.maintenance_log)
+        }
 
+    def notify_windows_monitor(self, notification_data: Dict):
+        """
+        Queue a notification for the Windows monitoring system
+        Delivery is batched by the outbox and never blocks the caller
+        """
+        try:
+            self.outbox.enqueue(notification_data)
         except Exception as e:
-            self.logger.error(f"Failed to notify Windows monitor: {str(e)}")
+            self.logger.error(f"Failed to queue Windows monitor notification: {str(e)}")
             # Continue execution even if notification fails
 
+    def close(self):
+        """
+        Flush pending notifications and release background resources
+        """
+        if self._owns_repairs:
+            self.repairs.close()
+        if self._owns_outbox:
+            self.outbox.stop()
+        self.error_history.close()
+
     # Hardware-specific repair routines
     def _clear_note_jam(self) -> bool:
         """Attempt to clear a note jam"""
@@ -224,16 +423,14 @@ class MaintenanceSystem:
         try:
             if self.maintenance_ui_server:
                 # Stop the maintenance UI server
-                subprocess.run(['pkill', '-f', 'python.*http.server.*8000'], 
-                             stderr=subprocess.DEVNULL)
-                self.maintenance_ui_server = None
+                self.maintenance_ui_server.stop()
 
             self.maintenance_mode = False
             self.logger.info("Exited maintenance mode")
             
             # Notify Windows monitoring system
             self.notify_windows_monitor({
-                'atm_id': self.network_config['ATM_ID'],
+                'atm_id': self.atm_id,
                 'status': 'OPERATIONAL',
                 'timestamp': datetime.now().isoformat()
             })
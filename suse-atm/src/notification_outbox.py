@@ -0,0 +1,286 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Union
+from http_client import get_session, get_timeouts
+from metrics import REGISTRY
+
+NOTIFY_LATENCY = REGISTRY.histogram(
+    'atm_notification_send_duration_seconds', 'Windows monitor batch send latency by result', ('result',)
+)
+NOTIFY_EVENTS = REGISTRY.counter(
+    'atm_notifications_total', 'Notifications by result: queued, sent or failed (per attempt)', ('result',)
+)
+NOTIFY_PENDING = REGISTRY.gauge('atm_notifications_pending', 'Notifications waiting in the outbox')
+
+class NotificationOutbox:
+    """
+    Coalesces notifications into gzip-compressed batches sent by a background flusher
+    Every queued event is appended to the spool file, which is rewritten
+    with the undelivered ones after each send, and reloaded on startup; a
+    crash loses nothing that was queued, a power loss at most the events
+    queued since the last rewrite
+    """
+    def __init__(self, endpoint: str, headers: Dict, verify: Union[bool, str],
+                 http_config: Optional[Dict] = None, config: Optional[Dict] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        config = config or {}
+        self.endpoint = endpoint
+        self.headers = dict(headers, **{
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip'
+        })
+        self.verify = verify
+        self.http_config = http_config
+        self.batch_size = config.get('Batch_Size', 20)
+        self.max_age = config.get('Max_Age', 5)
+        self.retry_initial = config.get('Retry_Initial', 2)
+        self.retry_max = config.get('Retry_Max', 300)
+        self.max_events = config.get('Max_Spool_Events', 10000)
+        self.spool_path = config.get('Spool_Path') or None
+
+        self._pending: List[Dict] = []
+        # Batch being sent; taken off _pending so enqueue() trimming cannot shift it
+        self._sending: List[Dict] = []
+        # Events ever queued, to find those queued while the spool was rewritten
+        self._queued = 0
+        self._journal = None
+        self._oldest: Optional[float] = None
+        self._retry_at = 0.0
+        self._retry_delay = self.retry_initial
+        self._spooled = False
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._load_spool()
+
+    @classmethod
+    def from_config(cls, config) -> 'NotificationOutbox':
+        """
+        Outbox for the Windows monitor configured in an ATMConfig
+        """
+        return cls(
+            config.network['Windows_Monitor_Endpoint'],
+            {'Authorization': f'Bearer {config.security["Auth_Token"]}'},
+            config.security['SSL_Cert_Path'],
+            config.http,
+            config.notification_outbox
+        )
+
+    def start(self):
+        """
+        Start the background flusher
+        """
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='notification-outbox', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        """
+        Stop the flusher, attempt a final flush and spool anything still unsent
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if not self.flush():
+            self._write_spool()
+        with self._cond:
+            self._close_journal()
+
+    def enqueue(self, event: Dict):
+        """
+        Queue a notification; never blocks on the network
+        """
+        with self._cond:
+            self._pending.append(event)
+            self._queued += 1
+            self._append_journal([event])
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._pending) > self.max_events:
+                dropped = len(self._pending) - self.max_events
+                del self._pending[:dropped]
+                self.logger.warning(f"Notification outbox full, dropped {dropped} oldest events")
+                NOTIFY_EVENTS.inc(dropped, result='dropped')
+            NOTIFY_EVENTS.inc(result='queued')
+            NOTIFY_PENDING.set(len(self._pending))
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def pending(self) -> int:
+        """
+        Number of notifications waiting to be sent
+        """
+        with self._cond:
+            return len(self._sending) + len(self._pending)
+
+    def flush(self) -> bool:
+        """
+        Send pending notifications in batches until empty or a send fails
+        Returns: True if everything was delivered
+        """
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = self._sending = self._pending[:self.batch_size]
+                    del self._pending[:len(batch)]
+                if not batch:
+                    return True
+
+                if not self._send(batch):
+                    with self._cond:
+                        # Back in front, still oldest first; trim as enqueue() would
+                        self._pending[:0] = batch
+                        self._sending = []
+                        if len(self._pending) > self.max_events:
+                            dropped = len(self._pending) - self.max_events
+                            del self._pending[:dropped]
+                            self.logger.warning(f"Notification outbox full, dropped {dropped} oldest events")
+                            NOTIFY_EVENTS.inc(dropped, result='dropped')
+                        self._retry_at = time.monotonic() + self._retry_delay
+                        self._retry_delay = min(self._retry_delay * 2, self.retry_max)
+                    self._write_spool()
+                    return False
+
+                with self._cond:
+                    self._sending = []
+                    NOTIFY_PENDING.set(len(self._pending))
+                    self._oldest = time.monotonic() if self._pending else None
+                    self._retry_at = 0.0
+                    self._retry_delay = self.retry_initial
+                if self._spooled:
+                    self._write_spool()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                wait_for = self._time_until_due()
+                if wait_for > 0:
+                    self._cond.wait(wait_for)
+                    continue
+            self.flush()
+
+    def _time_until_due(self) -> float:
+        """
+        Seconds until the next flush is due: batch full or oldest event too old,
+        whichever is first, but never before the retry backoff has elapsed
+        """
+        if not self._pending:
+            return self.max_age
+        now = time.monotonic()
+        if len(self._pending) >= self.batch_size:
+            due = now
+        else:
+            due = self._oldest + self.max_age
+        return max(due, self._retry_at) - now
+
+    def _send(self, batch: List[Dict]) -> bool:
+        started = time.monotonic()
+        try:
+            body = gzip.compress(json.dumps({'events': batch}).encode('utf-8'))
+            response = get_session(self.http_config).post(
+                self.endpoint,
+                data=body,
+                headers=self.headers,
+                verify=self.verify,
+                timeout=get_timeouts(self.http_config)
+            )
+
+            if response.status_code != 200:
+                raise Exception(f"Notification failed: {response.text}")
+
+            self.logger.info(f"Successfully sent {len(batch)} notifications to Windows monitor")
+            NOTIFY_LATENCY.observe(time.monotonic() - started, result='success')
+            NOTIFY_EVENTS.inc(len(batch), result='sent')
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Failed to notify Windows monitor: {str(e)}")
+            NOTIFY_LATENCY.observe(time.monotonic() - started, result='failure')
+            NOTIFY_EVENTS.inc(len(batch), result='failed')
+            return False
+
+    def _write_spool(self):
+        """
+        Atomically rewrite the spool file with the events still undelivered
+        """
+        if not self.spool_path:
+            return
+        try:
+            with self._cond:
+                events = self._sending + self._pending
+                queued = self._queued
+                if not events:
+                    self._close_journal()
+                    if os.path.exists(self.spool_path):
+                        os.remove(self.spool_path)
+                    self._spooled = False
+                    return
+            tmp_path = f"{self.spool_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                for event in events:
+                    f.write(json.dumps(event) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            with self._cond:
+                # Events queued meanwhile went to the replaced file; carry them over
+                self._close_journal()
+                os.replace(tmp_path, self.spool_path)
+                newer = min(self._queued - queued, len(self._pending))
+                if newer:
+                    self._append_journal(self._pending[-newer:])
+            self._spooled = True
+        except Exception as e:
+            self.logger.error(f"Failed to spool notifications: {str(e)}")
+
+    def _append_journal(self, events: List[Dict]):
+        """
+        Append queued events to the spool file; the caller holds _cond
+        Written through to the OS (no fsync), so they survive a process crash
+        """
+        if not self.spool_path:
+            return
+        try:
+            if self._journal is None:
+                self._journal = open(self.spool_path, 'a')
+            for event in events:
+                self._journal.write(json.dumps(event) + '\n')
+            self._journal.flush()
+            self._spooled = True
+        except Exception as e:
+            self.logger.error(f"Failed to spool notification: {str(e)}")
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return
+        try:
+            with open(self.spool_path, 'r') as f:
+                events = [json.loads(line) for line in f if line.strip()]
+            self._pending = events[-self.max_events:]
+            self._oldest = time.monotonic() if self._pending else None
+            self._spooled = True
+            self.logger.info(f"Loaded {len(self._pending)} spooled notifications")
+        except Exception as e:
+            self.logger.error(f"Failed to load notification spool: {str(e)}")
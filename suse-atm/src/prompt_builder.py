@@ -0,0 +1,179 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Union
+from history_store import ErrorHistoryStore
+from metrics import REGISTRY
+
+# Rough size of one model token in JSON text, for Max_Tokens budgets
+BYTES_PER_TOKEN = 4
+# Longest string and list kept when a sensor payload must be shrunk
+MAX_STRING = 256
+MAX_ITEMS = 20
+
+PROMPT_BYTES = REGISTRY.histogram(
+    'atm_ai_prompt_bytes', 'Size of AI prompts by task', ('task',),
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+)
+PROMPT_REDUCTIONS = REGISTRY.counter(
+    'atm_ai_prompt_reductions_total', 'AI prompts shrunk to fit the size budget', ('task',)
+)
+
+class PromptBuilder:
+    """
+    Builds AI prompts within a byte/token budget
+    The static thresholds block is serialized once and spliced into every
+    prompt; error history is sent as counts per type and time bucket
+    """
+    def __init__(self, thresholds: Dict, config: Optional[Dict] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        config = config or {}
+        self.max_bytes = config.get('Max_Bytes', 8192)
+        if config.get('Max_Tokens'):
+            self.max_bytes = min(self.max_bytes, config['Max_Tokens'] * BYTES_PER_TOKEN)
+        self.bucket_seconds = config.get('Bucket_Seconds', 3600)
+        self._thresholds = _dumps(thresholds)
+
+    def diagnostic(self, sensor_data: Dict) -> str:
+        """
+        Prompt for diagnosing a fault
+        """
+        return self._fit('diagnose_atm_issue', 'thresholds', [
+            lambda: {'sensor_data': sensor_data},
+            lambda: {'sensor_data': _shrink(sensor_data)},
+            lambda: {'sensor_data': {'component': sensor_data.get('component'), 'truncated': True}}
+        ])
+
+    def repair(self, issue_type: str, diagnosis_details: Dict) -> str:
+        """
+        Prompt for a repair strategy
+        """
+        return self._fit('generate_repair_strategy', 'maintenance_thresholds', [
+            lambda: {'issue_type': issue_type, 'diagnosis': diagnosis_details},
+            lambda: {'issue_type': issue_type, 'diagnosis': _shrink(diagnosis_details)},
+            lambda: {'issue_type': issue_type, 'diagnosis': {'truncated': True}}
+        ])
+
+    def recommendation(self, error_history: Union[list, ErrorHistoryStore],
+                       window_seconds: Optional[float] = None, analytics: Optional[Dict] = None) -> str:
+        """
+        Prompt for a maintenance recommendation
+        History is aggregated per error type and time bucket; when over budget,
+        bucket histograms, per-component counts and the least frequent types
+        are dropped in that order
+        Analytics results (see AnalyticsEngine) add per component rates, MTBF
+        and risk; their rolling series only goes in the most detailed attempt
+        """
+        summary = self.summarize(error_history, window_seconds)
+        ranked = sorted(summary['by_type'].items(), key=lambda item: -item[1]['count'])
+        components = (analytics or {}).get('components') or {}
+
+        def reduced(keep_types: int, fields: tuple, rolling: bool = False) -> Dict:
+            kept = ranked[:keep_types]
+            by_type = {
+                etype: {key: value for key, value in stats.items() if key in fields}
+                for etype, stats in kept
+            }
+            result = dict(summary, by_type=by_type)
+            if len(kept) < len(ranked):
+                result['omitted_types'] = len(ranked) - len(kept)
+                result['omitted_errors'] = sum(stats['count'] for _, stats in ranked[len(kept):])
+            prompt: Dict[str, Any] = {'summary': result}
+            if components:
+                prompt['analytics'] = {
+                    component: {
+                        key: value for key, value in stats.items() if rolling or key != 'rolling_rate'
+                    }
+                    for component, stats in components.items()
+                }
+            return prompt
+
+        full = ('count', 'first', 'last', 'components', 'buckets')
+        counts = ('count', 'first', 'last')
+        attempts: List[Callable[[], Dict]] = [
+            lambda: reduced(len(ranked), full, rolling=True),
+            lambda: reduced(len(ranked), full),
+            lambda: reduced(len(ranked), full[:-1]),
+            lambda: reduced(len(ranked), counts)
+        ]
+        keep = len(ranked) // 2
+        while keep > 0:
+            attempts.append(lambda keep=keep: reduced(keep, counts))
+            keep //= 2
+        attempts.append(lambda: reduced(0, counts))
+        return self._fit('maintenance_recommendation', 'thresholds', attempts)
+
+    def summarize(self, error_history: Union[list, ErrorHistoryStore],
+                  window_seconds: Optional[float] = None) -> Dict:
+        """
+        Aggregate a history store, or a plain list of {'timestamp', 'error'} records
+        """
+        if isinstance(error_history, ErrorHistoryStore):
+            return error_history.summarize(window_seconds, self.bucket_seconds)
+
+        store = ErrorHistoryStore({'Tail_Size': len(error_history) + 1, 'Spill_Path': ''})
+        oldest = time.time()
+        for record in error_history:
+            error = record.get('error') or {}
+            timestamp = _epoch(record.get('timestamp'))
+            oldest = min(oldest, timestamp)
+            store.add(_error_type(error), error, timestamp)
+        # A plain list is summarized whole unless a window was asked for
+        return store.summarize(window_seconds or time.time() - oldest + 1, self.bucket_seconds)
+
+    def _fit(self, task: str, thresholds_key: str, attempts: List[Callable[[], Dict]]) -> str:
+        """
+        Serialize the first attempt that fits the budget, most detailed first
+        """
+        for index, attempt in enumerate(attempts):
+            prompt = self._serialize(task, attempt(), thresholds_key)
+            if len(prompt) <= self.max_bytes:
+                break
+        else:
+            self.logger.warning(f"AI prompt for {task} exceeds {self.max_bytes} bytes "
+                                f"even when reduced ({len(prompt)} bytes)")
+        if index:
+            PROMPT_REDUCTIONS.inc(task=task)
+        PROMPT_BYTES.observe(len(prompt), task=task)
+        return prompt
+
+    def _serialize(self, task: str, fields: Dict, thresholds_key: str) -> str:
+        # json.dumps escapes non-ASCII, so the string length is the byte size
+        body = _dumps(dict({'task': task}, **fields))
+        return f'{body[:-1]}, "{thresholds_key}": {self._thresholds}}}'
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+def _shrink(value: Any) -> Any:
+    """
+    Copy of a payload with long strings and lists cut down
+    """
+    if isinstance(value, dict):
+        return {key: _shrink(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_shrink(item) for item in value[:MAX_ITEMS]]
+    if isinstance(value, str) and len(value) > MAX_STRING:
+        return value[:MAX_STRING] + '...'
+    return value
+
+def _epoch(timestamp: Any) -> float:
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+def _error_type(error: Dict) -> str:
+    if 'error_type' in error:
+        return error['error_type']
+    nested = error.get('error')
+    if isinstance(nested, dict) and 'error_type' in nested:
+        return nested['error_type']
+    return 'UNKNOWN'
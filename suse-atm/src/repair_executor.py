@@ -0,0 +1,171 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Optional
+from metrics import REGISTRY
+
+# Outcome of a repair action
+SUCCESS = 'SUCCESS'
+FAILED = 'FAILED'
+TIMEOUT = 'TIMEOUT'
+CANCELLED = 'CANCELLED'
+SKIPPED = 'SKIPPED'  # a dependency did not succeed
+
+REPAIR_DURATION = REGISTRY.histogram(
+    'atm_repair_action_duration_seconds', 'Duration of repair actions by outcome', ('action', 'status')
+)
+
+class RepairAction:
+    """
+    One repair step: a callable returning True on success, its time limit
+    and the actions that must succeed before it may start
+    """
+    __slots__ = ('name', 'func', 'timeout', 'depends_on')
+
+    def __init__(self, name: str, func: Callable[[], bool], timeout: float,
+                 depends_on: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.depends_on = tuple(depends_on)
+
+class RepairExecutor:
+    """
+    Runs independent repair actions in parallel and dependent ones in order
+    Each action has its own timeout; a run can be cancelled from another thread
+    Timed-out or cancelled actions keep their worker until the device call returns,
+    so the pool is sized above the number of devices
+    """
+    def __init__(self, config: Optional[Dict] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        self.reconfigure(config)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='repair')
+        self._cancel_futures = set()
+        self._lock = threading.Lock()
+
+    def reconfigure(self, config: Optional[Dict]):
+        """
+        Apply a (re)loaded configuration; Workers only takes effect on restart
+        """
+        config = config or {}
+        self.workers = config.get('Workers', 8)
+        self.action_timeout = config.get('Action_Timeout', 30)
+        # name -> names that must be repaired first
+        self.dependencies: Dict[str, tuple] = {
+            name: tuple(depends_on or ()) for name, depends_on in (config.get('Dependencies') or {}).items()
+        }
+
+    def action(self, name: str, func: Callable[[], bool], timeout: Optional[float] = None) -> RepairAction:
+        """
+        Build an action with the configured timeout and dependencies
+        """
+        return RepairAction(
+            name, func,
+            self.action_timeout if timeout is None else timeout,
+            self.dependencies.get(name, ())
+        )
+
+    def run(self, actions: Iterable[RepairAction],
+            logger: Optional[logging.Logger] = None) -> Dict[str, Dict]:
+        """
+        Run the actions and wait for all of them to finish, time out or be cancelled
+        Dependencies outside this run are ignored; failures are logged to the caller's
+        logger (an agent's in host mode, where the executor is shared)
+        Returns: {name: {'status', 'success', 'duration'}}
+        """
+        logger = logger or self.logger
+        actions = {action.name: action for action in actions}
+        # Resolved by cancel(); waited on together with the running actions
+        cancel: Future = Future()
+        with self._lock:
+            self._cancel_futures.add(cancel)
+
+        results: Dict[str, Dict] = {}
+        running: Dict[Future, tuple] = {}
+        waiting = dict(actions)
+        try:
+            while waiting or running:
+                self._start_ready(waiting, running, results, actions)
+                if not running:
+                    # Only actions with circular dependencies are left
+                    for name in waiting:
+                        logger.error(f"Repair action {name} has circular dependencies")
+                        results[name] = _result(SKIPPED, 0.0)
+                    waiting.clear()
+                    break
+
+                now = time.monotonic()
+                deadline = min(started + action.timeout for action, started in running.values())
+                done, _ = wait(list(running) + [cancel], timeout=max(deadline - now, 0),
+                               return_when=FIRST_COMPLETED)
+                if cancel in done:
+                    break
+                now = time.monotonic()
+                for future, (action, started) in list(running.items()):
+                    if future in done:
+                        try:
+                            success = bool(future.result())
+                        except Exception as e:
+                            logger.error(f"Repair action {action.name} failed: {str(e)}")
+                            success = False
+                        results[action.name] = _result(SUCCESS if success else FAILED, now - started)
+                    elif now - started >= action.timeout:
+                        logger.warning(f"Repair action {action.name} timed out after {action.timeout}s")
+                        future.cancel()
+                        results[action.name] = _result(TIMEOUT, now - started)
+                    else:
+                        continue
+                    del running[future]
+        finally:
+            with self._lock:
+                self._cancel_futures.discard(cancel)
+
+        if cancel.done():
+            now = time.monotonic()
+            for future, (action, started) in running.items():
+                future.cancel()
+                results[action.name] = _result(CANCELLED, now - started)
+            for name in waiting:
+                results[name] = _result(CANCELLED, 0.0)
+        for name, result in results.items():
+            REPAIR_DURATION.observe(result['duration'], action=name, status=result['status'])
+        return results
+
+    def cancel(self):
+        """
+        Cancel every run in progress; running device calls are abandoned, queued ones never start
+        """
+        with self._lock:
+            for cancel in self._cancel_futures:
+                if not cancel.done():
+                    cancel.set_result(True)
+
+    def close(self):
+        """
+        Cancel running repairs and release the workers without waiting
+        """
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start_ready(self, waiting: Dict[str, RepairAction], running: Dict[Future, tuple],
+                     results: Dict[str, Dict], actions: Dict[str, RepairAction]):
+        """
+        Start every waiting action whose in-run dependencies succeeded,
+        and skip those with a dependency that did not
+        """
+        for name, action in list(waiting.items()):
+            depends_on = [dep for dep in action.depends_on if dep in actions]
+            if any(dep in results and not results[dep]['success'] for dep in depends_on):
+                results[name] = _result(SKIPPED, 0.0)
+                del waiting[name]
+            elif all(dep in results for dep in depends_on):
+                running[self._executor.submit(action.func)] = (action, time.monotonic())
+                del waiting[name]
+
+def _result(status: str, duration: float) -> Dict:
+    return {'status': status, 'success': status == SUCCESS, 'duration': duration}
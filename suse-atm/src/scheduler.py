@@ -0,0 +1,139 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Dict, Optional
+
+class ScheduledJob:
+    """
+    A recurring coroutine with its own interval, jitter and failure backoff
+    """
+    def __init__(self, name: str, func: Callable[[], Awaitable], interval: float,
+                 jitter: float, max_backoff: float, run_immediately: bool = True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.run_immediately = run_immediately
+        self.failures = 0
+
+    def next_delay(self) -> float:
+        """
+        Delay before the next run: the interval, doubled per consecutive failure,
+        spread by +/- jitter so components don't fire in lockstep
+        """
+        delay = self.interval
+        if self.failures:
+            delay = min(self.interval * (2 ** self.failures), self.max_backoff)
+        spread = delay * self.jitter
+        return max(delay + random.uniform(-spread, spread), 0)
+
+class Scheduler:
+    """
+    Runs every registered job as an independent asyncio task,
+    so one slow or failing job never delays the others
+    Jobs may be added (on the loop) and removed while the scheduler runs
+    """
+    def __init__(self, config: Optional[Dict] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        config = config or {}
+        self.default_jitter = config.get('Jitter', 0.1)
+        self.default_max_backoff = config.get('Max_Backoff', 600)
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+
+    def add_job(self, name: str, func: Callable[[], Awaitable], interval: float,
+                jitter: Optional[float] = None, max_backoff: Optional[float] = None,
+                run_immediately: bool = True):
+        """
+        Register a coroutine function to run every `interval` seconds
+        With run_immediately=False the first run waits one interval
+        On a running scheduler this must be called from its event loop
+        """
+        job = ScheduledJob(
+            name,
+            func,
+            interval,
+            self.default_jitter if jitter is None else jitter,
+            self.default_max_backoff if max_backoff is None else max_backoff,
+            run_immediately
+        )
+        self._remove(name)
+        self.jobs[name] = job
+        if self._stopped is not None and not self._stopped.is_set():
+            self._start(job)
+
+    def remove_job(self, name: str):
+        """
+        Cancel and forget a job; safe to call from any thread
+        """
+        self._call_on_loop(self._remove, name)
+
+    async def run(self):
+        """
+        Run all jobs until stop() is called
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        for job in self.jobs.values():
+            self._start(job)
+        try:
+            await self._stopped.wait()
+        finally:
+            tasks = list(self._tasks.values())
+            self._tasks.clear()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        """
+        Stop the scheduler; safe to call from any thread
+        """
+        if self._loop is None or self._stopped is None:
+            return
+        self._call_on_loop(self._stopped.set)
+
+    def _call_on_loop(self, func: Callable, *args):
+        """
+        Run func on the scheduler's loop, directly when already on it or not started
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if self._loop is None or running is self._loop:
+            func(*args)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _start(self, job: ScheduledJob):
+        self._tasks[job.name] = asyncio.create_task(self._run_job(job), name=job.name)
+
+    def _remove(self, name: str):
+        self.jobs.pop(name, None)
+        task = self._tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+
+    async def _run_job(self, job: ScheduledJob):
+        if not job.run_immediately:
+            await asyncio.sleep(job.next_delay())
+        while True:
+            try:
+                await job.func()
+                job.failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.failures += 1
+                self.logger.error(f"Scheduled job {job.name} failed "
+                                  f"({job.failures} in a row): {str(e)}")
+            await asyncio.sleep(job.next_delay())
@@ -0,0 +1,145 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import logging
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# Keys holding bounded, append-only feeds; deltas carry only the new entries
+APPEND_KEYS = ('history', 'updates')
+
+class StatusFeed:
+    """
+    Versioned status shared by every dashboard client
+    State is sampled once per change for all clients and each change is
+    turned into one delta that every subscriber reuses
+    """
+    def __init__(self, status_provider: Callable[[], Dict], interval: float = 1.0,
+                 max_deltas: int = 64):
+        self.logger = logging.getLogger('ATMLogger')
+        self.status_provider = status_provider
+        self.interval = interval
+        self.version = 0
+        self._state: Dict = {}
+        self._deltas: Deque[Tuple[int, Dict]] = deque(maxlen=max_deltas)
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Take the first snapshot and start sampling in the background
+        """
+        if self._running:
+            return
+        self._running = True
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name='status-feed', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop sampling and release waiting subscribers
+        """
+        self._running = False
+        self._wake.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def publish(self):
+        """
+        Sample now instead of at the next interval, after a known state change
+        """
+        self._wake.set()
+
+    def snapshot(self) -> Tuple[int, Dict]:
+        """
+        Current (version, full state)
+        """
+        with self._cond:
+            return self.version, self._state
+
+    def wait_for_events(self, version: int, timeout: float) -> List[Tuple[str, Dict]]:
+        """
+        Block until the feed moves past `version` or the timeout elapses
+        Returns: ('delta', ...) events bringing the client up to date, or one
+        ('snapshot', ...) event if the needed deltas were already discarded
+        """
+        with self._cond:
+            if self.version == version and self._running:
+                self._cond.wait(timeout)
+            if self.version == version:
+                return []
+
+            deltas = [delta for v, delta in self._deltas if v > version]
+            if deltas and deltas[0]['base'] == version:
+                return [('delta', delta) for delta in deltas]
+            return [('snapshot', {'version': self.version, 'state': self._state})]
+
+    def sample(self):
+        """
+        Read the current status and record a delta if anything changed
+        """
+        try:
+            state = self.status_provider()
+        except Exception as e:
+            self.logger.error(f"Failed to sample status: {str(e)}")
+            return
+
+        with self._cond:
+            delta = self._diff(self._state, state)
+            if self.version and not delta['changes'] and not delta['append']:
+                return
+            delta['base'] = self.version
+            self.version += 1
+            delta['version'] = self.version
+            self._state = state
+            self._deltas.append((self.version, delta))
+            self._cond.notify_all()
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._running:
+                self.sample()
+
+    @staticmethod
+    def _diff(old: Dict, new: Dict) -> Dict:
+        changes: Dict = {}
+        append: Dict = {}
+        for key, value in new.items():
+            previous = old.get(key)
+            if previous == value:
+                continue
+            if key in APPEND_KEYS and isinstance(value, list) and isinstance(previous, list):
+                added = StatusFeed._appended(previous, value)
+                if added is not None:
+                    append[key] = {'items': added, 'size': len(value)}
+                    continue
+            changes[key] = value
+        return {'changes': changes, 'append': append}
+
+    @staticmethod
+    def _appended(old: List, new: List) -> Optional[List]:
+        """
+        Entries added to a bounded feed that may also have dropped its oldest
+        entries, or None if `new` is not such a continuation of `old`
+        At least one entry of `old` must remain; with no overlap the feed was
+        replaced, and the caller sends it whole
+        """
+        for start in range(len(old)):
+            kept = old[start:]
+            if new[:len(kept)] == kept:
+                return new[len(kept):]
+        return None
@@ -0,0 +1,233 @@
+# © 2024 Banco do Brasil
+# Developed by A1051594 - Aprendiz do Banco do Brasil
+# All rights reserved.
+
+import hmac
+import json
+import logging
+import mimetypes
+import os
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from status_feed import StatusFeed
+from metrics import CONTENT_TYPE, REGISTRY
+
+class MaintenanceUIServer:
+    """
+    Embedded HTTP server for the maintenance UI
+    Serves the static pages with caching headers, the /api endpoints used by
+    ui/maintenance.js and a server-sent event stream of status deltas at /api/events
+    Actions (POST) require the Security.Auth_Token as a bearer token
+    """
+    def __init__(self, config: Optional[Dict], status_provider: Callable[[], Dict],
+                 actions: Optional[Dict[str, Callable[[Dict], bool]]] = None,
+                 auth_token: Optional[str] = None):
+        self.logger = logging.getLogger('ATMLogger')
+        config = config or {}
+        self.host = config.get('Host', '127.0.0.1')
+        self.port = config.get('Port', 8000)
+        self.static_dir = os.path.abspath(config.get('Static_Dir', '../ui'))
+        self.index = config.get('Index', 'maintenance_detail.html')
+        self.cache_max_age = config.get('Cache_Max_Age', 300)
+        self.heartbeat = config.get('Event_Heartbeat', 15)
+        self.max_body = config.get('Max_Body_Bytes', 4096)
+        # Without a token every action is refused
+        self._authorization = f"Bearer {auth_token}".encode('utf-8') if auth_token else None
+        self.status_provider = status_provider
+        self.actions = actions or {}
+        self.feed = StatusFeed(status_provider, config.get('Push_Interval', 1))
+
+        # path -> (mtime, etag, body)
+        self._static_cache: Dict[str, Tuple[float, str, bytes]] = {}
+        self._cache_lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._httpd is not None
+
+    def start(self):
+        """
+        Bind the port and serve on a background thread
+        """
+        if self._httpd is not None:
+            return
+        self.feed.start()
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            name='maintenance-ui',
+            daemon=True
+        )
+        self._thread.start()
+        self.logger.info(f"Maintenance UI serving on {self.host}:{self.port}")
+
+    def stop(self):
+        """
+        Stop serving and release the port
+        """
+        if self._httpd is None:
+            return
+        # Releases the event stream handlers before the server waits for them
+        self.feed.stop()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+        self._thread = None
+
+    def load_static(self, path: str) -> Optional[Tuple[float, str, bytes]]:
+        """
+        Read a static file below Static_Dir, cached until its mtime changes
+        Returns: (mtime, etag, body) or None if missing or outside Static_Dir
+        """
+        relative = path.lstrip('/') or self.index
+        full_path = os.path.abspath(os.path.join(self.static_dir, relative))
+        if os.path.commonpath([full_path, self.static_dir]) != self.static_dir:
+            return None
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return None
+
+        with self._cache_lock:
+            cached = self._static_cache.get(full_path)
+            if cached is not None and cached[0] == stat.st_mtime:
+                return cached
+            with open(full_path, 'rb') as f:
+                body = f.read()
+            entry = (stat.st_mtime, f'"{int(stat.st_mtime)}-{len(body)}"', body)
+            self._static_cache[full_path] = entry
+            return entry
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/api/status':
+                    self._send_json(200, server.status_provider())
+                    return
+                if path == '/api/events':
+                    self._stream_events()
+                    return
+                if path == '/metrics':
+                    body = REGISTRY.render().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', CONTENT_TYPE)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.send_header('Cache-Control', 'no-store')
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                static = server.load_static(path)
+                if static is None:
+                    self._send_json(404, {'error': 'Not found'})
+                    return
+
+                mtime, etag, body = static
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                content_type = mimetypes.guess_type(path if path != '/' else server.index)[0]
+                self.send_response(200)
+                self.send_header('Content-Type', content_type or 'application/octet-stream')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', formatdate(mtime, usegmt=True))
+                self.send_header('Cache-Control', f'public, max-age={server.cache_max_age}')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                path = self.path.split('?', 1)[0]
+                action = server.actions.get(path[len('/api/'):]) if path.startswith('/api/') else None
+                if action is None:
+                    self._send_json(404, {'error': 'Not found'})
+                    return
+                if not self._authorized():
+                    server.logger.warning(f"Rejected unauthorized maintenance UI action {path} "
+                                          f"from {self.client_address[0]}")
+                    self.close_connection = True
+                    self._send_json(401, {'error': 'Unauthorized'}, {'WWW-Authenticate': 'Bearer'})
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > server.max_body:
+                    # The body is never read, so the connection cannot be reused
+                    self.close_connection = True
+                    self._send_json(413 if length > 0 else 400, {'error': 'Invalid request body'})
+                    return
+
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                    success = bool(action(payload))
+                except Exception as e:
+                    server.logger.error(f"Maintenance UI action {path} failed: {str(e)}")
+                    success = False
+                self._send_json(200, {'success': success})
+
+            def _authorized(self) -> bool:
+                header = self.headers.get('Authorization', '').encode('utf-8')
+                return server._authorization is not None and hmac.compare_digest(header, server._authorization)
+
+            def _stream_events(self):
+                """
+                Send a snapshot, then versioned deltas as the feed changes
+                """
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-store')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+
+                version, state = server.feed.snapshot()
+                try:
+                    self._send_event('snapshot', {'version': version, 'state': state})
+                    while server.feed.running:
+                        events = server.feed.wait_for_events(version, server.heartbeat)
+                        if not events:
+                            # Comment line keeps proxies from closing an idle stream
+                            self.wfile.write(b': keep-alive\n\n')
+                            self.wfile.flush()
+                            continue
+                        for event, data in events:
+                            self._send_event(event, data)
+                            version = data['version']
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send_event(self, event: str, data: Dict):
+                payload = json.dumps(data, default=str)
+                self.wfile.write(f"id: {data['version']}\nevent: {event}\ndata: {payload}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            def _send_json(self, code: int, data: Dict, headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(data, default=str).encode('utf-8')
+                self.send_response(code)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                server.logger.debug(f"Maintenance UI: {format % args}")
+
+        return Handler
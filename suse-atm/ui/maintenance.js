@@ -11,6 +11,11 @@ let currentStatus = {
     lastUpdate: null
 };
 
+// Event stream state
+let eventSource = null;
+let currentVersion = null;
+let pollTimer = null;
+
 // Configuration
 const CONFIG = {
     updateInterval: 5000, // 5 seconds
@@ -18,20 +23,29 @@ const CONFIG = {
         status: '/api/status',
         repair: '/api/repair',
         technician: '/api/technician',
-        shutdown: '/api/shutdown'
+        shutdown: '/api/shutdown',
+        events: '/api/events'
+    },
+    // Sections re-rendered when one of their keys changes in a delta
+    sections: {
+        status: ['atmId', 'errorType', 'component', 'description'],
+        diagnostics: ['diagnostics']
     }
 };
 
 // Initialize the page
 document.addEventListener('DOMContentLoaded', () => {
     initializePage();
-    // Start periodic updates
-    setInterval(refreshStatus, CONFIG.updateInterval);
 });
 
 async function initializePage() {
     try {
-        await refreshStatus();
+        if (window.EventSource) {
+            connectEventStream();
+        } else {
+            await refreshStatus();
+            startPolling();
+        }
         setupEventListeners();
         updateTimestamp();
     } catch (error) {
@@ -58,6 +72,90 @@ async function refreshStatus() {
     }
 }
 
+// Server-sent status deltas
+function connectEventStream() {
+    eventSource = new EventSource(CONFIG.endpoints.events);
+
+    eventSource.addEventListener('snapshot', (event) => {
+        const data = JSON.parse(event.data);
+        stopPolling();
+        applySnapshot(data.version, data.state);
+    });
+
+    eventSource.addEventListener('delta', (event) => {
+        const delta = JSON.parse(event.data);
+        if (delta.base !== currentVersion) {
+            // Missed an update; reconnect to receive a fresh snapshot
+            eventSource.close();
+            connectEventStream();
+            return;
+        }
+        applyDelta(delta);
+    });
+
+    eventSource.onerror = () => {
+        // The browser reconnects on its own; poll until the stream is back
+        startPolling();
+    };
+}
+
+function applySnapshot(version, state) {
+    currentVersion = version;
+    updateStatus(state);
+    updateDiagnostics(state.diagnostics);
+    updateMaintenanceHistory(state.history);
+    updateStatusUpdates(state.updates);
+    currentStatus = { ...state };
+    updateTimestamp();
+}
+
+function applyDelta(delta) {
+    const changed = Object.keys(delta.changes);
+    Object.assign(currentStatus, delta.changes);
+
+    if (changed.some(key => CONFIG.sections.status.includes(key))) {
+        updateStatus(currentStatus);
+    }
+    if (changed.some(key => CONFIG.sections.diagnostics.includes(key))) {
+        updateDiagnostics(currentStatus.diagnostics);
+    }
+    if ('history' in delta.changes) {
+        updateMaintenanceHistory(currentStatus.history);
+    }
+    if ('updates' in delta.changes) {
+        updateStatusUpdates(currentStatus.updates);
+    }
+
+    if (delta.append.history) {
+        currentStatus.history = appendEntries(currentStatus.history, delta.append.history);
+        appendMaintenanceHistory(delta.append.history);
+    }
+    if (delta.append.updates) {
+        currentStatus.updates = appendEntries(currentStatus.updates, delta.append.updates);
+        appendStatusUpdates(delta.append.updates);
+    }
+
+    currentVersion = delta.version;
+    updateTimestamp();
+}
+
+function appendEntries(list, appended) {
+    return (list || []).concat(appended.items).slice(-appended.size);
+}
+
+function startPolling() {
+    if (!pollTimer) {
+        pollTimer = setInterval(refreshStatus, CONFIG.updateInterval);
+    }
+}
+
+function stopPolling() {
+    if (pollTimer) {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    }
+}
+
 function updateStatus(data) {
     const errorDetails = document.getElementById('error-details');
     if (!errorDetails) return;
@@ -125,20 +223,28 @@ function updateMaintenanceHistory(history) {
 
     // Clear loading state
     maintenanceHistory.innerHTML = '';
+    history.forEach(entry => maintenanceHistory.appendChild(createHistoryEntry(entry)));
+}
 
-    // Create history content
-    const content = document.createElement('div');
-    content.innerHTML = history.map(entry => `
-        <div class="border-b border-gray-200 py-2 last:border-0">
-            <div class="flex justify-between items-center">
-                <span class="font-semibold">${entry.timestamp}</span>
-                <span class="${getStatusClass(entry.status)}">${entry.status}</span>
-            </div>
-            <p class="text-sm text-gray-600 mt-1">${entry.action}</p>
+function appendMaintenanceHistory(appended) {
+    const maintenanceHistory = document.getElementById('maintenance-history');
+    if (!maintenanceHistory) return;
+
+    appended.items.forEach(entry => maintenanceHistory.appendChild(createHistoryEntry(entry)));
+    trimChildren(maintenanceHistory, appended.size);
+}
+
+function createHistoryEntry(entry) {
+    const element = document.createElement('div');
+    element.className = 'border-b border-gray-200 py-2 last:border-0';
+    element.innerHTML = `
+        <div class="flex justify-between items-center">
+            <span class="font-semibold">${entry.timestamp}</span>
+            <span class="${getStatusClass(entry.status)}">${entry.status}</span>
         </div>
-    `).join('');
-    
-    maintenanceHistory.appendChild(content);
+        <p class="text-sm text-gray-600 mt-1">${entry.action}</p>
+    `;
+    return element;
 }
 
 function updateStatusUpdates(updates) {
@@ -147,34 +253,69 @@ function updateStatusUpdates(updates) {
 
     // Clear loading state
     statusUpdates.innerHTML = '';
+    updates.forEach(update => statusUpdates.appendChild(createStatusUpdate(update)));
+}
 
-    // Create updates content
-    const content = document.createElement('div');
-    content.innerHTML = updates.map(update => `
-        <div class="flex items-center space-x-2 py-2">
-            <i class="${getUpdateIcon(update.type)} text-${getUpdateColor(update.type)}"></i>
-            <span class="text-gray-700">${update.message}</span>
-            <span class="text-gray-400 text-sm">${update.timestamp}</span>
-        </div>
-    `).join('');
-    
-    statusUpdates.appendChild(content);
+function appendStatusUpdates(appended) {
+    const statusUpdates = document.getElementById('status-updates');
+    if (!statusUpdates) return;
+
+    appended.items.forEach(update => statusUpdates.appendChild(createStatusUpdate(update)));
+    trimChildren(statusUpdates, appended.size);
+}
+
+function createStatusUpdate(update) {
+    const element = document.createElement('div');
+    element.className = 'flex items-center space-x-2 py-2';
+    element.innerHTML = `
+        <i class="${getUpdateIcon(update.type)} text-${getUpdateColor(update.type)}"></i>
+        <span class="text-gray-700">${update.message}</span>
+        <span class="text-gray-400 text-sm">${update.timestamp}</span>
+    `;
+    return element;
+}
+
+function trimChildren(container, size) {
+    while (container.children.length > size) {
+        container.removeChild(container.firstElementChild);
+    }
+}
+
+// Actions need the ATM's auth token; the technician enters it once per session
+async function postAction(endpoint, payload) {
+    let token = sessionStorage.getItem('atmAuthToken');
+    if (!token) {
+        token = prompt('Maintenance auth token:');
+        if (!token) {
+            return { success: false };
+        }
+        sessionStorage.setItem('atmAuthToken', token);
+    }
+
+    const response = await fetch(endpoint, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify(payload)
+    });
+    if (response.status === 401) {
+        sessionStorage.removeItem('atmAuthToken');
+        showError('Invalid auth token');
+        return { success: false };
+    }
+    return response.json();
 }
 
 async function attemptRepair() {
     try {
-        const response = await fetch(CONFIG.endpoints.repair, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ atmId: currentStatus.atmId })
-        });
-
-        const result = await response.json();
+        const result = await postAction(CONFIG.endpoints.repair, { atmId: currentStatus.atmId });
         if (result.success) {
             showSuccess('Repair attempt initiated');
-            await refreshStatus();
+            if (!eventSource || eventSource.readyState !== EventSource.OPEN) {
+                await refreshStatus();
+            }
         } else {
             showError('Repair attempt failed');
         }
@@ -186,18 +327,10 @@ async function attemptRepair() {
 
 async function requestTechnician() {
     try {
-        const response = await fetch(CONFIG.endpoints.technician, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ 
-                atmId: currentStatus.atmId,
-                errorDetails: currentStatus.errorDetails
-            })
+        const result = await postAction(CONFIG.endpoints.technician, {
+            atmId: currentStatus.atmId,
+            errorDetails: currentStatus.errorDetails
         });
-
-        const result = await response.json();
         if (result.success) {
             showSuccess('Technician request submitted');
         } else {
@@ -215,15 +348,7 @@ async function shutdownATM() {
     }
 
     try {
-        const response = await fetch(CONFIG.endpoints.shutdown, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ atmId: currentStatus.atmId })
-        });
-
-        const result = await response.json();
+        const result = await postAction(CONFIG.endpoints.shutdown, { atmId: currentStatus.atmId });
         if (result.success) {
             showSuccess('Emergency shutdown initiated');
             // Disable all controls
@@ -304,7 +429,8 @@ function disableControls() {
 function setupEventListeners() {
     // Add any additional event listeners here
     document.addEventListener('visibilitychange', () => {
-        if (!document.hidden) {
+        // The event stream keeps the page current; only poll without it
+        if (!document.hidden && (!eventSource || eventSource.readyState !== EventSource.OPEN)) {
             refreshStatus();
         }
     });